@@ -29,11 +29,86 @@ if not SECRET_KEY:
 
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))  # Renewed on every refresh
+# A client that lost a /auth/refresh response may retry the old token this long
+REFRESH_TOKEN_RETRY_SECONDS = int(os.getenv("REFRESH_TOKEN_RETRY_SECONDS", "10"))
 
 # Email configuration
 GMAIL_EMAIL = os.getenv("GMAIL_EMAIL")
 GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
 
+# Database connection pool, per worker process (see app/serve.py for sizing workers)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "3600"))  # Below MySQL's wait_timeout
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "151"))  # The server's max_connections
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "10"))  # Migrations, cron, admin sessions
+
+# Read replicas for GET requests (comma-separated URLs; empty = primary only)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("DB_REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+
+# Static fuel price snapshots (disabled unless a directory is configured)
+PRICE_SNAPSHOT_DIR = os.getenv("PRICE_SNAPSHOT_DIR")
+PRICE_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("PRICE_SNAPSHOT_MAX_AGE_SECONDS", "600"))
+PRICE_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("PRICE_SNAPSHOT_INTERVAL_SECONDS", "0"))
+PRICE_SNAPSHOT_KEEP_VERSIONS = int(os.getenv("PRICE_SNAPSHOT_KEEP_VERSIONS", "3"))
+PRICE_SNAPSHOT_BASE_URL = os.getenv("PRICE_SNAPSHOT_BASE_URL")  # CDN origin serving PRICE_SNAPSHOT_DIR
+
+# Recent_Fuel_Prices retention (0 = prune from cron instead)
+RECENT_PRICES_PRUNE_INTERVAL_SECONDS = int(os.getenv("RECENT_PRICES_PRUNE_INTERVAL_SECONDS", "86400"))
+
+# Live price change feed (/fuel-prices/stream)
+PRICE_EVENTS_QUEUE_SIZE = int(os.getenv("PRICE_EVENTS_QUEUE_SIZE", "100"))
+PRICE_EVENTS_HEARTBEAT_SECONDS = int(os.getenv("PRICE_EVENTS_HEARTBEAT_SECONDS", "15"))
+PRICE_EVENTS_REDIS_URL = os.getenv("PRICE_EVENTS_REDIS_URL")  # Needed with multiple workers
+
+# Request/query instrumentation (/metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+# Response compression (gzip, and brotli when the package is installed)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))  # bytes
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Rate limiting: token buckets per user (JWT) or client IP
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "60"))  # Burst size, in tokens
+RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", "2"))
+RATE_LIMIT_AUTH_CAPACITY = float(os.getenv("RATE_LIMIT_AUTH_CAPACITY", "10"))  # Login/reset routes, per IP
+RATE_LIMIT_AUTH_REFILL_PER_MINUTE = float(os.getenv("RATE_LIMIT_AUTH_REFILL_PER_MINUTE", "5"))
+RATE_LIMIT_EXPENSIVE_CONCURRENCY = int(os.getenv("RATE_LIMIT_EXPENSIVE_CONCURRENCY", "8"))  # Per worker
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")  # Shared buckets with multiple workers
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"  # Behind a proxy
+
+# Idempotency-Key on POST /fuel/ and /maintenance/ (app/utils/idempotency.py)
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))  # How long retries are recognized
+IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "60"))  # Abandoned claims
+
+# Station clustering of new fuel logs, after the write commits (app/services/clustering_queue.py)
+CLUSTERING_WORKERS = int(os.getenv("CLUSTERING_WORKERS", "2"))  # Per process; 0 = only cron drains the queue
+CLUSTERING_BATCH_SIZE = int(os.getenv("CLUSTERING_BATCH_SIZE", "50"))  # Fuel logs clustered per transaction
+CLUSTERING_BATCH_WAIT_MS = int(os.getenv("CLUSTERING_BATCH_WAIT_MS", "50"))  # Wait to fill a batch
+CLUSTERING_QUEUE_SIZE = int(os.getenv("CLUSTERING_QUEUE_SIZE", "10000"))  # Overflow stays in the table
+CLUSTERING_SWEEP_SECONDS = int(os.getenv("CLUSTERING_SWEEP_SECONDS", "30"))  # Re-reads jobs no worker holds
+CLUSTERING_CLAIM_TIMEOUT_SECONDS = int(os.getenv("CLUSTERING_CLAIM_TIMEOUT_SECONDS", "120"))  # Crashed batches
+CLUSTERING_MAX_ATTEMPTS = int(os.getenv("CLUSTERING_MAX_ATTEMPTS", "5"))  # Then the job is left for inspection
+
+# Account deletion (app/services/account_purge.py)
+ACCOUNT_PURGE_CHUNK_SIZE = int(os.getenv("ACCOUNT_PURGE_CHUNK_SIZE", "5000"))  # Rows deleted per transaction
+
+# Production server (python -m app.serve)
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))  # 0: derived from CPUs and the DB pool
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))  # Seconds to drain in-flight requests
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", "5"))
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", "0"))  # Recycle workers after N requests, 0 = never
+
 # Print loaded config for debugging (remove in production)
 print(f"✅ Configuration loaded from: {env_path}")
 print(f"📊 Database: {DATABASE_URL[:20]}..." if DATABASE_URL else "❌ No DATABASE_URL")
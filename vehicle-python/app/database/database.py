@@ -1,16 +1,51 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from ..config import DATABASE_URL
+from ..config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE_SECONDS,
+    DATABASE_REPLICA_URLS, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_CHECK_INTERVAL_SECONDS
+)
+from .replicas import ReplicaRouter, RoutingSession
 
-engine = create_engine(DATABASE_URL)
+
+def _engine_options(url: str) -> dict:
+    # Pool limits apply per process, so every worker can open up to
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections (SQLite keeps its own pooling)
+    if url.startswith("sqlite"):
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_recycle": DB_POOL_RECYCLE_SECONDS}
+
+
+def _enforce_sqlite_foreign_keys(engine):
+    # Deletes rely on ON DELETE CASCADE, which SQLite only honours per connection
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", lambda dbapi_connection, record: dbapi_connection.execute("PRAGMA foreign_keys=ON"))
+    return engine
+
+
+engine = _enforce_sqlite_foreign_keys(create_engine(DATABASE_URL, **_engine_options(DATABASE_URL)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Replicas serving GET requests; pre-ping so a failed replica is noticed on checkout
+replica_router = ReplicaRouter(
+    engine,
+    [create_engine(url, pool_pre_ping=True, **_engine_options(url)) for url in DATABASE_REPLICA_URLS],
+    max_lag_seconds=DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=DB_REPLICA_CHECK_INTERVAL_SECONDS
+)
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, router=replica_router)
+
+READ_METHODS = ("GET", "HEAD")
+
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+# Dependency to get DB session (GET requests read from replicas when configured)
+def get_db(request: Request):
+    if request.method in READ_METHODS and replica_router.replicas:
+        db = ReadSessionLocal()
+    else:
+        db = SessionLocal()
     try:
         yield db
     finally:
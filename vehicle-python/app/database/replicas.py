@@ -0,0 +1,184 @@
+"""
+Read-replica routing.
+
+GET requests get a RoutingSession: reads go to a healthy replica and
+everything else (flushes, UPDATE/INSERT/DELETE statements, and User rows,
+which carry the caller's write watermark) goes to the primary. Once a
+session writes it stays on the primary.
+
+Replicas are probed every DB_REPLICA_CHECK_INTERVAL_SECONDS. A replica is
+used while its last probe succeeded and its replication lag is within
+DB_REPLICA_MAX_LAG_SECONDS; a failed probe or a dropped connection takes it
+out of rotation until the next good probe, and with no usable replica reads
+fall back to the primary.
+
+Read-your-writes: every write bumps the user's data_updated_at (see
+bump_versions), and stamps it again once the write has committed, so it is
+never earlier than the commit. get_current_user records it on the session
+with require_fresh(), and a replica is only chosen when the last probe
+proves it had already applied everything up to that moment. A user who just wrote
+reads from the primary for at most one probe interval.
+"""
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..utils.metrics import CounterMetric
+
+logger = logging.getLogger(__name__)
+
+# Tables always read from the primary: Users holds data_updated_at, the
+# watermark that decides whether a replica is fresh enough
+PRIMARY_TABLES = {"Users"}
+
+# Replica lag is reported in whole seconds (and DATETIME columns drop
+# fractions), so freshness checks keep this much slack
+FRESHNESS_MARGIN = timedelta(seconds=1)
+
+
+def replication_lag(conn: Connection) -> Optional[float]:
+    """Seconds the server is behind its source; None when replication is broken."""
+    if conn.dialect.name != "mysql":
+        return 0.0
+    try:
+        row = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+        column = "Seconds_Behind_Source"
+    except DBAPIError:  # MySQL < 8.0.22
+        row = conn.execute(text("SHOW SLAVE STATUS")).mappings().first()
+        column = "Seconds_Behind_Master"
+    if row is None:
+        return 0.0  # Not replicating (e.g. a restored copy): as fresh as it will get
+    lag = row[column]
+    return None if lag is None else float(lag)
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+
+    def applied_through(self) -> Optional[datetime]:
+        """Latest primary write this replica was known to have applied at the last probe."""
+        if self.checked_at is None or self.lag_seconds is None:
+            return None
+        return self.checked_at - timedelta(seconds=self.lag_seconds) - FRESHNESS_MARGIN
+
+
+class ReplicaRouter:
+    def __init__(self, primary: Engine, replicas: List[Engine],
+                 max_lag_seconds: float = 5.0, check_interval_seconds: float = 5.0):
+        self.primary = primary
+        self.replicas = [Replica(f"replica{i}", engine) for i, engine in enumerate(replicas)]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reads = CounterMetric("db_read_route_total", "Sessions' read traffic by target and reason")
+        for replica in self.replicas:
+            event.listen(replica.engine, "handle_error", self._on_error(replica))
+
+    def metrics(self):
+        return (self.reads,)
+
+    def _on_error(self, replica: Replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.mark_down(replica, context.original_exception)
+        return handle_error
+
+    def mark_down(self, replica: Replica, reason):
+        if replica.healthy:
+            logger.warning(f"⚠️ Read replica {replica.name} is down, using the primary: {reason}")
+        replica.healthy = False
+
+    def check(self):
+        """Probe every replica once."""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                    lag = replication_lag(conn)
+            except SQLAlchemyError as e:
+                self.mark_down(replica, e)
+                continue
+            replica.lag_seconds = lag
+            replica.checked_at = datetime.utcnow()
+            healthy = lag is not None and lag <= self.max_lag_seconds
+            if healthy != replica.healthy:
+                logger.info(f"🔁 Read replica {replica.name} {'healthy' if healthy else 'lagging'} (lag {lag})")
+            replica.healthy = healthy
+
+    def pick(self, fresh_after: Optional[datetime] = None) -> Engine:
+        """A usable replica, or the primary when none is healthy and fresh enough."""
+        now = datetime.utcnow()
+        stale_after = timedelta(seconds=3 * self.check_interval_seconds)
+        candidates = [
+            replica for replica in self.replicas
+            if replica.healthy and now - replica.checked_at <= stale_after
+        ]
+        if not candidates:
+            self.reads.inc(target="primary", reason="no_replica")
+            return self.primary
+        if fresh_after is not None:
+            candidates = [replica for replica in candidates if replica.applied_through() >= fresh_after]
+            if not candidates:
+                self.reads.inc(target="primary", reason="recent_write")
+                return self.primary
+        replica = candidates[next(self._next) % len(candidates)]
+        self.reads.inc(target=replica.name, reason="replica")
+        return replica.engine
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.check_interval_seconds)
+
+    def start(self):
+        if not self.replicas or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+
+class RoutingSession(Session):
+    """Session sending reads to a replica picked by a ReplicaRouter."""
+
+    def __init__(self, router: ReplicaRouter, **kwargs):
+        kwargs["bind"] = router.primary  # sessionmaker passes bind=None
+        super().__init__(**kwargs)
+        self.router = router
+        self._read_bind: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or self.info.get("wrote") or (clause is not None and clause.is_dml):
+            self.info["wrote"] = True
+            return self.router.primary
+        if mapper is not None and mapper.persist_selectable.name in PRIMARY_TABLES:
+            return self.router.primary
+        if self._read_bind is None:
+            # Chosen once so one request never mixes replicas
+            self._read_bind = self.router.pick(self.info.get("fresh_after"))
+        return self._read_bind
+
+
+def require_fresh(db: Session, written_at: Optional[datetime]):
+    """Only read from replicas that have applied writes up to `written_at`."""
+    if written_at is not None:
+        current = db.info.get("fresh_after")
+        db.info["fresh_after"] = written_at if current is None else max(current, written_at)
@@ -1,7 +1,19 @@
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database.database import engine
+from fastapi.responses import PlainTextResponse
+from .config import (
+    PRICE_SNAPSHOT_DIR, PRICE_SNAPSHOT_INTERVAL_SECONDS, RECENT_PRICES_PRUNE_INTERVAL_SECONDS, METRICS_ENABLED,
+    COMPRESSION_ENABLED, COMPRESSION_MINIMUM_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY,
+    RATE_LIMIT_ENABLED
+)
+from .database.database import engine, replica_router
 from .models import models
+from .services.clustering_queue import clustering_queue
+from .services.station_index import station_index
+from .utils.compression import CompressionMiddleware
+from .utils.metrics import metrics, MetricsMiddleware
+from .utils.rate_limit import rate_limiter, RateLimitMiddleware
 
 # Create all tables
 models.Base.metadata.create_all(bind=engine)
@@ -12,6 +24,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Rate limiting sits inside CORS so 429 responses still carry CORS headers
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+    metrics.register(*rate_limiter.metrics())
+
 # CORS middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -21,8 +38,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added before metrics so request latency includes compression time
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MINIMUM_SIZE,
+        gzip_level=COMPRESSION_GZIP_LEVEL,
+        brotli_quality=COMPRESSION_BROTLI_QUALITY
+    )
+
+if METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    for replica in replica_router.replicas:
+        metrics.instrument_engine(replica.engine)
+    metrics.register(*replica_router.metrics())
+    metrics.register(*clustering_queue.metrics())
+    metrics.register(*station_index.metrics())
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # Include routers
-from .routes import auth, users, vehicles, maintenance, fuel, reminders, prices, locations
+from .routes import auth, users, vehicles, maintenance, fuel, reminders, prices, locations, dashboard, sync
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -32,7 +67,88 @@ app.include_router(fuel.router)
 app.include_router(reminders.router)
 app.include_router(prices.router)
 app.include_router(locations.router)
+app.include_router(dashboard.router)
+app.include_router(sync.router)
+
+# Periodic price snapshot builder (optional; cron can run
+# `python -m app.services.price_snapshot` instead)
+_snapshot_stop = threading.Event()
+
+@app.on_event("startup")
+def start_price_snapshot_builder():
+    if PRICE_SNAPSHOT_DIR and PRICE_SNAPSHOT_INTERVAL_SECONDS > 0:
+        from .services.price_snapshot import run_periodically
+        threading.Thread(
+            target=run_periodically,
+            args=(PRICE_SNAPSHOT_INTERVAL_SECONDS, _snapshot_stop),
+            name="price-snapshot-builder",
+            daemon=True
+        ).start()
+
+@app.on_event("shutdown")
+def stop_price_snapshot_builder():
+    _snapshot_stop.set()
+
+# Daily Recent_Fuel_Prices retention (idempotent, so every worker may run it)
+_prune_stop = threading.Event()
+
+@app.on_event("startup")
+def start_recent_price_pruning():
+    if RECENT_PRICES_PRUNE_INTERVAL_SECONDS > 0:
+        from .services.recent_prices import run_periodically
+        threading.Thread(
+            target=run_periodically,
+            args=(RECENT_PRICES_PRUNE_INTERVAL_SECONDS, _prune_stop),
+            name="recent-price-pruning",
+            daemon=True
+        ).start()
+
+@app.on_event("shutdown")
+def stop_recent_price_pruning():
+    _prune_stop.set()
+
+@app.on_event("startup")
+def start_replica_health_checks():
+    replica_router.start()
+
+@app.on_event("shutdown")
+def stop_replica_health_checks():
+    replica_router.stop()
+
+# In-memory station index for nearby lookups, loaded before the first request
+@app.on_event("startup")
+def load_station_index():
+    from .database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        station_index.load(db)
+    finally:
+        db.close()
+
+# Station clustering of new fuel logs (CLUSTERING_WORKERS=0 leaves it to cron)
+@app.on_event("startup")
+def start_clustering_queue():
+    clustering_queue.start()
+
+@app.on_event("shutdown")
+def stop_clustering_queue():
+    clustering_queue.stop()
+
+@app.on_event("startup")
+def start_price_event_broker():
+    from .services.price_events import price_event_broker
+    price_event_broker.start()
+
+@app.on_event("shutdown")
+def stop_price_event_broker():
+    from .services.price_events import price_event_broker
+    price_event_broker.stop()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Vehicle Maintenance API"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, Enum, ForeignKey, Text, Numeric, DECIMAL, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, Enum, ForeignKey, Text, Numeric, DECIMAL, Double, DateTime, Index, UniqueConstraint, Computed
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import LONGTEXT
 from datetime import datetime
@@ -13,10 +13,13 @@ class User(Base):
     password = Column(String(255), nullable=False)
     mileage_type = Column(Enum('kilometers', 'miles', name='mileage_type'), default='kilometers')
     dark_mode = Column(Boolean, default=False)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped on every write (ETags)
+    data_updated_at = Column(DateTime)
+    deleted_at = Column(DateTime)  # Set while the account's rows are being purged
 
-    # Relationships
-    vehicles = relationship("Vehicle", back_populates="owner", cascade="all, delete")
-    reminders = relationship("Reminder", back_populates="user", cascade="all, delete")
+    # Relationships (children are removed by the foreign keys' ON DELETE CASCADE)
+    vehicles = relationship("Vehicle", back_populates="owner", cascade="all, delete", passive_deletes=True)
+    reminders = relationship("Reminder", back_populates="user", cascade="all, delete", passive_deletes=True)
 
 class Vehicle(Base):
     __tablename__ = "Vehicles_Info"
@@ -32,13 +35,17 @@ class Vehicle(Base):
     current_mileage = Column(Integer, default=0)
     fuel_type = Column(String(30))
     purchase_date = Column(Date)
-    vehicle_image = Column(LONGTEXT)  # Base64 encoded image data
+    vehicle_image = Column(Text().with_variant(LONGTEXT, "mysql"))  # Base64 encoded image data
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped on writes to the vehicle or its logs
+    data_updated_at = Column(DateTime)
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0", index=True)  # Owner's data_version at last write (/sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relationships
+    # Relationships (children are removed by the foreign keys' ON DELETE CASCADE)
     owner = relationship("User", back_populates="vehicles")
-    maintenance_logs = relationship("Maintenance", back_populates="vehicle", cascade="all, delete")
-    fuel_logs = relationship("Fuel", back_populates="vehicle", cascade="all, delete")
-    reminders = relationship("Reminder", back_populates="vehicle", cascade="all, delete")
+    maintenance_logs = relationship("Maintenance", back_populates="vehicle", cascade="all, delete", passive_deletes=True)
+    fuel_logs = relationship("Fuel", back_populates="vehicle", cascade="all, delete", passive_deletes=True)
+    reminders = relationship("Reminder", back_populates="vehicle", cascade="all, delete", passive_deletes=True)
 
 class Maintenance(Base):
     __tablename__ = "Maintenance_Info"
@@ -52,6 +59,8 @@ class Maintenance(Base):
     cost = Column(DECIMAL(10,2))
     location = Column(String(100))
     notes = Column(Text)
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0", index=True)  # Owner's data_version at last write (/sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship
     vehicle = relationship("Vehicle", back_populates="maintenance_logs")
@@ -69,12 +78,44 @@ class Fuel(Base):
     latitude = Column(DECIMAL(10,8))  # For precise location tracking
     longitude = Column(DECIMAL(11,8))  # For precise location tracking
     normalized_location = Column(String(255))  # Simplified name like "Petron, EDSA"
-    station_cluster_id = Column(String(100))  # Groups nearby logs together
+    station_id = Column(Integer, ForeignKey('Gas_Station_Clusters.station_id'), index=True)  # Groups nearby logs together
     full_tank = Column(Boolean, default=False)
     notes = Column(Text)
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0", index=True)  # Owner's data_version at last write (/sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship
     vehicle = relationship("Vehicle", back_populates="fuel_logs")
+    # Joined on the integer key, so serializing a list of logs stays one query
+    station = relationship("GasStationCluster", lazy="joined")
+
+    @property
+    def station_cluster_id(self):
+        """The station's public slug (GasStationCluster.cluster_id), as the API returns it."""
+        return self.station.cluster_id if self.station is not None else None
+
+class RecentFuelPrice(Base):
+    # Copy of the last few days of station-tagged Fuel_Info rows, which is all
+    # price aggregation reads (kept by app/services/recent_prices.py).
+    # Amounts are fixed-point integers so the database aggregates them without
+    # DECIMAL arithmetic
+    __tablename__ = "Recent_Fuel_Prices"
+    # Covers the nearby-price read: no table rows are touched to aggregate
+    __table_args__ = (Index('idx_recent_price_station_date_price', 'station_id', 'date', 'vehicle_id', 'unit_price'),)
+
+    fuel_id = Column(Integer, ForeignKey('Fuel_Info.fuel_id', ondelete='CASCADE'), primary_key=True)
+    vehicle_id = Column(Integer, nullable=False)  # Joined for the vehicle's current fuel type
+    station_id = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    liters_ml = Column(BigInteger)
+    kwh_wh = Column(BigInteger)
+    cost_centavos = Column(BigInteger)
+    # Pesos per liter (or per kWh when no liters), NULL when there is no price
+    unit_price = Column(Double, Computed(
+        "CASE WHEN cost_centavos <> 0 AND liters_ml > 0 THEN 10.0 * cost_centavos / liters_ml "
+        "WHEN cost_centavos <> 0 AND kwh_wh > 0 THEN 10.0 * cost_centavos / kwh_wh END",
+        persisted=True
+    ))
 
 class Reminder(Base):
     __tablename__ = "Reminders_Info"
@@ -87,11 +128,23 @@ class Reminder(Base):
     due_date = Column(Date, nullable=False)
     repeat_interval = Column(String(50))
     mileage_interval = Column(Integer)  # New field for mileage-based reminders
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0", index=True)  # Owner's data_version at last write (/sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user = relationship("User", back_populates="reminders")
     vehicle = relationship("Vehicle", back_populates="reminders")
 
+class SyncTombstone(Base):
+    __tablename__ = "Sync_Tombstones"
+
+    tombstone_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('Users.user_id', ondelete='CASCADE'), nullable=False, index=True)
+    entity = Column(String(20), nullable=False)  # vehicles, fuel, maintenance or reminders
+    entity_id = Column(Integer, nullable=False)
+    sync_version = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
 class PasswordResetToken(Base):
     __tablename__ = "Password_Reset_Tokens"
 
@@ -102,16 +155,76 @@ class PasswordResetToken(Base):
     used = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class RefreshToken(Base):
+    # One row per signed-in device; the token itself is rotated on every use
+    __tablename__ = "Refresh_Tokens"
+
+    token_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('Users.user_id', ondelete='CASCADE'), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)  # SHA-256 of the current token
+    previous_hash = Column(String(64), index=True)  # Token it replaced, to detect replays
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime)
+    revoked_at = Column(DateTime)
+
+class IdempotencyKey(Base):
+    # Responses of create requests sent with an Idempotency-Key (app/utils/idempotency.py)
+    __tablename__ = "Idempotency_Keys"
+    __table_args__ = (UniqueConstraint('user_id', 'idempotency_key', name='uq_idempotency_user_key'),)
+
+    key_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('Users.user_id', ondelete='CASCADE'), nullable=False)
+    idempotency_key = Column(String(64), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = Column(Integer)  # NULL while the first request is still running
+    response_body = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+class ClusteringJob(Base):
+    # Fuel logs waiting for a station cluster (app/services/clustering_queue.py)
+    __tablename__ = "Clustering_Jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    fuel_id = Column(Integer, ForeignKey('Fuel_Info.fuel_id', ondelete='CASCADE'), nullable=False, unique=True)
+    enqueued_at = Column(DateTime, default=datetime.utcnow, index=True)
+    claimed_by = Column(String(32))  # Token of the batch working on it; NULL while waiting
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Set when an update moved an already clustered log: the report (at the
+    # old position) is taken off this cluster when the log joins its new one
+    previous_station_id = Column(Integer)
+    previous_latitude = Column(DECIMAL(10,8))
+    previous_longitude = Column(DECIMAL(11,8))
+
+    fuel = relationship("Fuel")
+
 class GasStationCluster(Base):
     __tablename__ = "Gas_Station_Clusters"
 
-    cluster_id = Column(String(100), primary_key=True)
+    station_id = Column(Integer, primary_key=True, index=True)  # What Fuel_Info and Recent_Fuel_Prices store
+    cluster_id = Column(String(100), unique=True, nullable=False)  # Public slug, from _generate_cluster_id
     normalized_name = Column(String(255), nullable=False)
     latitude = Column(DECIMAL(10,8), nullable=False)
     longitude = Column(DECIMAL(11,8), nullable=False)
+    # Running sums of reported coordinates; latitude/longitude are their mean
+    sum_latitude = Column(DECIMAL(18,8), nullable=False, default=0, server_default="0")
+    sum_longitude = Column(DECIMAL(18,8), nullable=False, default=0, server_default="0")
     brand = Column(String(100))
     street = Column(String(255))
     city = Column(String(100))
     report_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # "stations" Cache_Versions counter that announced the last write; NULL
+    # until the writer announces it (app/services/station_index.py)
+    index_version = Column(BigInteger, default=0, server_default="0", index=True)
+
+class CacheVersion(Base):
+    # Counters bumped by every write to a table that workers keep in memory,
+    # so each worker can tell its copy is stale (app/services/station_index.py)
+    __tablename__ = "Cache_Versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
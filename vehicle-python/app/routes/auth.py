@@ -6,6 +6,7 @@ from ..models import models
 from ..schemas import schemas
 from ..utils.auth import verify_password, create_access_token, get_password_hash, get_current_active_user
 from ..utils.email import email_service
+from ..services import refresh_tokens
 from ..config import ACCESS_TOKEN_EXPIRE_MINUTES
 from datetime import datetime, timedelta
 import secrets
@@ -17,11 +18,14 @@ router = APIRouter(
 )
 
 @router.post("/token", response_model=schemas.Token)
-async def login_for_access_token(
+def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = db.query(models.User).filter(
+        models.User.email == form_data.username,
+        models.User.deleted_at.is_(None)
+    ).first()
     if not user or not verify_password(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,10 +36,38 @@ async def login_for_access_token(
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = refresh_tokens.issue(db, user.user_id)
+    db.commit()
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/refresh", response_model=schemas.Token)
+def refresh_access_token(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token and a new refresh token
+    (the old one stops working). No password check, so no bcrypt.
+    """
+    rotated = refresh_tokens.rotate(db, request.refresh_token)
+    db.commit()  # Also keeps a replay's revocation
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    email, refresh_token = rotated
+    access_token = create_access_token(
+        data={"sub": email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke a refresh token; its access token expires on its own."""
+    refresh_tokens.revoke(db, request.refresh_token)
+    db.commit()
 
 @router.post("/register", response_model=schemas.User)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
     if db_user:
@@ -60,7 +92,7 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
     return db_user
 
 @router.post("/forgot-password")
-async def forgot_password(
+def forgot_password(
     request: schemas.PasswordResetRequest, 
     db: Session = Depends(get_db)
 ):
@@ -68,7 +100,10 @@ async def forgot_password(
     Request password reset - generates a reset token and sends email
     """
     # Check if user exists
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+    user = db.query(models.User).filter(
+        models.User.email == request.email,
+        models.User.deleted_at.is_(None)
+    ).first()
     if not user:
         # For security, don't reveal if email exists or not
         return {"message": "If an account with this email exists, you will receive a password reset email"}
@@ -124,7 +159,7 @@ async def forgot_password(
     return {"message": "If an account with this email exists, you will receive a password reset email"}
 
 @router.post("/reset-password")
-async def reset_password(
+def reset_password(
     request: schemas.PasswordResetConfirm,
     db: Session = Depends(get_db)
 ):
@@ -146,7 +181,10 @@ async def reset_password(
         )
     
     # Find user by email
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+    user = db.query(models.User).filter(
+        models.User.email == request.email,
+        models.User.deleted_at.is_(None)
+    ).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -177,12 +215,14 @@ async def reset_password(
         models.PasswordResetToken.used == False
     ).delete(synchronize_session=False)
     
+    # Sign out every device
+    refresh_tokens.revoke_all(db, user.user_id)
     db.commit()
     
     return {"message": "Password reset successful. Please log in with your new password."}
 
 @router.post("/change-password")
-async def change_password(
+def change_password(
     request: schemas.ChangePassword,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -214,6 +254,8 @@ async def change_password(
     # Update password
     hashed_password = get_password_hash(request.new_password)
     current_user.password = hashed_password
+    # Sign out every device
+    refresh_tokens.revoke_all(db, current_user.user_id)
     db.commit()
     
     return {"message": "Password changed successfully"}
@@ -0,0 +1,149 @@
+"""
+Dashboard route - everything the app's home screen needs in one call.
+Replaces the per-vehicle fan-out of /vehicles/, /fuel/vehicle/{id},
+/maintenance/vehicle/{id} and /reminders/upcoming with a fixed number of
+queries, regardless of fleet size.
+"""
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import func, literal
+from sqlalchemy.orm import Session, aliased
+from datetime import date, timedelta
+from decimal import Decimal
+from ..database.database import get_db
+from ..models import models
+from ..schemas import schemas
+from ..utils.auth import get_current_active_user
+from ..utils.conditional import make_etag, not_modified
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["dashboard"]
+)
+
+
+def _latest_per_vehicle(db: Session, model, vehicle_ids, order_by):
+    """Latest row of a log table for each vehicle, in a single window query."""
+    ranked = db.query(
+        model,
+        func.row_number().over(
+            partition_by=model.vehicle_id,
+            order_by=order_by
+        ).label("row_number")
+    ).filter(model.vehicle_id.in_(vehicle_ids)).subquery()
+
+    latest = aliased(model, ranked)
+    rows = db.query(latest).filter(ranked.c.row_number == 1).all()
+    return {row.vehicle_id: row for row in rows}
+
+
+@router.get("/", response_model=schemas.Dashboard)
+def read_dashboard(
+    request: Request,
+    response: Response,
+    upcoming_days: int = 7,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Compact home screen summary: per-vehicle last fuel/maintenance log,
+    month-to-date spend, next due reminder and current mileage, plus the
+    reminders due in the next `upcoming_days` days.
+    """
+    today = date.today()
+    month_start = today.replace(day=1)
+
+    etag = make_etag("u", current_user.user_id, current_user.data_version, request, today)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    # Vehicles without the (potentially multi-MB) base64 image
+    vehicles = db.query(
+        models.Vehicle.vehicle_id,
+        models.Vehicle.make,
+        models.Vehicle.model,
+        models.Vehicle.year,
+        models.Vehicle.license_plate,
+        models.Vehicle.fuel_type,
+        models.Vehicle.current_mileage,
+        models.Vehicle.vehicle_image.isnot(None).label("has_image")
+    ).filter(
+        models.Vehicle.user_id == current_user.user_id
+    ).order_by(models.Vehicle.vehicle_id).all()
+
+    if not vehicles:
+        return {
+            "user": current_user,
+            "vehicles": [],
+            "month_to_date_spend": Decimal("0"),
+            "upcoming_reminders": []
+        }
+
+    vehicle_ids = [vehicle.vehicle_id for vehicle in vehicles]
+
+    last_fuel = _latest_per_vehicle(
+        db, models.Fuel, vehicle_ids,
+        [models.Fuel.date.desc(), models.Fuel.fuel_id.desc()]
+    )
+    last_maintenance = _latest_per_vehicle(
+        db, models.Maintenance, vehicle_ids,
+        [models.Maintenance.date.desc(), models.Maintenance.maintenance_id.desc()]
+    )
+
+    # Month-to-date spend for fuel and maintenance in one round trip
+    fuel_spend = db.query(
+        models.Fuel.vehicle_id.label("vehicle_id"),
+        literal("fuel").label("kind"),
+        func.sum(models.Fuel.cost).label("total")
+    ).filter(
+        models.Fuel.vehicle_id.in_(vehicle_ids),
+        models.Fuel.date >= month_start
+    ).group_by(models.Fuel.vehicle_id)
+    maintenance_spend = db.query(
+        models.Maintenance.vehicle_id.label("vehicle_id"),
+        literal("maintenance").label("kind"),
+        func.sum(models.Maintenance.cost).label("total")
+    ).filter(
+        models.Maintenance.vehicle_id.in_(vehicle_ids),
+        models.Maintenance.date >= month_start
+    ).group_by(models.Maintenance.vehicle_id)
+    spend = {
+        (row.vehicle_id, row.kind): Decimal(str(row.total or 0))
+        for row in fuel_spend.union_all(maintenance_spend).all()
+    }
+
+    # Future reminders: first one per vehicle, and the upcoming window
+    reminders = db.query(models.Reminder).filter(
+        models.Reminder.user_id == current_user.user_id,
+        models.Reminder.due_date >= today
+    ).order_by(models.Reminder.due_date, models.Reminder.reminder_id).all()
+    next_reminder = {}
+    for reminder in reminders:
+        next_reminder.setdefault(reminder.vehicle_id, reminder)
+    upcoming_until = today + timedelta(days=upcoming_days)
+    upcoming = [reminder for reminder in reminders if reminder.due_date <= upcoming_until]
+
+    summaries = []
+    for vehicle in vehicles:
+        summaries.append({
+            "vehicle_id": vehicle.vehicle_id,
+            "make": vehicle.make,
+            "model": vehicle.model,
+            "year": vehicle.year,
+            "license_plate": vehicle.license_plate,
+            "fuel_type": vehicle.fuel_type,
+            "current_mileage": vehicle.current_mileage or 0,
+            "has_image": bool(vehicle.has_image),
+            "last_fuel": last_fuel.get(vehicle.vehicle_id),
+            "last_maintenance": last_maintenance.get(vehicle.vehicle_id),
+            "next_reminder": next_reminder.get(vehicle.vehicle_id),
+            "month_to_date_fuel_cost": spend.get((vehicle.vehicle_id, "fuel"), Decimal("0")),
+            "month_to_date_maintenance_cost": spend.get((vehicle.vehicle_id, "maintenance"), Decimal("0"))
+        })
+
+    return {
+        "user": current_user,
+        "vehicles": summaries,
+        "month_to_date_spend": sum(spend.values(), Decimal("0")),
+        "upcoming_reminders": upcoming
+    }
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from ..database.database import get_db
 from ..models import models
 from ..schemas import schemas
 from ..utils.auth import get_current_active_user
+from ..utils import idempotency
+from ..utils.conditional import bump_versions, make_etag, not_modified
+from ..utils.patch import apply_changes
+from ..utils.serialization import select_as, rows_response
+from ..services.sync_service import SyncService
 from ..services.location_service import LocationService
+from ..services.clustering_queue import clustering_queue, enqueue as enqueue_clustering
+from ..services.price_events import publish_price_report, publish_station_update
+from ..services.price_snapshot import tile_for, tile_name
 from typing import List
 import logging
 
@@ -16,14 +24,22 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.Fuel)
-async def create_fuel_log(
+def create_fuel_log(
     fuel: schemas.FuelCreate,
+    request: Request,
+    body: bytes = Depends(idempotency.request_body),
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    # A retried request (same Idempotency-Key) gets the first response back
+    claim = idempotency.claim(request, body, db, current_user.user_id)
+    if claim.replay is not None:
+        return claim.replay
+
     try:
         logger.info(f"⛽ Creating fuel log for user {current_user.user_id}")
-        logger.info(f"📝 Fuel data received: {fuel.model_dump()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"📝 Fuel data received: {fuel.model_dump()}")
         
         # Verify vehicle belongs to user
         vehicle = db.query(models.Vehicle).filter(
@@ -38,59 +54,49 @@ async def create_fuel_log(
                 detail="Vehicle not found"
             )
 
-        logger.info(f"Creating Fuel object with data: {fuel.model_dump()}")
-        
-        # Process location data if coordinates are provided
+        # Normalize the location name; the station cluster is assigned after
+        # the commit by the clustering queue
         normalized_location = None
-        station_cluster_id = None
-        
-        if fuel.latitude is not None and fuel.longitude is not None:
-            logger.info(f"📍 Processing location: ({fuel.latitude}, {fuel.longitude})")
-            
-            # Normalize the location name
-            if fuel.location:
-                location_info = LocationService.normalize_location(fuel.location)
-                normalized_location = location_info["normalized"]
-                logger.info(f"📝 Normalized location: {normalized_location}")
-                
-                # Find or create station cluster
-                station_cluster_id = LocationService.find_or_create_station_cluster(
-                    db=db,
-                    lat=float(fuel.latitude),
-                    lng=float(fuel.longitude),
-                    normalized_name=normalized_location,
-                    brand=location_info["brand"],
-                    street=location_info["street"]
-                )
-                logger.info(f"🏪 Station cluster ID: {station_cluster_id}")
+        if fuel.latitude is not None and fuel.longitude is not None and fuel.location:
+            normalized_location = LocationService.normalize_location(fuel.location)["normalized"]
+            logger.info(f"📝 Normalized location: {normalized_location}")
         
         # Create fuel log with all data
         fuel_data = fuel.model_dump()
         fuel_data["normalized_location"] = normalized_location
-        fuel_data["station_cluster_id"] = station_cluster_id
         
         db_fuel = models.Fuel(**fuel_data)
-        logger.info(f"Adding to database...")
+        logger.debug("Adding to database...")
         db.add(db_fuel)
+        db_fuel.sync_version = bump_versions(db, current_user.user_id, fuel.vehicle_id)
+        job = enqueue_clustering(db, db_fuel)
+        claim.store(db, db_fuel, schemas.Fuel)
         
-        logger.info(f"Committing to database...")
+        logger.debug("Committing to database...")
         db.commit()
-        logger.info(f"Refreshing object...")
+        logger.debug("Refreshing object...")
         db.refresh(db_fuel)
         logger.info(f"✅ Fuel log created successfully with ID {db_fuel.fuel_id}")
+        
+        # Clustered (and announced to live price subscribers) in the background
+        if job is not None:
+            clustering_queue.submit(job.job_id)
         return db_fuel
     except Exception as e:
         logger.error(f"❌ ERROR creating fuel log: {type(e).__name__}: {str(e)}")
         logger.exception("Full traceback:")
         db.rollback()
+        claim.release(db)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create fuel log: {str(e)}"
         )
 
 @router.get("/vehicle/{vehicle_id}", response_model=List[schemas.Fuel])
-async def read_vehicle_fuel_logs(
+def read_vehicle_fuel_logs(
     vehicle_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_active_user),
@@ -108,14 +114,22 @@ async def read_vehicle_fuel_logs(
             detail="Vehicle not found"
         )
 
-    fuel_logs = db.query(models.Fuel).filter(
+    etag = make_etag("v", vehicle_id, vehicle.data_version, request)
+    cached = not_modified(request, response, etag, vehicle.data_updated_at)
+    if cached:
+        return cached
+
+    # Trusted rows: skip ORM hydration and response_model validation
+    fuel_logs = select_as(
+        db, models.Fuel, schemas.Fuel, station_cluster_id=models.GasStationCluster.cluster_id
+    ).outerjoin(models.Fuel.station).filter(
         models.Fuel.vehicle_id == vehicle_id
-    ).order_by(models.Fuel.date.desc()).offset(skip).limit(limit).all()
+    ).order_by(models.Fuel.date.desc()).offset(skip).limit(limit)
     
-    return fuel_logs
+    return rows_response(fuel_logs, response)
 
 @router.get("/{fuel_id}", response_model=schemas.Fuel)
-async def read_fuel_log(
+def read_fuel_log(
     fuel_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -132,13 +146,11 @@ async def read_fuel_log(
         )
     return fuel
 
-@router.put("/{fuel_id}", response_model=schemas.Fuel)
-async def update_fuel_log(
-    fuel_id: int,
-    fuel_update: schemas.FuelUpdate,
-    current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
+LOCATION_FIELDS = {"location", "latitude", "longitude"}
+# Fields the station's reported prices are computed from
+PRICE_FIELDS = {"cost", "liters", "kwh", "date", "vehicle_id"}
+
+def _update_fuel_log(fuel_id: int, update_data: dict, current_user, db: Session):
     try:
         fuel = db.query(models.Fuel).join(models.Vehicle).filter(
             models.Fuel.fuel_id == fuel_id,
@@ -151,38 +163,45 @@ async def update_fuel_log(
                 detail="Fuel log not found"
             )
 
-        # Get the update data
-        update_data = fuel_update.model_dump(exclude_unset=True)
+        # Where the log's report is counted now, in case the location moves
+        previous = (fuel.station_id, fuel.latitude, fuel.longitude)
+
+        # Update only the fields whose value changed
+        changed = apply_changes(fuel, update_data)
+        if not changed:
+            return fuel
         
-        # Process location data if coordinates are provided
-        if 'latitude' in update_data and 'longitude' in update_data:
-            if update_data['latitude'] is not None and update_data['longitude'] is not None:
-                logger.info(f"📍 Processing updated location: ({update_data['latitude']}, {update_data['longitude']})")
-                
-                # Normalize the location name
-                if 'location' in update_data and update_data['location']:
-                    location_info = LocationService.normalize_location(update_data['location'])
-                    update_data['normalized_location'] = location_info["normalized"]
-                    logger.info(f"📝 Normalized location: {update_data['normalized_location']}")
-                    
-                    # Find or create station cluster
-                    update_data['station_cluster_id'] = LocationService.find_or_create_station_cluster(
-                        db=db,
-                        lat=float(update_data['latitude']),
-                        lng=float(update_data['longitude']),
-                        normalized_name=update_data['normalized_location'],
-                        brand=location_info["brand"],
-                        street=location_info["street"]
-                    )
-                    logger.info(f"🏪 Station cluster ID: {update_data['station_cluster_id']}")
-
-        # Update fuel fields
-        for key, value in update_data.items():
-            setattr(fuel, key, value)
+        # Re-cluster only when the location itself moved or was renamed, in
+        # the same post-commit queue as new logs: the job moves the report
+        # from the old cluster to the new one
+        job = None
+        if changed & LOCATION_FIELDS:
+            logger.info(f"📍 Processing updated location: ({fuel.latitude}, {fuel.longitude})")
+            fuel.normalized_location = None
+            if fuel.latitude is not None and fuel.longitude is not None and fuel.location:
+                fuel.normalized_location = LocationService.normalize_location(fuel.location)["normalized"]
+                logger.info(f"📝 Normalized location: {fuel.normalized_location}")
+            fuel.station_id = None
+            job = enqueue_clustering(db, fuel, *previous)
 
+        fuel.sync_version = bump_versions(db, current_user.user_id, fuel.vehicle_id)
         db.commit()
         db.refresh(fuel)
-        logger.info(f"✅ Fuel log {fuel_id} updated successfully")
+        logger.info(f"✅ Fuel log {fuel_id} updated successfully ({', '.join(sorted(changed))})")
+        if job is not None:
+            clustering_queue.submit(job.job_id)
+
+        # Tell price feeds and the snapshot the station's prices changed; the
+        # new cluster's own event follows from the clustering job
+        if job is not None and previous[0] is not None:
+            stale = [
+                tile_name(tile_for(float(lat), float(lng)))
+                for lat, lng in (previous[1:], (fuel.latitude, fuel.longitude))
+                if lat is not None and lng is not None
+            ]
+            publish_station_update(db, previous[0], stale)
+        elif changed & PRICE_FIELDS and fuel.station_id is not None:
+            publish_price_report(db, fuel, fuel.vehicle.fuel_type, "price_update")
         return fuel
     except HTTPException:
         raise
@@ -195,8 +214,26 @@ async def update_fuel_log(
             detail=f"Failed to update fuel log: {str(e)}"
         )
 
+@router.put("/{fuel_id}", response_model=schemas.Fuel)
+def update_fuel_log(
+    fuel_id: int,
+    fuel_update: schemas.FuelUpdate,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_fuel_log(fuel_id, fuel_update.model_dump(exclude_unset=True), current_user, db)
+
+@router.patch("/{fuel_id}", response_model=schemas.Fuel)
+def patch_fuel_log(
+    fuel_id: int,
+    fuel_patch: schemas.FuelPatch,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_fuel_log(fuel_id, fuel_patch.model_dump(exclude_unset=True), current_user, db)
+
 @router.delete("/{fuel_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_fuel_log(
+def delete_fuel_log(
     fuel_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -213,5 +250,7 @@ async def delete_fuel_log(
         )
     
     db.delete(fuel)
+    version = bump_versions(db, current_user.user_id, fuel.vehicle_id)
+    SyncService.record_deletion(db, current_user.user_id, "fuel", fuel_id, version)
     db.commit()
     return {"ok": True}
@@ -45,7 +45,7 @@ class RateLimiter:
 nominatim_limiter = RateLimiter(min_interval=1.0)
 
 @router.get("/search")
-async def search_location(
+def search_location(
     query: str = Query(..., description="Search query for location"),
     country_code: str = Query("ph", description="Country code filter (default: Philippines)")
 ):
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from ..database.database import get_db
 from ..models import models
 from ..schemas import schemas
 from ..utils.auth import get_current_active_user
+from ..utils import idempotency
+from ..utils.conditional import bump_versions, make_etag, not_modified
+from ..utils.patch import apply_changes
+from ..utils.serialization import select_as, rows_response
+from ..services.sync_service import SyncService
 from ..services.mileage_service import MileageService
 from typing import List
 import logging
@@ -16,14 +21,22 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.Maintenance)
-async def create_maintenance(
+def create_maintenance(
     maintenance: schemas.MaintenanceCreate,
+    request: Request,
+    body: bytes = Depends(idempotency.request_body),
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    # A retried request (same Idempotency-Key) gets the first response back
+    claim = idempotency.claim(request, body, db, current_user.user_id)
+    if claim.replay is not None:
+        return claim.replay
+
     try:
         logger.info(f"🔧 Creating maintenance log for user {current_user.user_id}")
-        logger.info(f"📝 Maintenance data received: {maintenance.model_dump()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"📝 Maintenance data received: {maintenance.model_dump()}")
         
         # Verify vehicle belongs to user
         vehicle = db.query(models.Vehicle).filter(
@@ -39,25 +52,30 @@ async def create_maintenance(
             )
 
         # Create maintenance record
-        logger.info(f"Creating Maintenance object with data: {maintenance.model_dump()}")
         db_maintenance = models.Maintenance(**maintenance.model_dump())
-        logger.info(f"Adding to database...")
+        logger.debug("Adding to database...")
         db.add(db_maintenance)
         
         # 🚗 NEW: Update vehicle mileage using centralized service
+        mileage_changed = False
         if maintenance.mileage:
             logger.info(f"Updating vehicle mileage to {maintenance.mileage}")
             success, message = MileageService.update_vehicle_mileage(
-                db, maintenance.vehicle_id, maintenance.mileage
+                db, maintenance.vehicle_id, maintenance.mileage, commit=False
             )
+            mileage_changed = success
             if success:
                 logger.info(f"Maintenance creation: {message}")
             else:
                 logger.warning(f"Mileage update failed during maintenance creation: {message}")
         
-        logger.info(f"Committing to database...")
+        db_maintenance.sync_version = bump_versions(
+            db, current_user.user_id, maintenance.vehicle_id, vehicle_changed=mileage_changed
+        )
+        claim.store(db, db_maintenance, schemas.Maintenance)
+        logger.debug("Committing to database...")
         db.commit()
-        logger.info(f"Refreshing object...")
+        logger.debug("Refreshing object...")
         db.refresh(db_maintenance)
         logger.info(f"✅ Maintenance log created successfully with ID {db_maintenance.maintenance_id}")
         return db_maintenance
@@ -65,14 +83,17 @@ async def create_maintenance(
         logger.error(f"❌ ERROR creating maintenance log: {type(e).__name__}: {str(e)}")
         logger.exception("Full traceback:")
         db.rollback()
+        claim.release(db)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create maintenance log: {str(e)}"
         )
 
 @router.get("/vehicle/{vehicle_id}", response_model=List[schemas.Maintenance])
-async def read_vehicle_maintenance(
+def read_vehicle_maintenance(
     vehicle_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_active_user),
@@ -90,14 +111,20 @@ async def read_vehicle_maintenance(
             detail="Vehicle not found"
         )
 
-    maintenance_logs = db.query(models.Maintenance).filter(
+    etag = make_etag("v", vehicle_id, vehicle.data_version, request)
+    cached = not_modified(request, response, etag, vehicle.data_updated_at)
+    if cached:
+        return cached
+
+    # Trusted rows: skip ORM hydration and response_model validation
+    maintenance_logs = select_as(db, models.Maintenance, schemas.Maintenance).filter(
         models.Maintenance.vehicle_id == vehicle_id
-    ).order_by(models.Maintenance.date.desc()).offset(skip).limit(limit).all()
+    ).order_by(models.Maintenance.date.desc()).offset(skip).limit(limit)
     
-    return maintenance_logs
+    return rows_response(maintenance_logs, response)
 
 @router.get("/{maintenance_id}", response_model=schemas.Maintenance)
-async def read_maintenance(
+def read_maintenance(
     maintenance_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -114,13 +141,7 @@ async def read_maintenance(
         )
     return maintenance
 
-@router.put("/{maintenance_id}", response_model=schemas.Maintenance)
-async def update_maintenance(
-    maintenance_id: int,
-    maintenance_update: schemas.MaintenanceUpdate,
-    current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
+def _update_maintenance(maintenance_id: int, update_data: dict, current_user, db: Session):
     maintenance = db.query(models.Maintenance).join(models.Vehicle).filter(
         models.Maintenance.maintenance_id == maintenance_id,
         models.Vehicle.user_id == current_user.user_id
@@ -132,26 +153,50 @@ async def update_maintenance(
             detail="Maintenance log not found"
         )
 
-    # Update maintenance fields
-    for key, value in maintenance_update.model_dump(exclude_unset=True).items():
-        setattr(maintenance, key, value)
+    # Update only the fields whose value changed
+    changed = apply_changes(maintenance, update_data)
+    if not changed:
+        return maintenance
 
     # 🚗 NEW: Update vehicle mileage if mileage was updated
-    if maintenance_update.mileage:
+    mileage_changed = False
+    if "mileage" in changed and maintenance.mileage:
         success, message = MileageService.update_vehicle_mileage(
-            db, maintenance.vehicle_id, maintenance_update.mileage
+            db, maintenance.vehicle_id, maintenance.mileage, commit=False
         )
+        mileage_changed = success
         if success:
             logger.info(f"Maintenance update: {message}")
         else:
             logger.warning(f"Mileage update failed during maintenance update: {message}")
 
+    maintenance.sync_version = bump_versions(
+        db, current_user.user_id, maintenance.vehicle_id, vehicle_changed=mileage_changed
+    )
     db.commit()
     db.refresh(maintenance)
     return maintenance
 
+@router.put("/{maintenance_id}", response_model=schemas.Maintenance)
+def update_maintenance(
+    maintenance_id: int,
+    maintenance_update: schemas.MaintenanceUpdate,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_maintenance(maintenance_id, maintenance_update.model_dump(exclude_unset=True), current_user, db)
+
+@router.patch("/{maintenance_id}", response_model=schemas.Maintenance)
+def patch_maintenance(
+    maintenance_id: int,
+    maintenance_patch: schemas.MaintenancePatch,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_maintenance(maintenance_id, maintenance_patch.model_dump(exclude_unset=True), current_user, db)
+
 @router.delete("/{maintenance_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_maintenance(
+def delete_maintenance(
     maintenance_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -172,11 +217,13 @@ async def delete_maintenance(
     
     # 🚗 NEW: Recalculate vehicle mileage after deletion
     # This ensures mileage stays accurate even when logs are deleted
-    success, message = MileageService.sync_vehicle_mileage(db, vehicle_id)
+    success, message = MileageService.sync_vehicle_mileage(db, vehicle_id, commit=False)
     if success:
         logger.info(f"Maintenance deletion: {message}")
     else:
         logger.warning(f"Mileage sync failed after maintenance deletion: {message}")
     
+    version = bump_versions(db, current_user.user_id, vehicle_id, vehicle_changed=success)
+    SyncService.record_deletion(db, current_user.user_id, "maintenance", maintenance_id, version)
     db.commit()
     return {"ok": True}
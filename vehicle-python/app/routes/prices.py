@@ -2,20 +2,36 @@
 Fuel prices routes - Community-sourced real-time fuel pricing.
 Aggregates fuel log data to show current prices at nearby stations.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import gzip
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+from app.config import (
+    PRICE_SNAPSHOT_DIR, PRICE_SNAPSHOT_MAX_AGE_SECONDS, PRICE_SNAPSHOT_BASE_URL,
+    PRICE_EVENTS_HEARTBEAT_SECONDS
+)
 from app.database.database import get_db
 from app.services.location_service import LocationService
+from app.services.price_snapshot import PriceSnapshotStore, tile_name, tiles_for_radius
+from app.services.price_events import price_event_hub, format_sse
+from app.utils.compression import negotiate_encoding
+from app.utils.serialization import ORJSONResponse
 
 router = APIRouter(
     prefix="/fuel-prices",
     tags=["Fuel Prices"]
 )
 
+# Newest static snapshot, used instead of live aggregation while it is fresh
+price_snapshots = PriceSnapshotStore(PRICE_SNAPSHOT_DIR, PRICE_SNAPSHOT_MAX_AGE_SECONDS)
+# Corrected or moved reports make their tiles stale until the next build
+price_event_hub.add_listener(lambda event: price_snapshots.on_price_event(event))
+
 
 @router.get("/nearby")
-async def get_nearby_fuel_prices(
+def get_nearby_fuel_prices(
     latitude: float = Query(..., description="User's latitude"),
     longitude: float = Query(..., description="User's longitude"),
     radius_km: float = Query(5.0, ge=0.1, le=50, description="Search radius in kilometers"),
@@ -32,6 +48,8 @@ async def get_nearby_fuel_prices(
     - 7d: Last 7 days (maximum range)
     
     Returns prices with freshness indicators (hours_since_update).
+    Served from the latest price snapshot when one is fresh (and none of
+    its tiles in range went stale), otherwise aggregated live from the database.
     """
     # Convert time_window to days_back
     time_window_map = {
@@ -42,9 +60,18 @@ async def get_nearby_fuel_prices(
     }
     days_back = time_window_map.get(time_window, 3)
     
+    snapshot = price_snapshots.current()
+    if snapshot and any(
+        price_snapshots.is_stale(snapshot, tile_name(tile))
+        for tile in tiles_for_radius(latitude, longitude, radius_km)
+    ):
+        snapshot = None
+    source = snapshot if snapshot else LocationService
+    source_kwargs = {} if snapshot else {"db": db}
+    
     # Get clustered fuel prices
-    results = LocationService.get_fuel_price_data(
-        db=db,
+    results = source.get_fuel_price_data(
+        **source_kwargs,
         latitude=latitude,
         longitude=longitude,
         radius_km=radius_km,
@@ -54,8 +81,8 @@ async def get_nearby_fuel_prices(
     
     # If "today" window and no results, fallback to 24h
     if time_window == "today" and not results:
-        results = LocationService.get_fuel_price_data(
-            db=db,
+        results = source.get_fuel_price_data(
+            **source_kwargs,
             latitude=latitude,
             longitude=longitude,
             radius_km=radius_km,
@@ -67,12 +94,52 @@ async def get_nearby_fuel_prices(
             result["is_fallback"] = True
             result["fallback_message"] = "No prices today. Showing last 24 hours."
     
-    return {
+    # Plain dicts of floats and strings: encode directly, skipping jsonable_encoder
+    return ORJSONResponse({
         "time_window": time_window,
         "days_back": days_back,
         "count": len(results),
+        "snapshot_version": snapshot.version if snapshot else None,
         "stations": results
-    }
+    })
+
+@router.get("/stream")
+async def stream_price_updates(
+    request: Request,
+    latitude: float = Query(..., description="Center latitude of the watched area"),
+    longitude: float = Query(..., description="Center longitude of the watched area"),
+    radius_km: float = Query(5.0, ge=0.1, le=50, description="Watched radius in kilometers")
+):
+    """
+    Server-Sent Events feed of new price reports within a radius.
+    Each `price` event carries the station, fuel type and reported price, so
+    clients can patch their /fuel-prices/nearby results instead of re-polling.
+    """
+    subscription = price_event_hub.subscribe(latitude, longitude, radius_km)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=PRICE_EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            price_event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/statistics")
 def get_price_statistics(
     fuel_type: Optional[str] = Query(None, description="Filter by fuel type"),
@@ -92,3 +159,55 @@ def get_price_statistics(
         "success": True,
         "message": "Price statistics endpoint - Coming soon!"
     }
+
+
+@router.get("/snapshot/manifest")
+def get_snapshot_manifest(request: Request):
+    """
+    Manifest of the current price snapshot: version, tile size and per-tile
+    file paths with ETags. Tile (x, y) = floor(lng / tile_degrees), floor(lat / tile_degrees).
+    """
+    snapshot = price_snapshots.current()
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="No fresh price snapshot available")
+
+    body, encoding = snapshot.manifest_body.encoded(request.headers.get("accept-encoding"))
+    etag = f'"{snapshot.version}-{encoding}"' if encoding else f'"{snapshot.version}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/snapshot/tiles/{tile}")
+def get_snapshot_tile(tile: str, request: Request):
+    """
+    Serve one snapshot tile. Redirects to the CDN when PRICE_SNAPSHOT_BASE_URL
+    is configured, otherwise returns the precompressed file with its ETag.
+    """
+    snapshot = price_snapshots.current()
+    info = snapshot.tile_info(tile) if snapshot else None
+    if not info or price_snapshots.is_stale(snapshot, tile):
+        raise HTTPException(status_code=404, detail="Tile not found in current snapshot")
+
+    if PRICE_SNAPSHOT_BASE_URL:
+        return RedirectResponse(f"{PRICE_SNAPSHOT_BASE_URL.rstrip('/')}/{info['file']}", status_code=302)
+
+    # Serve the stored compressed file that matches the client; only
+    # clients accepting neither get a decompressed copy
+    available = ("br", "gzip") if "br_file" in info else ("gzip",)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), available)
+    etag = info["br_etag"] if encoding == "br" else info["etag"]
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    with open(snapshot.tile_path(tile, encoding), "rb") as f:
+        data = f.read()
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    else:
+        data = gzip.decompress(data)
+    return Response(content=data, media_type="application/json", headers=headers)
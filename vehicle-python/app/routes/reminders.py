@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from ..database.database import get_db
 from ..models import models
 from ..schemas import schemas
 from ..utils.auth import get_current_active_user
+from ..utils.conditional import bump_versions, make_etag, not_modified
+from ..utils.patch import apply_changes
+from ..services.sync_service import SyncService
 from typing import List
 from datetime import date, timedelta
 
@@ -13,36 +16,52 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.Reminder)
-async def create_reminder(
+def create_reminder(
     reminder: schemas.ReminderCreate,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     db_reminder = models.Reminder(**reminder.model_dump(), user_id=current_user.user_id)
     db.add(db_reminder)
+    db_reminder.sync_version = bump_versions(db, current_user.user_id, reminder.vehicle_id)
     db.commit()
     db.refresh(db_reminder)
     return db_reminder
 
 @router.get("/", response_model=List[schemas.Reminder])
-async def read_reminders(
+def read_reminders(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    etag = make_etag("u", current_user.user_id, current_user.data_version, request)
+    cached = not_modified(request, response, etag, current_user.data_updated_at)
+    if cached:
+        return cached
+
     reminders = db.query(models.Reminder).filter(
         models.Reminder.user_id == current_user.user_id
     ).order_by(models.Reminder.due_date).offset(skip).limit(limit).all()
     return reminders
 
 @router.get("/upcoming", response_model=List[schemas.Reminder])
-async def read_upcoming_reminders(
+def read_upcoming_reminders(
+    request: Request,
+    response: Response,
     days: int = 7,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     today = date.today()
+    # Result also depends on the current date
+    etag = make_etag("u", current_user.user_id, current_user.data_version, request, today)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     future_date = today + timedelta(days=days)
     reminders = db.query(models.Reminder).filter(
         models.Reminder.user_id == current_user.user_id,
@@ -52,11 +71,19 @@ async def read_upcoming_reminders(
     return reminders
 
 @router.get("/overdue", response_model=List[schemas.Reminder])
-async def read_overdue_reminders(
+def read_overdue_reminders(
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     today = date.today()
+    # Result also depends on the current date
+    etag = make_etag("u", current_user.user_id, current_user.data_version, request, today)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     reminders = db.query(models.Reminder).filter(
         models.Reminder.user_id == current_user.user_id,
         models.Reminder.due_date < today
@@ -64,7 +91,7 @@ async def read_overdue_reminders(
     return reminders
 
 @router.get("/{reminder_id}", response_model=schemas.Reminder)
-async def read_reminder(
+def read_reminder(
     reminder_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -81,13 +108,7 @@ async def read_reminder(
         )
     return reminder
 
-@router.put("/{reminder_id}", response_model=schemas.Reminder)
-async def update_reminder(
-    reminder_id: int,
-    reminder_update: schemas.ReminderUpdate,
-    current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
+def _update_reminder(reminder_id: int, update_data: dict, current_user, db: Session):
     reminder = db.query(models.Reminder).filter(
         models.Reminder.reminder_id == reminder_id,
         models.Reminder.user_id == current_user.user_id
@@ -99,16 +120,35 @@ async def update_reminder(
             detail="Reminder not found"
         )
 
-    # Update reminder fields
-    for key, value in reminder_update.model_dump(exclude_unset=True).items():
-        setattr(reminder, key, value)
+    # Update only the fields whose value changed
+    if not apply_changes(reminder, update_data):
+        return reminder
 
+    reminder.sync_version = bump_versions(db, current_user.user_id, reminder.vehicle_id)
     db.commit()
     db.refresh(reminder)
     return reminder
 
+@router.put("/{reminder_id}", response_model=schemas.Reminder)
+def update_reminder(
+    reminder_id: int,
+    reminder_update: schemas.ReminderUpdate,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_reminder(reminder_id, reminder_update.model_dump(exclude_unset=True), current_user, db)
+
+@router.patch("/{reminder_id}", response_model=schemas.Reminder)
+def patch_reminder(
+    reminder_id: int,
+    reminder_patch: schemas.ReminderPatch,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_reminder(reminder_id, reminder_patch.model_dump(exclude_unset=True), current_user, db)
+
 @router.delete("/{reminder_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_reminder(
+def delete_reminder(
     reminder_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -125,5 +165,7 @@ async def delete_reminder(
         )
         
     db.delete(reminder)
+    version = bump_versions(db, current_user.user_id, reminder.vehicle_id)
+    SyncService.record_deletion(db, current_user.user_id, "reminders", reminder_id, version)
     db.commit()
     return {"ok": True}
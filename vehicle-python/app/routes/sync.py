@@ -0,0 +1,37 @@
+"""
+Delta sync route for offline-first clients.
+
+GET /sync returns everything; GET /sync?since=<token> returns only rows
+created, changed or deleted since that token. Deleting a vehicle deletes its
+logs and reminders too, so clients drop those locally when a vehicle id
+appears in `deleted.vehicles`.
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from ..database.database import get_db
+from ..schemas import schemas
+from ..services.sync_service import SyncService
+from ..utils.auth import get_current_active_user
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"]
+)
+
+
+@router.get("/", response_model=schemas.SyncChanges)
+def sync_changes(
+    since: Optional[str] = None,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        version = SyncService.parse_token(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+
+    return SyncService.changes_since(db, current_user, version)
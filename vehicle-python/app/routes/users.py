@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from ..database.database import get_db
 from ..models import models
 from ..schemas import schemas
+from ..services import refresh_tokens
+from ..services.account_purge import purge_user_in_background, released_email
 from ..utils.auth import get_current_active_user, get_password_hash
+from ..utils.conditional import bump_versions
 from typing import List
 
 router = APIRouter(
@@ -12,11 +16,11 @@ router = APIRouter(
 )
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user = Depends(get_current_active_user)):
+def read_users_me(current_user = Depends(get_current_active_user)):
     return current_user
 
 @router.put("/me", response_model=schemas.User)
-async def update_user(
+def update_user(
     user_update: schemas.UserUpdate,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -38,20 +42,28 @@ async def update_user(
         current_user.email = user_update.email
     if user_update.password is not None:
         current_user.password = get_password_hash(user_update.password)
+        refresh_tokens.revoke_all(db, current_user.user_id)
     if user_update.mileage_type is not None:
         current_user.mileage_type = user_update.mileage_type
     if user_update.dark_mode is not None:
         current_user.dark_mode = user_update.dark_mode
 
+    # /dashboard/ embeds the profile, so its ETag must change too
+    bump_versions(db, current_user.user_id)
     db.commit()
     db.refresh(current_user)
     return current_user
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(
+def delete_user(
+    background_tasks: BackgroundTasks,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    db.delete(current_user)
+    # The account is unusable from here; its rows are deleted in chunks after the response
+    current_user.deleted_at = datetime.utcnow()
+    # Free the email now, not when the purge finishes (or a failed one is retried)
+    current_user.email = released_email(current_user.user_id)
     db.commit()
+    background_tasks.add_task(purge_user_in_background, current_user.user_id)
     return {"ok": True}
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from ..database.database import get_db
 from ..models import models
 from ..schemas import schemas
 from ..utils.auth import get_current_active_user
 from ..services.mileage_service import MileageService
+from ..utils.conditional import bump_versions, make_etag, not_modified
+from ..utils.patch import apply_changes
+from ..services.sync_service import SyncService
 from typing import List
 
 router = APIRouter(
@@ -13,7 +16,7 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.Vehicle)
-async def create_vehicle(
+def create_vehicle(
     vehicle: schemas.VehicleCreate,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -31,25 +34,35 @@ async def create_vehicle(
 
     db_vehicle = models.Vehicle(**vehicle.model_dump(), user_id=current_user.user_id)
     db.add(db_vehicle)
+    db_vehicle.sync_version = bump_versions(db, current_user.user_id)
     db.commit()
     db.refresh(db_vehicle)
     return db_vehicle
 
 @router.get("/", response_model=List[schemas.Vehicle])
-async def read_vehicles(
+def read_vehicles(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    etag = make_etag("u", current_user.user_id, current_user.data_version, request)
+    cached = not_modified(request, response, etag, current_user.data_updated_at)
+    if cached:
+        return cached
+
     vehicles = db.query(models.Vehicle).filter(
         models.Vehicle.user_id == current_user.user_id
     ).offset(skip).limit(limit).all()
     return vehicles
 
 @router.get("/{vehicle_id}", response_model=schemas.Vehicle)
-async def read_vehicle(
+def read_vehicle(
     vehicle_id: int,
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -63,10 +76,15 @@ async def read_vehicle(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found"
         )
+
+    etag = make_etag("v", vehicle_id, vehicle.data_version, request)
+    cached = not_modified(request, response, etag, vehicle.data_updated_at)
+    if cached:
+        return cached
     return vehicle
 
 @router.get("/{vehicle_id}/mileage", response_model=dict)
-async def get_vehicle_mileage_info(
+def get_vehicle_mileage_info(
     vehicle_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -101,13 +119,7 @@ async def get_vehicle_mileage_info(
         "is_synced": current_mileage == latest_from_logs
     }
 
-@router.put("/{vehicle_id}", response_model=schemas.Vehicle)
-async def update_vehicle(
-    vehicle_id: int,
-    vehicle_update: schemas.VehicleUpdate,
-    current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
+def _update_vehicle(vehicle_id: int, update_data: dict, current_user, db: Session):
     db_vehicle = db.query(models.Vehicle).filter(
         models.Vehicle.vehicle_id == vehicle_id,
         models.Vehicle.user_id == current_user.user_id
@@ -119,16 +131,36 @@ async def update_vehicle(
             detail="Vehicle not found"
         )
 
-    # Update vehicle fields
-    for key, value in vehicle_update.model_dump(exclude_unset=True).items():
-        setattr(db_vehicle, key, value)
+    # Update only the fields whose value changed
+    if not apply_changes(db_vehicle, update_data):
+        return db_vehicle
 
+    bump_versions(db, current_user.user_id, vehicle_id, vehicle_changed=True)
     db.commit()
     db.refresh(db_vehicle)
     return db_vehicle
 
+@router.put("/{vehicle_id}", response_model=schemas.Vehicle)
+def update_vehicle(
+    vehicle_id: int,
+    vehicle_update: schemas.VehicleUpdate,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return _update_vehicle(vehicle_id, vehicle_update.model_dump(exclude_unset=True), current_user, db)
+
+@router.patch("/{vehicle_id}", response_model=schemas.Vehicle)
+def patch_vehicle(
+    vehicle_id: int,
+    vehicle_patch: schemas.VehiclePatch,
+    current_user = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    # Lets clients change e.g. mileage without re-sending vehicle_image
+    return _update_vehicle(vehicle_id, vehicle_patch.model_dump(exclude_unset=True), current_user, db)
+
 @router.delete("/{vehicle_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_vehicle(
+def delete_vehicle(
     vehicle_id: int,
     current_user = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -144,6 +176,10 @@ async def delete_vehicle(
             detail="Vehicle not found"
         )
         
+    # One DELETE: logs and reminders go with it through ON DELETE CASCADE
     db.delete(vehicle)
+    version = bump_versions(db, current_user.user_id)
+    # Clients drop the vehicle's logs and reminders along with it
+    SyncService.record_deletion(db, current_user.user_id, "vehicles", vehicle_id, version)
     db.commit()
     return {"ok": True}
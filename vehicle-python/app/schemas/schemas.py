@@ -1,8 +1,20 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
+import datetime
 from datetime import date
-from typing import Optional, List
+from typing import ClassVar, Optional, List, Tuple
 from decimal import Decimal
 
+class PatchBase(BaseModel):
+    """All-optional PATCH body: only the fields sent are applied."""
+    not_null: ClassVar[Tuple[str, ...]] = ()  # Fields that may be omitted but not cleared
+
+    @model_validator(mode="after")
+    def reject_cleared_required_fields(self):
+        cleared = [name for name in self.not_null if name in self.model_fields_set and getattr(self, name) is None]
+        if cleared:
+            raise ValueError(f"{', '.join(cleared)} cannot be null")
+        return self
+
 # User Schemas
 class UserBase(BaseModel):
     full_name: str
@@ -45,6 +57,20 @@ class VehicleCreate(VehicleBase):
 class VehicleUpdate(VehicleBase):
     pass
 
+class VehiclePatch(PatchBase):
+    not_null = ("make", "model", "year", "current_mileage")
+
+    make: Optional[str] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    color: Optional[str] = None
+    license_plate: Optional[str] = None
+    vin: Optional[str] = None
+    current_mileage: Optional[int] = None
+    fuel_type: Optional[str] = None
+    purchase_date: Optional[date] = None
+    vehicle_image: Optional[str] = None
+
 class Vehicle(VehicleBase):
     vehicle_id: int
     user_id: int
@@ -68,6 +94,17 @@ class MaintenanceCreate(MaintenanceBase):
 class MaintenanceUpdate(MaintenanceBase):
     pass
 
+class MaintenancePatch(PatchBase):
+    not_null = ("date",)
+
+    date: Optional[datetime.date] = None  # The field name shadows the type here
+    maintenance_type: Optional[str] = None
+    description: Optional[str] = None
+    mileage: Optional[int] = None
+    cost: Optional[Decimal] = Field(None, decimal_places=2)
+    location: Optional[str] = None
+    notes: Optional[str] = None
+
 class Maintenance(MaintenanceBase):
     maintenance_id: int
     vehicle_id: int
@@ -93,6 +130,19 @@ class FuelCreate(FuelBase):
 class FuelUpdate(FuelBase):
     pass
 
+class FuelPatch(PatchBase):
+    not_null = ("date", "cost", "full_tank")
+
+    date: Optional[datetime.date] = None
+    liters: Optional[Decimal] = None
+    kwh: Optional[Decimal] = None
+    cost: Optional[Decimal] = None
+    location: Optional[str] = None
+    latitude: Optional[Decimal] = None
+    longitude: Optional[Decimal] = None
+    full_tank: Optional[bool] = None
+    notes: Optional[str] = None
+
 class Fuel(FuelBase):
     fuel_id: int
     vehicle_id: int
@@ -116,6 +166,15 @@ class ReminderCreate(ReminderBase):
 class ReminderUpdate(ReminderBase):
     pass
 
+class ReminderPatch(PatchBase):
+    not_null = ("title", "due_date")
+
+    title: Optional[str] = None
+    description: Optional[str] = None
+    due_date: Optional[date] = None
+    repeat_interval: Optional[str] = None
+    mileage_interval: Optional[int] = None
+
 class Reminder(ReminderBase):
     reminder_id: int
     user_id: int
@@ -124,10 +183,83 @@ class Reminder(ReminderBase):
     class Config:
         from_attributes = True
 
+# Dashboard Schemas (slim summaries, no images or notes)
+class DashboardFuel(BaseModel):
+    fuel_id: int
+    date: date
+    liters: Optional[Decimal] = None
+    kwh: Optional[Decimal] = None
+    cost: Decimal
+    normalized_location: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class DashboardMaintenance(BaseModel):
+    maintenance_id: int
+    date: date
+    maintenance_type: Optional[str] = None
+    mileage: Optional[int] = None
+    cost: Optional[Decimal] = None
+
+    class Config:
+        from_attributes = True
+
+class DashboardReminder(BaseModel):
+    reminder_id: int
+    vehicle_id: int
+    title: str
+    due_date: date
+    mileage_interval: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class DashboardVehicle(BaseModel):
+    vehicle_id: int
+    make: str
+    model: str
+    year: int
+    license_plate: Optional[str] = None
+    fuel_type: Optional[str] = None
+    current_mileage: int = 0
+    has_image: bool = False
+    last_fuel: Optional[DashboardFuel] = None
+    last_maintenance: Optional[DashboardMaintenance] = None
+    next_reminder: Optional[DashboardReminder] = None
+    month_to_date_fuel_cost: Decimal = Decimal("0")
+    month_to_date_maintenance_cost: Decimal = Decimal("0")
+
+class Dashboard(BaseModel):
+    user: User
+    vehicles: List[DashboardVehicle]
+    month_to_date_spend: Decimal
+    upcoming_reminders: List[DashboardReminder]
+
+# Sync Schemas
+class SyncDeleted(BaseModel):
+    vehicles: List[int] = []
+    fuel: List[int] = []
+    maintenance: List[int] = []
+    reminders: List[int] = []
+
+class SyncChanges(BaseModel):
+    token: str  # Pass back as ?since= on the next sync
+    full: bool  # True when the client must replace its local store
+    vehicles: List[Vehicle]
+    fuel: List[Fuel]
+    maintenance: List[Maintenance]
+    reminders: List[Reminder]
+    deleted: SyncDeleted
+
 # Token Schemas
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None  # Exchange at /auth/refresh instead of logging in again
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
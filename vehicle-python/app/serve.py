@@ -0,0 +1,183 @@
+"""
+Production server entry point:
+
+    python -m app.serve [--workers N] [--host 0.0.0.0] [--port 8000]
+
+Runs the API under gunicorn with uvicorn workers, using uvloop and httptools
+when they are installed. The app is imported once in the master before the
+workers are forked (preload), so table creation and module-level setup run
+once instead of once per worker. Without gunicorn (e.g. on Windows) it falls
+back to uvicorn's own --workers supervisor, which imports the app in every
+worker.
+
+SIGTERM stops accepting connections and lets in-flight requests finish for
+up to WEB_GRACEFUL_TIMEOUT seconds before workers are killed.
+
+Sizing workers
+--------------
+Every worker is a process with its own connection pool of up to
+DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so across all API hosts:
+
+    hosts * workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+        <= DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS
+
+With WEB_WORKERS=0 the launcher starts 2 * CPUs + 1 workers, capped by that
+bound for a single host. On MySQL defaults (max_connections 151, 10
+reserved, a 5 + 10 pool) that cap is 9 workers. With several hosts, set
+WEB_WORKERS explicitly.
+
+Route handlers (and the auth dependency) that use the database are plain
+`def` functions, so FastAPI runs them in its threadpool (40 threads per
+worker): a request waiting for a pooled connection blocks its thread, not
+the event loop, and requests holding connections can still finish. Async
+handlers must not touch a Session. Requests beyond
+DB_POOL_SIZE + DB_MAX_OVERFLOW per worker queue for a connection (up to the
+30 s pool timeout), so size the pool for the concurrent clients per worker.
+
+Workers do not share memory: set PRICE_EVENTS_REDIS_URL and
+RATE_LIMIT_REDIS_URL so live price events and rate limit buckets are shared,
+and the periodic price snapshot builder runs once, beside the workers,
+rather than in each of them.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import subprocess
+import sys
+from typing import Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+def recommended_workers(
+    cpu_count: Optional[int] = None,
+    pool_size: int = config.DB_POOL_SIZE,
+    max_overflow: int = config.DB_MAX_OVERFLOW,
+    max_connections: int = config.DB_MAX_CONNECTIONS,
+    reserved_connections: int = config.DB_RESERVED_CONNECTIONS,
+) -> int:
+    """2 * CPUs + 1, capped so every worker's full pool fits in max_connections."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    by_cpu = 2 * cpu_count + 1
+    by_database = (max_connections - reserved_connections) // (pool_size + max_overflow)
+    return max(1, min(by_cpu, by_database))
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _start_snapshot_builder() -> Optional[subprocess.Popen]:
+    """Run the periodic snapshot builder as one process beside the workers."""
+    interval = config.PRICE_SNAPSHOT_INTERVAL_SECONDS
+    if not (config.PRICE_SNAPSHOT_DIR and interval > 0):
+        return None
+    # Workers read the interval when app.main is imported (in the master when
+    # preloading, in each spawned worker otherwise); 0 keeps them from
+    # starting a builder thread of their own
+    os.environ["PRICE_SNAPSHOT_INTERVAL_SECONDS"] = "0"
+    config.PRICE_SNAPSHOT_INTERVAL_SECONDS = 0
+    return subprocess.Popen([sys.executable, "-m", "app.services.price_snapshot", "--every", str(interval)])
+
+
+def _worker_class():
+    try:
+        from uvicorn_worker import UvicornWorker
+    except ImportError:  # Older uvicorn releases bundle the worker
+        from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        # Cancel requests still running just before gunicorn kills the worker
+        CONFIG_KWARGS = {
+            **UvicornWorker.CONFIG_KWARGS,
+            "timeout_graceful_shutdown": max(1, config.WEB_GRACEFUL_TIMEOUT - 2),
+        }
+
+    return Worker
+
+
+def _post_fork(server, worker):
+    # Connections opened in the master while preloading must not be shared
+    # between processes; drop them without closing the parent's sockets
+    from .database.database import engine
+    engine.dispose(close=False)
+
+
+def run_gunicorn(host: str, port: int, workers: int):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "worker_class": _worker_class(),
+                "preload_app": True,
+                "graceful_timeout": config.WEB_GRACEFUL_TIMEOUT,
+                "timeout": max(60, config.WEB_GRACEFUL_TIMEOUT * 2),
+                "keepalive": config.WEB_KEEPALIVE,
+                "max_requests": config.WEB_MAX_REQUESTS,
+                "max_requests_jitter": config.WEB_MAX_REQUESTS // 10,
+                "post_fork": _post_fork,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from .main import app
+            return app
+
+    Server().run()
+
+
+def run_uvicorn(host: str, port: int, workers: int):
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=config.WEB_KEEPALIVE,
+        timeout_graceful_shutdown=config.WEB_GRACEFUL_TIMEOUT,
+        limit_max_requests=config.WEB_MAX_REQUESTS or None,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=config.WEB_HOST)
+    parser.add_argument("--port", type=int, default=config.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=config.WEB_WORKERS,
+                        help="Worker processes (default: WEB_WORKERS, or derived from CPUs and the DB pool)")
+    parser.add_argument("--no-gunicorn", action="store_true", help="Use uvicorn's worker supervisor")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    workers = args.workers or recommended_workers()
+    use_gunicorn = not args.no_gunicorn and _installed("gunicorn")
+    print(f"🚀 Serving on {args.host}:{args.port} with {workers} workers "
+          f"({'gunicorn' if use_gunicorn else 'uvicorn'}, "
+          f"loop={'uvloop' if _installed('uvloop') else 'asyncio'}, "
+          f"http={'httptools' if _installed('httptools') else 'h11'}, "
+          f"up to {workers * (config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW)} DB connections)")
+
+    builder = _start_snapshot_builder()
+    try:
+        if use_gunicorn:
+            run_gunicorn(args.host, args.port, workers)
+        else:
+            run_uvicorn(args.host, args.port, workers)
+    finally:
+        if builder is not None:
+            builder.terminate()
+            builder.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
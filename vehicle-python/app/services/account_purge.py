@@ -0,0 +1,97 @@
+"""
+Chunked deletion of user accounts.
+
+Every child table cascades from Users at the database level, so deleting the
+user row alone removes the whole account. For a fleet account that single
+statement can cascade through hundreds of thousands of logs in one
+transaction, holding locks and stalling replicas until it commits.
+
+DELETE /users/me therefore only marks the account (deleted_at), releases its
+email (see released_email) so it can be registered again straight away, and
+hands it to purge_user(), which runs after the response: it deletes the bulky tables
+ACCOUNT_PURGE_CHUNK_SIZE rows at a time, committing between chunks, then
+deletes the user row, whose cascade only has a few rows left. Memory stays
+bounded by one chunk of ids.
+
+A purge interrupted by a restart is finished by:
+
+    python -m app.services.account_purge
+"""
+import logging
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import ACCOUNT_PURGE_CHUNK_SIZE
+from app.models import models
+
+logger = logging.getLogger(__name__)
+
+
+def released_email(user_id: int) -> str:
+    """Placeholder email for an account being purged; .invalid never resolves."""
+    return f"deleted+{user_id}@invalid"
+
+
+def _chunked_tables(user_id: int):
+    """(model, filter) for each table large enough to need chunking."""
+    vehicle_ids = select(models.Vehicle.vehicle_id).where(models.Vehicle.user_id == user_id)
+    return [
+        # Recent_Fuel_Prices rows cascade from their Fuel_Info row
+        (models.Fuel, models.Fuel.vehicle_id.in_(vehicle_ids)),
+        (models.Maintenance, models.Maintenance.vehicle_id.in_(vehicle_ids)),
+        (models.SyncTombstone, models.SyncTombstone.user_id == user_id),
+    ]
+
+
+def purge_user(db: Session, user_id: int, chunk_size: int = ACCOUNT_PURGE_CHUNK_SIZE) -> int:
+    """Delete a user and all of their data in chunks. Returns the number of log rows removed."""
+    removed = 0
+    for model, belongs_to_user in _chunked_tables(user_id):
+        key = model.__mapper__.primary_key[0]
+        while True:
+            ids = db.scalars(select(key).where(belongs_to_user).limit(chunk_size)).all()
+            if not ids:
+                break
+            db.execute(delete(model).where(key.in_(ids)))
+            db.commit()
+            removed += len(ids)
+    # Vehicles, reminders and reset tokens cascade from the user row
+    db.execute(delete(models.User).where(models.User.user_id == user_id))
+    db.commit()
+    logger.info(f"🗑️ Purged user {user_id} ({removed} rows in chunks of {chunk_size})")
+    return removed
+
+
+def purge_user_in_background(user_id: int):
+    """Background task entry point, with its own session."""
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        purge_user(db, user_id)
+    except Exception as e:
+        # The account stays marked; purge_pending() finishes it later
+        logger.error(f"❌ Purging user {user_id} failed: {type(e).__name__}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def purge_pending(db: Session) -> int:
+    """Finish purging every account marked as deleted. Returns the number of accounts."""
+    user_ids = db.scalars(select(models.User.user_id).where(models.User.deleted_at.isnot(None))).all()
+    for user_id in user_ids:
+        purge_user(db, user_id)
+    return len(user_ids)
+
+
+if __name__ == "__main__":
+    from app.database.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        print(f"✅ Purged {purge_pending(db)} deleted accounts")
+    finally:
+        db.close()
@@ -0,0 +1,422 @@
+"""
+Station clustering of new fuel logs, after the write commits.
+
+POST /fuel/ used to run find_or_create_station_cluster before inserting the
+log: a scan of every cluster plus a commit of its own, all inside the
+request. Now the log is inserted at once with station_id NULL and a
+Clustering_Jobs row in the same transaction, and the job is handed to this
+process's queue after the commit.
+
+Worker threads take jobs off the queue in micro-batches of up to
+CLUSTERING_BATCH_SIZE. A batch claims its jobs, loads the clusters around
+all of its logs with one bounding-box query, assigns every log (later logs
+can join clusters created earlier in the same batch) and commits once, with
+one atomic UPDATE or upsert per touched cluster. After the commit the
+touched clusters are announced to other workers' station indexes and
+written through to this process's.
+
+Updates that move a log (PUT/PATCH /fuel/{id}) clear its station_id and
+enqueue a job the same way; the job also takes the report off the cluster
+it was counted at, in the same per-cluster statements, and announces the
+new cluster as a `price_update`.
+
+The cluster is assigned through the ORM, so Recent_Fuel_Prices follows; the
+owner's versions are bumped so clients pick it up on their next /sync, and
+the live price event goes out after the commit.
+
+The table makes the queue durable. Jobs that did not fit in the queue, or
+whose process died, are found again by a sweep every
+CLUSTERING_SWEEP_SECONDS; claims of crashed batches expire after
+CLUSTERING_CLAIM_TIMEOUT_SECONDS. Claims are conditional UPDATEs, so no two
+processes cluster the same log. With CLUSTERING_WORKERS=0 the API only
+writes jobs and cron drains them:
+
+    python -m app.services.clustering_queue
+
+Exported metrics: clustering_lag_seconds (commit to cluster assigned),
+clustering_jobs_total by result and clustering_queue_depth. Tests call
+clustering_queue.flush() to wait for pending work.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import (
+    CLUSTERING_WORKERS, CLUSTERING_BATCH_SIZE, CLUSTERING_BATCH_WAIT_MS, CLUSTERING_QUEUE_SIZE,
+    CLUSTERING_SWEEP_SECONDS, CLUSTERING_CLAIM_TIMEOUT_SECONDS, CLUSTERING_MAX_ATTEMPTS
+)
+from app.models import models
+from app.services.geo import bounding_box
+from app.services.location_service import LocationService
+from app.services.price_events import publish_price_report
+from app.services.station_index import announce_version, station_index
+from app.utils.conditional import bump_versions
+from app.utils.metrics import CounterMetric, GaugeMetric, Histogram
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+
+def enqueue(db: Session, fuel: models.Fuel, previous_station_id: Optional[int] = None,
+            previous_latitude=None, previous_longitude=None):
+    """
+    Add a clustering job for a fuel log to the caller's transaction.
+    Returns the job (hand job.job_id to submit() after the commit), or None
+    if there is nothing to do: no position to cluster and no report to take
+    off a previous cluster.
+
+    An update that moves a clustered log clears its station_id and passes
+    the cluster (and position) its report was counted at; the job moves the
+    report from that cluster to the new one.
+    """
+    has_position = fuel.latitude is not None and fuel.longitude is not None and bool(fuel.location)
+    if not has_position and previous_station_id is None:
+        return None
+    job = None
+    if fuel.fuel_id is not None:
+        # Still waiting from an earlier write: it clusters the current position
+        job = db.query(models.ClusteringJob).filter(models.ClusteringJob.fuel_id == fuel.fuel_id).first()
+    if job is None:
+        job = models.ClusteringJob(fuel=fuel)
+        db.add(job)
+    if previous_station_id is not None and job.previous_station_id is None:
+        job.previous_station_id = previous_station_id
+        job.previous_latitude = previous_latitude
+        job.previous_longitude = previous_longitude
+    return job
+
+
+def _session() -> Session:
+    from app.database.database import SessionLocal
+
+    # Logs and clusters are still needed after the commit, for price events
+    return SessionLocal(expire_on_commit=False)
+
+
+def _waiting_jobs(db: Session, limit: int, min_age_seconds: float = 0) -> List[int]:
+    """Ids of jobs no live batch holds, oldest first."""
+    now = datetime.utcnow()
+    return [job_id for (job_id,) in db.query(models.ClusteringJob.job_id).filter(
+        models.ClusteringJob.enqueued_at <= now - timedelta(seconds=min_age_seconds),
+        models.ClusteringJob.attempts < CLUSTERING_MAX_ATTEMPTS,
+        or_(
+            models.ClusteringJob.claimed_by.is_(None),
+            models.ClusteringJob.claimed_at < now - timedelta(seconds=CLUSTERING_CLAIM_TIMEOUT_SECONDS)
+        )
+    ).order_by(models.ClusteringJob.job_id).limit(limit)]
+
+
+def _clusters_near(db: Session, points: Sequence[Tuple[float, float]]) -> List[models.GasStationCluster]:
+    """Every cluster that could match one of the points: one query per batch instead of per log."""
+    boxes = [bounding_box(lat, lng, LocationService.CLUSTER_RADIUS_KM) for lat, lng in points]
+    return db.query(models.GasStationCluster).filter(
+        models.GasStationCluster.latitude.between(
+            min(south for south, _, _, _ in boxes), max(north for _, north, _, _ in boxes)),
+        models.GasStationCluster.longitude.between(
+            min(west for _, _, west, _ in boxes), max(east for _, _, _, east in boxes))
+    ).all()
+
+
+class ClusteringQueue:
+    """In-process queue of committed clustering jobs and the worker threads draining it."""
+
+    def __init__(self, workers: int, batch_size: int, batch_wait_seconds: float,
+                 queue_size: int, sweep_seconds: float):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.sweep_seconds = sweep_seconds
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.lag = Histogram(
+            "clustering_lag_seconds", "Time from a fuel log's commit to its station cluster", LAG_BUCKETS)
+        self.jobs = CounterMetric("clustering_jobs_total", "Clustering jobs by result")
+        self.depth = GaugeMetric(
+            "clustering_queue_depth", "Jobs waiting in this process's clustering queue", self._queue.qsize)
+
+    def metrics(self):
+        return (self.lag, self.jobs, self.depth)
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def submit(self, job_id: int):
+        """Hand a committed job to the workers. If they cannot take it, the sweep will."""
+        if not self.running:
+            return
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            self.jobs.inc(result="deferred")
+
+    def start(self):
+        if self.workers <= 0 or self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"clustering-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._sweep, name="clustering-sweep", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"🏪 Clustering queue started with {self.workers} workers")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def flush(self, timeout: float = 10.0) -> int:
+        """
+        Cluster everything pending now: wait until the workers have emptied
+        the queue, then drain what is left in the table in this thread.
+        Returns the number of logs clustered here.
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Clustering queue did not drain in time")
+                self._queue.all_tasks_done.wait(remaining)
+        return self.drain()
+
+    def drain(self) -> int:
+        """Cluster every waiting job in the table, batch by batch. Returns the number of logs clustered."""
+        clustered = 0
+        db = _session()
+        try:
+            while True:
+                job_ids = _waiting_jobs(db, self.batch_size)
+                if not job_ids:
+                    return clustered
+                clustered += self.process(job_ids, db)
+        finally:
+            db.close()
+
+    def process(self, job_ids: Sequence[int], db: Session = None) -> int:
+        """Claim and cluster one batch of jobs. Returns the number of logs clustered."""
+        own_session = db is None
+        db = db or _session()
+        try:
+            return self._cluster_batch(db, job_ids)
+        except Exception as e:
+            logger.error(f"❌ Clustering batch failed: {type(e).__name__}: {e}")
+            self.jobs.inc(len(job_ids), result="failed")
+            return 0
+        finally:
+            if own_session:
+                db.close()
+
+    def _cluster_batch(self, db: Session, job_ids: Sequence[int]) -> int:
+        db.expire_all()  # Clusters kept from the previous batch may have moved since
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        claimed = db.query(models.ClusteringJob).filter(
+            models.ClusteringJob.job_id.in_(job_ids),
+            models.ClusteringJob.attempts < CLUSTERING_MAX_ATTEMPTS,
+            or_(
+                models.ClusteringJob.claimed_by.is_(None),
+                models.ClusteringJob.claimed_at < now - timedelta(seconds=CLUSTERING_CLAIM_TIMEOUT_SECONDS)
+            )
+        ).update({
+            models.ClusteringJob.claimed_by: token,
+            models.ClusteringJob.claimed_at: now,
+            models.ClusteringJob.attempts: models.ClusteringJob.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return 0
+
+        try:
+            assigned, touched = self._assign_clusters(db, token)
+            db.query(models.ClusteringJob).filter(
+                models.ClusteringJob.claimed_by == token
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Back to waiting, for a retry or the next sweep
+            db.query(models.ClusteringJob).filter(models.ClusteringJob.claimed_by == token).update(
+                {models.ClusteringJob.claimed_by: None, models.ClusteringJob.claimed_at: None},
+                synchronize_session=False
+            )
+            db.commit()
+            raise
+
+        done = datetime.utcnow()
+        # Fresh counts and centroids for the events, in one query; kept
+        # referenced so publishing finds them in the session
+        clusters = db.query(models.GasStationCluster).filter(
+            models.GasStationCluster.station_id.in_(touched)
+        ).populate_existing().all()
+        if touched:
+            station_index.apply(clusters, announce_version(db, touched))
+        for fuel, fuel_type, enqueued_at, moved in assigned:
+            self.lag.observe(max((done - enqueued_at).total_seconds(), 0.0))
+            publish_price_report(db, fuel, fuel_type, "price_update" if moved else "price_report")
+        self.jobs.inc(len(assigned), result="clustered")
+        if claimed > len(assigned):
+            self.jobs.inc(claimed - len(assigned), result="skipped")
+        return len(assigned)
+
+    def _assign_clusters(self, db: Session, token: str):
+        rows = db.query(
+            models.ClusteringJob.enqueued_at, models.Fuel, models.Vehicle.user_id, models.Vehicle.fuel_type,
+            models.ClusteringJob.previous_station_id, models.ClusteringJob.previous_latitude,
+            models.ClusteringJob.previous_longitude
+        ).join(
+            models.Fuel, models.ClusteringJob.fuel_id == models.Fuel.fuel_id
+        ).join(
+            models.Vehicle, models.Fuel.vehicle_id == models.Vehicle.vehicle_id
+        ).filter(
+            models.ClusteringJob.claimed_by == token
+        ).order_by(models.Vehicle.user_id, models.Fuel.fuel_id).all()
+
+        # Already clustered, or the position was removed since
+        pending = [
+            row for row in rows
+            if row.Fuel.station_id is None and row.Fuel.latitude is not None
+            and row.Fuel.longitude is not None and row.Fuel.location
+        ]
+        # Reports of moved logs, taken off the cluster they were counted at
+        moved = [row for row in rows if row.previous_station_id is not None]
+        if not pending and not moved:
+            return [], set()
+
+        # By cluster slug (new clusters have no station_id yet). Reports per
+        # existing cluster: [station_id, count, sum of latitudes, sum of longitudes]
+        reports: Dict[str, list] = {}
+        if moved:
+            previous_slugs = dict(db.query(
+                models.GasStationCluster.station_id, models.GasStationCluster.cluster_id
+            ).filter(models.GasStationCluster.station_id.in_({row.previous_station_id for row in moved})))
+            for row in moved:
+                if row.previous_station_id not in previous_slugs:
+                    continue
+                tally = reports.setdefault(
+                    previous_slugs[row.previous_station_id], [row.previous_station_id, 0, 0.0, 0.0]
+                )
+                tally[1] -= 1
+                tally[2] -= float(row.previous_latitude)
+                tally[3] -= float(row.previous_longitude)
+
+        clusters = _clusters_near(
+            db, [(float(row.Fuel.latitude), float(row.Fuel.longitude)) for row in pending]
+        ) if pending else []
+        created: Dict[str, models.GasStationCluster] = {}
+        versions: Dict[Tuple[int, int], int] = {}
+        slugs = []
+        for enqueued_at, fuel, user_id, fuel_type, *_ in pending:
+            lat, lng = float(fuel.latitude), float(fuel.longitude)
+            location_info = LocationService.normalize_location(fuel.location)
+            fuel.normalized_location = location_info["normalized"]
+
+            cluster = LocationService.match_station_cluster(
+                [*clusters, *created.values()], lat, lng, fuel.normalized_location
+            )
+            if cluster is None:
+                cluster = LocationService.new_station_cluster(
+                    lat, lng, fuel.normalized_location, location_info["brand"], location_info["street"]
+                )
+                created[cluster.cluster_id] = cluster
+            elif cluster.cluster_id in created:
+                cluster.report_count += 1
+                cluster.sum_latitude += lat
+                cluster.sum_longitude += lng
+            else:
+                tally = reports.setdefault(cluster.cluster_id, [cluster.station_id, 0, 0.0, 0.0])
+                tally[1] += 1
+                tally[2] += lat
+                tally[3] += lng
+            slugs.append(cluster.cluster_id)
+
+            # Rows are ordered by user, so user rows are locked in one order across batches
+            key = (user_id, fuel.vehicle_id)
+            if key not in versions:
+                versions[key] = bump_versions(db, user_id, fuel.vehicle_id)
+            fuel.sync_version = versions[key]
+
+        # One atomic statement per cluster, in key order so concurrent batches
+        # lock cluster rows in the same order
+        station_ids = {}
+        for slug in sorted(reports.keys() | created.keys()):
+            if slug in created:
+                station_ids[slug] = LocationService.upsert_station_cluster(db, created[slug])
+            else:
+                station_ids[slug] = reports[slug][0]
+                LocationService.add_cluster_reports(db, *reports[slug])
+
+        assigned = []
+        for row, slug in zip(pending, slugs):
+            row.Fuel.station_id = station_ids[slug]
+            assigned.append((row.Fuel, row.fuel_type, row.enqueued_at, row.previous_station_id is not None))
+        db.flush()
+        return assigned, set(station_ids.values())
+
+    def _next_batch(self) -> List[int]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self.process(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _sweep(self):
+        """Queue jobs no worker holds: overflow, and leftovers of crashed processes."""
+        while not self._stop.wait(self.sweep_seconds):
+            db = _session()
+            try:
+                job_ids = _waiting_jobs(db, max(self._queue.maxsize // 2, self.batch_size), self.sweep_seconds)
+            except Exception as e:
+                logger.error(f"❌ Clustering sweep failed: {type(e).__name__}: {e}")
+                continue
+            finally:
+                db.close()
+            if job_ids:
+                logger.info(f"🧹 Re-queueing {len(job_ids)} clustering jobs")
+            for job_id in job_ids:
+                self.submit(job_id)
+
+
+# Per-process queue, started by the API on startup
+clustering_queue = ClusteringQueue(
+    CLUSTERING_WORKERS, CLUSTERING_BATCH_SIZE, CLUSTERING_BATCH_WAIT_MS / 1000.0,
+    CLUSTERING_QUEUE_SIZE, CLUSTERING_SWEEP_SECONDS
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"✅ Clustered {clustering_queue.drain()} fuel logs")
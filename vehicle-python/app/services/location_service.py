@@ -4,11 +4,19 @@ Handles converting raw addresses into simplified names and grouping nearby stati
 """
 import re
 import math
+from datetime import datetime
 from typing import Dict, Optional, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from fuzzywuzzy import fuzz
 from app.models import models
+from app.services import geo
+from app.services.price_accumulator import DecayedPriceAccumulator
+from app.services.station_index import announce_version, station_index
+from app.services import recent_prices  # Also registers the Fuel -> Recent_Fuel_Prices events
 
 
 class LocationService:
@@ -28,7 +36,8 @@ class LocationService:
     def _calculate_weighted_average(prices_with_dates):
         """
         Calculate weighted average where more recent prices have higher weight.
-        Weight formula: newer prices get exponentially more weight (recency bias).
+        Weight formula: exponential decay (0.85^days_old) relative to the most
+        recent date, computed in a single pass by DecayedPriceAccumulator.
         
         Args:
             prices_with_dates: List of tuples (price, date)
@@ -36,33 +45,7 @@ class LocationService:
         Returns:
             Weighted average price
         """
-        from datetime import datetime
-        
-        if not prices_with_dates:
-            return 0
-        
-        # Find most recent date
-        max_date = max(date for _, date in prices_with_dates)
-        
-        weighted_sum = 0
-        total_weight = 0
-        
-        for price, date in prices_with_dates:
-            # Calculate days difference from most recent
-            days_old = (max_date - date).days
-            
-            # Weight formula: exponential decay (0.85^days_old)
-            # Day 0 (today): weight = 1.0
-            # Day 1: weight = 0.85
-            # Day 2: weight = 0.72
-            # Day 3: weight = 0.61
-            # Day 7: weight = 0.32
-            weight = 0.85 ** days_old
-            
-            weighted_sum += price * weight
-            total_weight += weight
-        
-        return weighted_sum / total_weight if total_weight > 0 else 0
+        return DecayedPriceAccumulator.from_pairs(prices_with_dates).average
     
     @staticmethod
     def normalize_location(raw_address: str) -> Dict[str, str]:
@@ -155,7 +138,7 @@ class LocationService:
         Calculate distance between two coordinates using Haversine formula.
         Returns distance in kilometers.
         """
-        R = 6371  # Earth's radius in kilometers
+        R = geo.EARTH_RADIUS_KM
         
         lat1_rad = math.radians(lat1)
         lat2_rad = math.radians(lat2)
@@ -169,6 +152,22 @@ class LocationService:
         
         return R * c
     
+    @staticmethod
+    def calculate_distances(lat: float, lon: float, latitudes, longitudes) -> np.ndarray:
+        """
+        calculate_distance from one coordinate to many, vectorized with NumPy.
+        Returns an array of distances in kilometers.
+        """
+        return geo.haversine_km(lat, lon, latitudes, longitudes)
+    
+    @staticmethod
+    def calculate_distance_matrix(latitudes_from, longitudes_from, latitudes_to, longitudes_to) -> np.ndarray:
+        """
+        calculate_distance between every pair of two coordinate sets.
+        Returns an (n, m) array of distances in kilometers.
+        """
+        return geo.distance_matrix_km(latitudes_from, longitudes_from, latitudes_to, longitudes_to)
+    
     @staticmethod
     def find_or_create_station_cluster(
         db: Session,
@@ -177,64 +176,165 @@ class LocationService:
         normalized_name: str,
         brand: str = None,
         street: str = None
-    ) -> str:
+    ) -> int:
         """
         Find existing station cluster within 100m with similar name,
         or create a new cluster.
         
-        Returns: cluster_id
+        Returns: station_id
         """
-        # Find all clusters within cluster radius
-        nearby_clusters = db.query(models.GasStationCluster).all()
+        # Find all clusters within cluster radius (nearest first), from the
+        # in-memory station index
+        station_index.ensure_current(db)
+        nearby_clusters = [
+            station for station, _ in station_index.within(lat, lng, LocationService.CLUSTER_RADIUS_KM)
+        ]
+        
+        cluster = LocationService.match_station_cluster(nearby_clusters, lat, lng, normalized_name)
+        if cluster is not None:
+            # Found matching cluster - count the report in one atomic UPDATE
+            LocationService.add_cluster_reports(db, cluster.station_id, 1, lat, lng)
+            station_id = cluster.station_id
+        else:
+            # No matching cluster found - create it (or count the report, if a
+            # concurrent writer just created the same one)
+            new_cluster = LocationService.new_station_cluster(lat, lng, normalized_name, brand, street)
+            station_id = LocationService.upsert_station_cluster(db, new_cluster)
+        
+        # Read back as written (centroid computed by the database) for the index
+        written = db.query(models.GasStationCluster).filter(
+            models.GasStationCluster.station_id == station_id
+        ).populate_existing().one()
+        db.commit()
+        station_index.apply([written], announce_version(db, [station_id]))
         
-        for cluster in nearby_clusters:
-            distance = LocationService.calculate_distance(
-                lat, lng,
-                float(cluster.latitude), float(cluster.longitude)
+        return station_id
+    
+    @staticmethod
+    def match_station_cluster(
+        clusters,
+        lat: float,
+        lng: float,
+        normalized_name: str
+    ) -> Optional[models.GasStationCluster]:
+        """
+        First of `clusters` within CLUSTER_RADIUS_KM whose name is similar
+        enough to `normalized_name`, or None.
+        """
+        if not clusters:
+            return None
+        
+        # All distances in one pass (bounding box, then the equirectangular
+        # fast path for the 100 m radius)
+        within, _ = geo.within_km(
+            lat, lng,
+            [float(cluster.latitude) for cluster in clusters],
+            [float(cluster.longitude) for cluster in clusters],
+            LocationService.CLUSTER_RADIUS_KM
+        )
+        for position in within:
+            cluster = clusters[position]
+            # Check name similarity
+            similarity = fuzz.ratio(
+                cluster.normalized_name.lower(),
+                normalized_name.lower()
             )
             
-            # Check if within radius
-            if distance <= LocationService.CLUSTER_RADIUS_KM:
-                # Check name similarity
-                similarity = fuzz.ratio(
-                    cluster.normalized_name.lower(),
-                    normalized_name.lower()
-                )
-                
-                if similarity >= LocationService.NAME_SIMILARITY_THRESHOLD:
-                    # Found matching cluster - update report count
-                    cluster.report_count += 1
-                    # Update average location (weighted)
-                    total_reports = cluster.report_count
-                    # Convert Decimal to float before arithmetic
-                    current_lat = float(cluster.latitude)
-                    current_lng = float(cluster.longitude)
-                    cluster.latitude = (
-                        (current_lat * (total_reports - 1) + lat) / total_reports
-                    )
-                    cluster.longitude = (
-                        (current_lng * (total_reports - 1) + lng) / total_reports
-                    )
-                    db.commit()
-                    return cluster.cluster_id
-        
-        # No matching cluster found - create new one
-        cluster_id = LocationService._generate_cluster_id(normalized_name, lat, lng)
-        
-        new_cluster = models.GasStationCluster(
-            cluster_id=cluster_id,
+            if similarity >= LocationService.NAME_SIMILARITY_THRESHOLD:
+                return cluster
+        return None
+    
+    @staticmethod
+    def _report_assignments(reports: int, sum_lat: float, sum_lng: float):
+        """
+        SET clauses adding `reports` reports (whose coordinates sum to
+        sum_lat/sum_lng) to a cluster row, as computed by the database.
+
+        The centroid comes first: MySQL evaluates SET clauses left to right
+        and later clauses see earlier results, while SQLite and PostgreSQL
+        always see the old row. In this order both read the old sums.
+        `reports` is negative when moved logs are taken off a cluster; a
+        cluster left without reports keeps its last centroid.
+        """
+        clusters = models.GasStationCluster.__table__.c
+        remaining = clusters.report_count + reports
+        return [
+            (clusters.latitude, case(
+                (remaining > 0, (clusters.sum_latitude + sum_lat) / remaining), else_=clusters.latitude)),
+            (clusters.longitude, case(
+                (remaining > 0, (clusters.sum_longitude + sum_lng) / remaining), else_=clusters.longitude)),
+            (clusters.sum_latitude, clusters.sum_latitude + sum_lat),
+            (clusters.sum_longitude, clusters.sum_longitude + sum_lng),
+            (clusters.report_count, clusters.report_count + reports),
+            (clusters.updated_at, datetime.utcnow()),
+            (clusters.index_version, None),  # Changed, not yet announced to other workers
+        ]
+    
+    @staticmethod
+    def add_cluster_reports(db: Session, station_id: int, reports: int, sum_lat: float, sum_lng: float):
+        """
+        Count reports for a cluster and move its centroid, in one UPDATE.
+        Concurrent writers cannot lose each other's reports, and the row is
+        locked only for the statement. The caller commits, then runs
+        station_index.announce_version().
+        """
+        table = models.GasStationCluster.__table__
+        db.execute(
+            update(table)
+            .where(table.c.station_id == station_id)
+            .ordered_values(*LocationService._report_assignments(reports, sum_lat, sum_lng))
+        )
+    
+    @staticmethod
+    def upsert_station_cluster(db: Session, cluster: models.GasStationCluster) -> int:
+        """
+        Insert a new cluster (from new_station_cluster), or add its reports
+        to the row a concurrent writer inserted under the same cluster_id.
+        Returns the row's station_id. The caller commits, then runs
+        station_index.announce_version().
+        """
+        table = models.GasStationCluster.__table__
+        values = {column.name: getattr(cluster, column.key) for column in table.columns
+                  if getattr(cluster, column.key) is not None}
+        values["index_version"] = None
+        assignments = [(column.name, value) for column, value in LocationService._report_assignments(
+            cluster.report_count, float(cluster.sum_latitude), float(cluster.sum_longitude)
+        )]
+        if db.get_bind().dialect.name == "mysql":
+            statement = mysql_insert(table).values(values).on_duplicate_key_update(assignments)
+        else:
+            statement = sqlite_insert(table).values(values).on_conflict_do_update(
+                index_elements=[table.c.cluster_id], set_=dict(assignments)
+            )
+        db.execute(statement)
+        # Either row: the one inserted or the one updated
+        return db.query(models.GasStationCluster.station_id).filter(
+            models.GasStationCluster.cluster_id == cluster.cluster_id
+        ).scalar()
+    
+    @staticmethod
+    def new_station_cluster(
+        lat: float,
+        lng: float,
+        normalized_name: str,
+        brand: str = None,
+        street: str = None
+    ) -> models.GasStationCluster:
+        """
+        A cluster for a station nobody has reported yet, with its first
+        report. Not added to any session: write it with upsert_station_cluster.
+        """
+        return models.GasStationCluster(
+            cluster_id=LocationService._generate_cluster_id(normalized_name, lat, lng),
             normalized_name=normalized_name,
             latitude=lat,
             longitude=lng,
+            sum_latitude=lat,
+            sum_longitude=lng,
             brand=brand,
             street=street,
             report_count=1
         )
-        
-        db.add(new_cluster)
-        db.commit()
-        
-        return cluster_id
     
     @staticmethod
     def _generate_cluster_id(normalized_name: str, lat: float, lng: float) -> str:
@@ -266,7 +366,8 @@ class LocationService:
             longitude: Center longitude
             radius_km: Search radius in kilometers
             fuel_type: Filter by fuel type (Gasoline/Diesel/Electric)
-            days_back: Only include logs from last N days
+            days_back: Only include logs from last N days (at most
+                recent_prices.RETENTION_DAYS)
         
         Returns:
             List of station price data with format:
@@ -299,99 +400,70 @@ class LocationService:
         # Calculate date threshold
         cutoff_date = datetime.now().date() - timedelta(days=days_back)
         
-        # Get all clusters first
-        clusters = db.query(models.GasStationCluster).all()
+        # Clusters inside the radius, from the in-memory station index (only
+        # the grid cells around the point are looked at)
+        station_index.ensure_current(db)
+        nearby = station_index.within(latitude, longitude, radius_km)
+        
+        if not nearby:
+            return []
+        
+        # Daily price sums, counts and extremes for every nearby cluster in
+        # one grouped query, together with the vehicle's fuel type (avoids a
+        # query per cluster and a float conversion per log).
+        # Recent_Fuel_Prices only holds the last few days of logs, so this
+        # does not slow down as Fuel_Info grows
+        buckets_by_cluster = defaultdict(lambda: defaultdict(list))
+        for station_id, fuel_type_name, day, price_sum, count, min_price, max_price in recent_prices.daily_prices(
+            db, cutoff_date, station_ids=[cluster.station_id for cluster, _ in nearby], fuel_type=fuel_type
+        ):
+            buckets_by_cluster[station_id][fuel_type_name].append((day, price_sum, count, min_price, max_price))
         
         results = []
         
-        for cluster in clusters:
-            # Calculate distance
-            distance = LocationService.calculate_distance(
-                latitude, longitude,
-                float(cluster.latitude), float(cluster.longitude)
-            )
-            
-            # Skip if outside radius
-            if distance > radius_km:
-                continue
-            
-            # Get fuel logs for this cluster
-            fuel_query = db.query(models.Fuel).join(models.Vehicle).filter(
-                models.Fuel.station_cluster_id == cluster.cluster_id,
-                models.Fuel.date >= cutoff_date
-            )
-            
-            # Filter by fuel type if specified
-            if fuel_type:
-                # Use LIKE for partial matching (e.g., "Gasoline" matches "Gasoline (Unleaded)" and "Gasoline (Premium)")
-                fuel_query = fuel_query.filter(
-                    models.Vehicle.fuel_type.like(f"%{fuel_type}%")
-                )
-            
-            fuel_logs = fuel_query.all()
-            
-            if not fuel_logs:
+        for cluster, distance in nearby:
+            buckets_by_fuel_type = buckets_by_cluster.get(cluster.station_id)
+            if not buckets_by_fuel_type:
                 continue
             
-            # Group fuel logs by fuel type
-            logs_by_fuel_type = defaultdict(list)
-            for log in fuel_logs:
-                vehicle = db.query(models.Vehicle).filter(
-                    models.Vehicle.vehicle_id == log.vehicle_id
-                ).first()
-                if vehicle and vehicle.fuel_type:
-                    logs_by_fuel_type[vehicle.fuel_type].append(log)
-            
-            # Calculate overall statistics and per-fuel-type statistics
-            all_prices = []
-            all_prices_with_dates = []  # Store prices with their dates for weighted average
+            # Per-fuel-type decayed price state; the station-wide figures are a
+            # merge of these, so every bucket is only read once
+            station_prices = DecayedPriceAccumulator()
             fuel_prices_array = []
             last_updated = None
             
-            for fuel_type_name, type_logs in logs_by_fuel_type.items():
+            for fuel_type_name, buckets in buckets_by_fuel_type.items():
                 # Calculate price statistics for this fuel type
-                prices_per_liter = []
-                prices_with_dates = []
-                for log in type_logs:
-                    fuel_amount = float(log.liters or log.kwh or 0)
-                    if fuel_amount > 0 and log.cost:
-                        price_per_liter = float(log.cost) / fuel_amount
-                        prices_per_liter.append(price_per_liter)
-                        prices_with_dates.append((price_per_liter, log.date))
+                type_prices = DecayedPriceAccumulator()
+                for bucket in buckets:
+                    type_prices.merge(DecayedPriceAccumulator.from_bucket(*bucket))
                 
-                if not prices_per_liter:
+                if not type_prices.count:
                     continue
                 
                 # Update overall last_updated
-                fuel_type_last_updated = max(log.date for log in type_logs)
+                fuel_type_last_updated = max(day for day, *_ in buckets)
                 if last_updated is None or fuel_type_last_updated > last_updated:
                     last_updated = fuel_type_last_updated
                 
-                # Calculate weighted average (recent prices get more weight)
-                weighted_avg = LocationService._calculate_weighted_average(prices_with_dates)
-                
-                # Add to fuel prices array
+                # Add to fuel prices array (average is recency weighted)
                 fuel_prices_array.append({
                     "fuel_type": fuel_type_name,
-                    "avg_price_per_liter": round(weighted_avg, 2),
-                    "min_price": round(min(prices_per_liter), 2),
-                    "max_price": round(max(prices_per_liter), 2),
-                    "report_count": len(prices_per_liter)
+                    "avg_price_per_liter": round(type_prices.average, 2),
+                    "min_price": round(type_prices.min_price, 2),
+                    "max_price": round(type_prices.max_price, 2),
+                    "report_count": type_prices.count
                 })
                 
                 # Add to overall prices for station average
-                all_prices.extend(prices_per_liter)
-                all_prices_with_dates.extend(prices_with_dates)
+                station_prices.merge(type_prices)
             
-            if not all_prices or not fuel_prices_array:
+            if not station_prices.count or not fuel_prices_array:
                 continue
             
             # Calculate hours since last update
             hours_since_update = int((datetime.now() - datetime.combine(last_updated, datetime.min.time())).total_seconds() / 3600)
             
-            # Calculate weighted overall average
-            overall_weighted_avg = LocationService._calculate_weighted_average(all_prices_with_dates)
-            
             # Calculate overall statistics
             results.append({
                 "cluster_id": cluster.cluster_id,
@@ -399,17 +471,17 @@ class LocationService:
                 "latitude": float(cluster.latitude),
                 "longitude": float(cluster.longitude),
                 "distance_km": round(distance, 2),
-                "avg_price_per_liter": round(overall_weighted_avg, 2),
-                "min_price": round(min(all_prices), 2),
-                "max_price": round(max(all_prices), 2),
-                "report_count": len(all_prices),
+                "avg_price_per_liter": round(station_prices.average, 2),
+                "min_price": round(station_prices.min_price, 2),
+                "max_price": round(station_prices.max_price, 2),
+                "report_count": station_prices.count,
                 "last_updated": last_updated.isoformat(),
                 "hours_since_update": hours_since_update,
                 "brand": cluster.brand,
                 "fuel_prices": fuel_prices_array  # Array of prices by fuel type
             })
         
-        # Sort by distance
-        results.sort(key=lambda x: x['distance_km'])
+        # Sort by distance (ties by cluster, the same order snapshots use)
+        results.sort(key=lambda x: (x['distance_km'], x['cluster_id']))
         
         return results
@@ -16,7 +16,8 @@ class MileageService:
     """
     
     @staticmethod
-    def update_vehicle_mileage(db: Session, vehicle_id: int, new_mileage: Optional[int]) -> Tuple[bool, str]:
+    def update_vehicle_mileage(db: Session, vehicle_id: int, new_mileage: Optional[int],
+                               commit: bool = True) -> Tuple[bool, str]:
         """
         Update vehicle's current mileage if the new mileage is higher.
         
@@ -24,6 +25,9 @@ class MileageService:
             db: Database session
             vehicle_id: ID of the vehicle to update
             new_mileage: New mileage reading (can be None)
+            commit: False when the caller owns the transaction: the change is
+                only flushed, and database errors are raised to the caller
+                instead of rolling back its pending work
             
         Returns:
             Tuple of (success: bool, message: str)
@@ -43,7 +47,10 @@ class MileageService:
             if new_mileage > (vehicle.current_mileage or 0):
                 old_mileage = vehicle.current_mileage
                 vehicle.current_mileage = new_mileage
-                db.commit()
+                if commit:
+                    db.commit()
+                else:
+                    db.flush()
                 
                 logger.info(f"Vehicle {vehicle_id} mileage updated from {old_mileage} to {new_mileage}")
                 return True, f"Mileage updated to {new_mileage}"
@@ -52,6 +59,8 @@ class MileageService:
                 
         except Exception as e:
             logger.error(f"Error updating vehicle mileage: {str(e)}")
+            if not commit:
+                raise
             db.rollback()
             return False, f"Database error: {str(e)}"
     
@@ -85,7 +94,7 @@ class MileageService:
             return 0
     
     @staticmethod
-    def sync_vehicle_mileage(db: Session, vehicle_id: int) -> Tuple[bool, str]:
+    def sync_vehicle_mileage(db: Session, vehicle_id: int, commit: bool = True) -> Tuple[bool, str]:
         """
         Sync vehicle's current_mileage with the highest mileage from all logs.
         Used for data correction and migration.
@@ -93,6 +102,8 @@ class MileageService:
         Args:
             db: Database session
             vehicle_id: ID of the vehicle
+            commit: False when the caller owns the transaction (see
+                update_vehicle_mileage)
             
         Returns:
             Tuple of (success: bool, message: str)
@@ -110,7 +121,10 @@ class MileageService:
                 
                 old_mileage = vehicle.current_mileage
                 vehicle.current_mileage = latest_mileage
-                db.commit()
+                if commit:
+                    db.commit()
+                else:
+                    db.flush()
                 
                 logger.info(f"Vehicle {vehicle_id} mileage synced from {old_mileage} to {latest_mileage}")
                 return True, f"Mileage synced to {latest_mileage}"
@@ -119,6 +133,8 @@ class MileageService:
                 
         except Exception as e:
             logger.error(f"Error syncing vehicle mileage: {str(e)}")
+            if not commit:
+                raise
             db.rollback()
             return False, f"Sync error: {str(e)}"
     
@@ -0,0 +1,194 @@
+"""
+Streaming recency-weighted price statistics.
+Keeps exponentially decayed sum/weight state so station averages can be
+updated one report at a time instead of re-reading every row.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Hashable, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Weight multiplier per day of age (same recency bias as the price map)
+DECAY = 0.85
+
+DayLike = Union[date, int]
+
+
+def _day_number(day: DayLike) -> int:
+    """Convert a date (or an already computed ordinal) to a day number."""
+    return day.toordinal() if isinstance(day, date) else int(day)
+
+
+class DecayedPriceAccumulator:
+    """
+    Running recency-weighted average of prices.
+
+    Weights are stored relative to a reference day: a report made `n` days
+    before the reference day weighs DECAY ** n. Moving the reference day only
+    rescales the two running sums, so rebasing is O(1) and the average is
+    unchanged. Unless rebased explicitly, the reference day tracks the newest
+    report, which matches the "weight relative to most recent date" formula.
+    """
+
+    __slots__ = ("reference_day", "last_day", "weighted_sum", "total_weight",
+                 "count", "min_price", "max_price")
+
+    def __init__(self):
+        self.reference_day: Optional[int] = None
+        self.last_day: Optional[int] = None
+        self.weighted_sum = 0.0
+        self.total_weight = 0.0
+        self.count = 0
+        self.min_price: Optional[float] = None
+        self.max_price: Optional[float] = None
+
+    def rebase(self, day: DayLike) -> "DecayedPriceAccumulator":
+        """Move the reference day, rescaling the stored sums in O(1)."""
+        new_reference = _day_number(day)
+        if self.reference_day is not None and new_reference != self.reference_day:
+            factor = DECAY ** (new_reference - self.reference_day)
+            self.weighted_sum *= factor
+            self.total_weight *= factor
+        self.reference_day = new_reference
+        return self
+
+    def add(self, price: float, day: DayLike) -> "DecayedPriceAccumulator":
+        """Add a single price report."""
+        day_number = _day_number(day)
+        if self.reference_day is None or day_number > self.reference_day:
+            self.rebase(day_number)
+        if self.last_day is None or day_number > self.last_day:
+            self.last_day = day_number
+
+        weight = DECAY ** (self.reference_day - day_number)
+        self.weighted_sum += price * weight
+        self.total_weight += weight
+        self.count += 1
+        self.min_price = price if self.min_price is None else min(self.min_price, price)
+        self.max_price = price if self.max_price is None else max(self.max_price, price)
+        return self
+
+    def merge(self, other: "DecayedPriceAccumulator") -> "DecayedPriceAccumulator":
+        """Fold another accumulator into this one without touching its rows."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.reference_day = other.reference_day
+            self.last_day = other.last_day
+            self.weighted_sum = other.weighted_sum
+            self.total_weight = other.total_weight
+            self.count = other.count
+            self.min_price = other.min_price
+            self.max_price = other.max_price
+            return self
+
+        reference = max(self.reference_day, other.reference_day)
+        self.rebase(reference)
+        factor = DECAY ** (reference - other.reference_day)
+        self.weighted_sum += other.weighted_sum * factor
+        self.total_weight += other.total_weight * factor
+        self.last_day = max(self.last_day, other.last_day)
+        self.count += other.count
+        self.min_price = min(self.min_price, other.min_price)
+        self.max_price = max(self.max_price, other.max_price)
+        return self
+
+    def copy(self) -> "DecayedPriceAccumulator":
+        return DecayedPriceAccumulator().merge(self)
+
+    @property
+    def average(self) -> float:
+        return self.weighted_sum / self.total_weight if self.total_weight > 0 else 0
+
+    @property
+    def last_updated(self) -> Optional[date]:
+        return date.fromordinal(self.last_day) if self.last_day is not None else None
+
+    @classmethod
+    def from_pairs(cls, prices_with_dates: Iterable[Tuple[float, DayLike]]) -> "DecayedPriceAccumulator":
+        accumulator = cls()
+        for price, day in prices_with_dates:
+            accumulator.add(price, day)
+        return accumulator
+
+    @classmethod
+    def from_bucket(cls, day: DayLike, price_sum: float, count: int,
+                    min_price: Optional[float], max_price: Optional[float]) -> "DecayedPriceAccumulator":
+        """One day of reports aggregated elsewhere (SQL GROUP BY, snapshot files)."""
+        accumulator = cls()
+        if not count:
+            return accumulator
+        accumulator.reference_day = accumulator.last_day = _day_number(day)
+        accumulator.weighted_sum = float(price_sum)
+        accumulator.total_weight = float(count)
+        accumulator.count = int(count)
+        accumulator.min_price = float(min_price)
+        accumulator.max_price = float(max_price)
+        return accumulator
+
+    @classmethod
+    def from_arrays(cls, prices: Sequence[float], days: Sequence[DayLike]) -> "DecayedPriceAccumulator":
+        """
+        Bulk build with NumPy, for recomputing a station from many rows at once.
+
+        Args:
+            prices: Price per liter/kWh for every report
+            days: Report dates (or day ordinals), same length as prices
+        """
+        accumulator = cls()
+        price_array = np.asarray(prices, dtype=np.float64)
+        if price_array.size == 0:
+            return accumulator
+
+        day_array = np.fromiter((_day_number(day) for day in days),
+                                dtype=np.int64, count=price_array.size)
+        reference = int(day_array.max())
+        weights = np.power(DECAY, (reference - day_array).astype(np.float64))
+
+        accumulator.reference_day = reference
+        accumulator.last_day = reference
+        accumulator.weighted_sum = float(np.dot(price_array, weights))
+        accumulator.total_weight = float(weights.sum())
+        accumulator.count = int(price_array.size)
+        accumulator.min_price = float(price_array.min())
+        accumulator.max_price = float(price_array.max())
+        return accumulator
+
+
+class StationPriceAccumulators:
+    """
+    Decayed price state keyed by (cluster_id, fuel_type).
+
+    Station-wide figures are produced by merging the per-fuel-type
+    accumulators, so each report is read exactly once.
+    """
+
+    def __init__(self):
+        self._state: Dict[Hashable, Dict[str, DecayedPriceAccumulator]] = defaultdict(dict)
+
+    def add(self, cluster_id: Hashable, fuel_type: str, price: float, day: DayLike):
+        by_fuel_type = self._state[cluster_id]
+        accumulator = by_fuel_type.get(fuel_type)
+        if accumulator is None:
+            accumulator = by_fuel_type[fuel_type] = DecayedPriceAccumulator()
+        accumulator.add(price, day)
+
+    def clusters(self):
+        return self._state.keys()
+
+    def by_fuel_type(self, cluster_id: Hashable) -> Dict[str, DecayedPriceAccumulator]:
+        return self._state.get(cluster_id, {})
+
+    def combined(self, cluster_id: Hashable) -> DecayedPriceAccumulator:
+        """Merge every fuel type at a cluster into one station-wide accumulator."""
+        total = DecayedPriceAccumulator()
+        for accumulator in self.by_fuel_type(cluster_id).values():
+            total.merge(accumulator)
+        return total
+
+    def rebase(self, day: DayLike):
+        """Move every accumulator to a common reference day."""
+        for by_fuel_type in self._state.values():
+            for accumulator in by_fuel_type.values():
+                accumulator.rebase(day)
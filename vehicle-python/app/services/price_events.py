@@ -0,0 +1,247 @@
+"""
+Live fuel price change feed.
+
+New price reports are published to a broker, which hands them to the
+in-process PriceEventHub of every API worker. The hub fans each event out to
+the subscribers whose search area contains the station, through bounded
+per-subscriber queues, so clients get pushed deltas instead of re-polling
+/fuel-prices/nearby.
+
+Single process deployments use LocalBroker. With several workers set
+PRICE_EVENTS_REDIS_URL so RedisBroker relays events between them.
+
+Events are `price_report` (a new report, which clients can add to what they
+show) or `price_update` (an existing report was corrected or moved, so the
+station's prices must be fetched again). Updates list the snapshot tiles
+they made stale in `stale_tiles`; hub listeners (the snapshot store) see
+every event, so each worker stops serving those tiles from the snapshot.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import PRICE_EVENTS_QUEUE_SIZE, PRICE_EVENTS_REDIS_URL
+from app.models import models
+from app.services.location_service import LocationService
+from app.services.price_snapshot import tile_for, tile_name, tiles_for_radius
+
+logger = logging.getLogger(__name__)
+
+
+class PriceSubscription:
+    """One connected client watching a circular area."""
+
+    def __init__(self, latitude: float, longitude: float, radius_km: float,
+                 queue_size: int, loop: asyncio.AbstractEventLoop):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.tiles = tiles_for_radius(latitude, longitude, radius_km)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.loop = loop
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        return LocationService.calculate_distance(
+            self.latitude, self.longitude, event["latitude"], event["longitude"]
+        ) <= self.radius_km
+
+    def offer(self, event: dict):
+        """Queue an event, dropping the oldest one if the client is too slow."""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class PriceEventHub:
+    """
+    Fan-out of price events to local subscribers.
+    Subscribers are indexed by snapshot tile, so a publish only checks
+    clients watching the tile the station is in.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._by_tile: Dict[Tuple[int, int], Set[PriceSubscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._listeners: List[Callable[[dict], None]] = []
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call `listener` with every dispatched event, from the dispatching thread."""
+        self._listeners.append(listener)
+
+    def subscribe(self, latitude: float, longitude: float, radius_km: float) -> PriceSubscription:
+        """Register a subscriber; must be called from the event loop serving it."""
+        subscription = PriceSubscription(
+            latitude, longitude, radius_km, self.queue_size, asyncio.get_running_loop()
+        )
+        with self._lock:
+            for tile in subscription.tiles:
+                self._by_tile[tile].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: PriceSubscription):
+        with self._lock:
+            for tile in subscription.tiles:
+                subscribers = self._by_tile.get(tile)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_tile[tile]
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(set().union(*self._by_tile.values())) if self._by_tile else 0
+
+    def dispatch(self, event: dict):
+        """Deliver an event to matching subscribers. Safe to call from any thread."""
+        event = dict(event, sequence=next(self._sequence))
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"⚠️ Price event listener failed: {type(e).__name__}: {e}")
+        with self._lock:
+            candidates = list(self._by_tile.get(tile_for(event["latitude"], event["longitude"]), ()))
+        for subscription in candidates:
+            if subscription.matches(event) and not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+
+class LocalBroker:
+    """Delivers events straight to this process's hub."""
+
+    def __init__(self, hub: PriceEventHub):
+        self.hub = hub
+
+    def publish(self, event: dict):
+        self.hub.dispatch(event)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class RedisBroker:
+    """
+    Relays events between workers through a Redis pub/sub channel.
+    Every worker runs a listener thread that dispatches into its own hub.
+    """
+
+    CHANNEL = "fuel-price-events"
+
+    def __init__(self, hub: PriceEventHub, redis_url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("PRICE_EVENTS_REDIS_URL is set but the 'redis' package is not installed") from e
+        self.hub = hub
+        self._client = redis.Redis.from_url(redis_url)
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, event: dict):
+        try:
+            self._client.publish(self.CHANNEL, json.dumps(event))
+        except Exception as e:
+            # Price feed is best effort; never fail the write that produced it
+            logger.warning(f"⚠️ Could not publish price event: {e}")
+
+    def start(self):
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.CHANNEL: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.stop()
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+    def _on_message(self, message):
+        try:
+            self.hub.dispatch(json.loads(message["data"]))
+        except (ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ignoring malformed price event: {e}")
+
+
+def create_broker(hub: PriceEventHub, redis_url: Optional[str] = None):
+    return RedisBroker(hub, redis_url) if redis_url else LocalBroker(hub)
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['sequence']}\nevent: price\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+def _station_event(event_type: str, cluster, stale_tiles: Iterable[str]) -> dict:
+    event = {
+        "type": event_type,
+        "cluster_id": cluster.cluster_id,
+        "name": cluster.normalized_name,
+        "brand": cluster.brand,
+        "latitude": float(cluster.latitude),
+        "longitude": float(cluster.longitude),
+        "report_count": cluster.report_count
+    }
+    if event_type == "price_update":
+        event["stale_tiles"] = sorted(
+            set(stale_tiles) | {tile_name(tile_for(event["latitude"], event["longitude"]))}
+        )
+    return event
+
+
+def publish_price_report(db: Session, fuel_log, fuel_type: Optional[str],
+                         event_type: str = "price_report", stale_tiles: Iterable[str] = ()):
+    """
+    Announce a committed fuel log as a price delta for its station: a new
+    report, or (event_type="price_update") a corrected or moved one, whose
+    event also lists the snapshot tiles it made stale.
+    Best effort: errors are logged, never raised into the write path.
+    """
+    try:
+        fuel_amount = float(fuel_log.liters or fuel_log.kwh or 0)
+        if not fuel_log.station_id or fuel_amount <= 0 or not fuel_log.cost:
+            if event_type == "price_update" and fuel_log.station_id:
+                # No usable price any more; the station still changed
+                publish_station_update(db, fuel_log.station_id, stale_tiles)
+            return
+        cluster = db.get(models.GasStationCluster, fuel_log.station_id)
+        if cluster is None:
+            return
+        price_event_broker.publish({
+            **_station_event(event_type, cluster, stale_tiles),
+            "fuel_type": fuel_type,
+            "price_per_liter": round(float(fuel_log.cost) / fuel_amount, 2),
+            "date": fuel_log.date.isoformat()
+        })
+    except Exception as e:
+        logger.warning(f"⚠️ Could not publish price event for fuel log {fuel_log.fuel_id}: {e}")
+
+
+def publish_station_update(db: Session, station_id: int, stale_tiles: Iterable[str] = ()):
+    """Announce that a station lost or changed a report (a `price_update` without a price)."""
+    try:
+        cluster = db.get(models.GasStationCluster, station_id)
+        if cluster is not None:
+            price_event_broker.publish(_station_event("price_update", cluster, stale_tiles))
+    except Exception as e:
+        logger.warning(f"⚠️ Could not publish price event for station {station_id}: {e}")
+
+
+# Per-process hub and the broker feeding it
+price_event_hub = PriceEventHub(PRICE_EVENTS_QUEUE_SIZE)
+price_event_broker = create_broker(price_event_hub, PRICE_EVENTS_REDIS_URL)
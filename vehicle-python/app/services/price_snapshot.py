@@ -0,0 +1,415 @@
+"""
+Static fuel price snapshots for serving nearby prices without the database.
+
+A snapshot renders the last week of community price reports into one gzip'd
+JSON file per geo tile (plus a brotli copy when the `brotli` package is
+installed), and a manifest with per-tile ETags. Files are
+written to PRICE_SNAPSHOT_DIR so any static server/CDN can serve them, and
+the /fuel-prices endpoints answer from the newest snapshot while it is fresh.
+
+Build a snapshot from cron (or let the API do it periodically, see
+PRICE_SNAPSHOT_INTERVAL_SECONDS):
+
+    python -m app.services.price_snapshot
+    python -m app.services.price_snapshot --every 600   # Long-running builder
+"""
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services.geo import bounding_box
+from app.services.location_service import LocationService
+from app.services.price_accumulator import DecayedPriceAccumulator
+from app.services import recent_prices
+from app.services.recent_prices import MAX_DAYS_BACK
+from app.utils.compression import SUPPORTED_ENCODINGS, PrecompressedBody, compress
+
+logger = logging.getLogger(__name__)
+
+# Tile size in degrees (~11 km at Metro Manila's latitude)
+TILE_DEGREES = 0.1
+MANIFEST_NAME = "manifest.json"
+
+
+def tile_for(latitude: float, longitude: float) -> Tuple[int, int]:
+    """Return the (x, y) tile containing a coordinate."""
+    return math.floor(longitude / TILE_DEGREES), math.floor(latitude / TILE_DEGREES)
+
+
+def tile_name(tile: Tuple[int, int]) -> str:
+    return f"{tile[0]}_{tile[1]}"
+
+
+def tiles_for_radius(latitude: float, longitude: float, radius_km: float) -> List[Tuple[int, int]]:
+    """Return every tile overlapping the bounding box of a search radius."""
+    south, north, west, east = bounding_box(latitude, longitude, radius_km)
+    min_x, min_y = tile_for(south, west)
+    max_x, max_y = tile_for(north, east)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def _serialize(payload: dict) -> bytes:
+    """Deterministic JSON so unchanged tiles keep the same ETags."""
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def _etag(data: bytes) -> str:
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def build_snapshot(db: Session, root: str, keep_versions: int = 3) -> dict:
+    """
+    Render current price data into a new snapshot version under `root`.
+
+    Each station carries per (fuel_type, day) buckets of
+    [fuel_type, day_ordinal, price_sum, report_count, min_price, max_price],
+    which is enough to rebuild every time window and fuel type filter the
+    live endpoint supports.
+
+    Returns:
+        The manifest that was published
+    """
+    today = datetime.now().date()
+    cutoff_date = today - timedelta(days=MAX_DAYS_BACK)
+
+    clusters = {
+        cluster.station_id: cluster
+        for cluster in db.query(models.GasStationCluster).all()
+    }
+
+    # (station_id, fuel_type, day) -> [sum, count, min, max], grouped by the database
+    buckets = {}
+    reports = 0
+    for station_id, fuel_type, log_date, price_sum, count, min_price, max_price in recent_prices.daily_prices(
+        db, cutoff_date
+    ):
+        if station_id not in clusters:
+            continue
+        buckets[(station_id, fuel_type, log_date.toordinal())] = [price_sum or 0.0, count, min_price, max_price]
+        reports += count
+
+    stations_by_tile: Dict[Tuple[int, int], Dict[int, dict]] = defaultdict(dict)
+    for (station_id, fuel_type, day), (price_sum, count, min_price, max_price) in sorted(buckets.items()):
+        cluster = clusters[station_id]
+        latitude, longitude = float(cluster.latitude), float(cluster.longitude)
+        tile_stations = stations_by_tile[tile_for(latitude, longitude)]
+        station = tile_stations.get(station_id)
+        if station is None:
+            station = tile_stations[station_id] = {
+                "cluster_id": cluster.cluster_id,
+                "name": cluster.normalized_name,
+                "latitude": latitude,
+                "longitude": longitude,
+                "brand": cluster.brand,
+                "buckets": []
+            }
+        station["buckets"].append([fuel_type, day, price_sum, count, min_price, max_price])
+
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    os.makedirs(root, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".building-", dir=root)
+
+    tiles = {}
+    for tile, tile_stations in stations_by_tile.items():
+        name = tile_name(tile)
+        raw = _serialize({
+            "version": version,
+            "tile": name,
+            "built_for": today.isoformat(),
+            "stations": list(tile_stations.values())
+        })
+        data = gzip.compress(raw, compresslevel=9, mtime=0)
+        file_name = f"{name}.json.gz"
+        with open(os.path.join(staging_dir, file_name), "wb") as f:
+            f.write(data)
+        tiles[name] = {
+            "file": f"{version}/{file_name}",
+            "etag": _etag(data),
+            "bytes": len(data),
+            "stations": len(tile_stations)
+        }
+        if "br" in SUPPORTED_ENCODINGS:
+            br_data = compress(raw, "br")
+            with open(os.path.join(staging_dir, f"{name}.json.br"), "wb") as f:
+                f.write(br_data)
+            tiles[name]["br_file"] = f"{version}/{name}.json.br"
+            tiles[name]["br_etag"] = _etag(br_data)
+
+    manifest = {
+        "version": version,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "built_for": today.isoformat(),
+        "tile_degrees": TILE_DEGREES,
+        "max_days_back": MAX_DAYS_BACK,
+        "tiles": tiles
+    }
+
+    # Publish atomically: the version directory first, then the manifest
+    os.replace(staging_dir, os.path.join(root, version))
+    manifest_tmp = os.path.join(root, f".{MANIFEST_NAME}.tmp")
+    with open(manifest_tmp, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(manifest_tmp, os.path.join(root, MANIFEST_NAME))
+
+    _prune_versions(root, keep_versions)
+    logger.info(f"📦 Price snapshot {version} written: {len(tiles)} tiles, {reports} price reports")
+    return manifest
+
+
+def _prune_versions(root: str, keep_versions: int):
+    """Delete old snapshot versions, keeping the newest few for CDN caches."""
+    versions = sorted(
+        entry for entry in os.listdir(root)
+        if not entry.startswith(".") and os.path.isdir(os.path.join(root, entry))
+    )
+    for old_version in versions[:-keep_versions] if keep_versions > 0 else []:
+        shutil.rmtree(os.path.join(root, old_version), ignore_errors=True)
+
+
+class PriceSnapshot:
+    """A loaded snapshot version; tiles are decompressed lazily and cached."""
+
+    def __init__(self, root: str, manifest: dict):
+        self.root = root
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.generated_at = datetime.fromisoformat(manifest["generated_at"].rstrip("Z"))
+        self._tiles: Dict[str, list] = {}
+        self._lock = Lock()
+        # Served by /fuel-prices/snapshot/manifest, compressed once per encoding
+        self.manifest_body = PrecompressedBody(json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+
+    def age_seconds(self) -> float:
+        return (datetime.utcnow() - self.generated_at).total_seconds()
+
+    def tile_info(self, name: str) -> Optional[dict]:
+        return self.manifest["tiles"].get(name)
+
+    def tile_path(self, name: str, encoding: str = "gzip") -> Optional[str]:
+        info = self.tile_info(name)
+        if not info:
+            return None
+        return os.path.join(self.root, info["br_file"] if encoding == "br" else info["file"])
+
+    def _stations(self, name: str) -> list:
+        stations = self._tiles.get(name)
+        if stations is None:
+            path = self.tile_path(name)
+            if path is None:
+                return []
+            with open(path, "rb") as f:
+                stations = json.loads(gzip.decompress(f.read()))["stations"]
+            with self._lock:
+                self._tiles[name] = stations
+        return stations
+
+    def get_fuel_price_data(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float = 10.0,
+        fuel_type: str = None,
+        days_back: int = 7
+    ) -> list:
+        """
+        Same contract as LocationService.get_fuel_price_data, answered from
+        the snapshot files instead of the database.
+        """
+        now = datetime.now()
+        cutoff_day = (now.date() - timedelta(days=days_back)).toordinal()
+        fuel_type_filter = fuel_type.lower() if fuel_type else None
+
+        results = []
+        for tile in tiles_for_radius(latitude, longitude, radius_km):
+            stations = self._stations(tile_name(tile))
+            distances = LocationService.calculate_distances(
+                latitude, longitude,
+                [station["latitude"] for station in stations], [station["longitude"] for station in stations]
+            )
+            for station, distance in zip(stations, distances.tolist()):
+                if distance > radius_km:
+                    continue
+
+                # Rebuild per-fuel-type accumulators from the daily buckets
+                by_fuel_type: Dict[str, DecayedPriceAccumulator] = {}
+                last_day_by_fuel_type: Dict[str, int] = {}
+                for bucket_fuel_type, day, price_sum, count, min_price, max_price in station["buckets"]:
+                    if day < cutoff_day:
+                        continue
+                    if fuel_type_filter and fuel_type_filter not in bucket_fuel_type.lower():
+                        continue
+                    last_day_by_fuel_type[bucket_fuel_type] = max(
+                        day, last_day_by_fuel_type.get(bucket_fuel_type, day)
+                    )
+                    if not count:
+                        continue
+                    by_fuel_type.setdefault(bucket_fuel_type, DecayedPriceAccumulator()).merge(
+                        DecayedPriceAccumulator.from_bucket(day, price_sum, count, min_price, max_price)
+                    )
+
+                station_prices = DecayedPriceAccumulator()
+                fuel_prices_array = []
+                last_day = None
+                for fuel_type_name, type_prices in by_fuel_type.items():
+                    fuel_type_last_day = last_day_by_fuel_type[fuel_type_name]
+                    if last_day is None or fuel_type_last_day > last_day:
+                        last_day = fuel_type_last_day
+                    fuel_prices_array.append({
+                        "fuel_type": fuel_type_name,
+                        "avg_price_per_liter": round(type_prices.average, 2),
+                        "min_price": round(type_prices.min_price, 2),
+                        "max_price": round(type_prices.max_price, 2),
+                        "report_count": type_prices.count
+                    })
+                    station_prices.merge(type_prices)
+
+                if not station_prices.count:
+                    continue
+
+                last_updated = datetime.fromordinal(last_day)
+                results.append({
+                    "cluster_id": station["cluster_id"],
+                    "name": station["name"],
+                    "latitude": station["latitude"],
+                    "longitude": station["longitude"],
+                    "distance_km": round(distance, 2),
+                    "avg_price_per_liter": round(station_prices.average, 2),
+                    "min_price": round(station_prices.min_price, 2),
+                    "max_price": round(station_prices.max_price, 2),
+                    "report_count": station_prices.count,
+                    "last_updated": last_updated.date().isoformat(),
+                    "hours_since_update": int((now - last_updated).total_seconds() / 3600),
+                    "brand": station["brand"],
+                    "fuel_prices": fuel_prices_array
+                })
+
+        # Same order as live aggregation
+        results.sort(key=lambda x: (x['distance_km'], x['cluster_id']))
+        return results
+
+
+class PriceSnapshotStore:
+    """
+    Tracks the newest published snapshot in a directory.
+    The manifest is re-read only when its modification time changes.
+
+    Tiles marked stale (a report in them was corrected or moved) are not
+    served from snapshots generated before the mark; the next build clears it.
+    """
+
+    def __init__(self, root: Optional[str], max_age_seconds: float):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[PriceSnapshot] = None
+        self._manifest_mtime = None
+        self._lock = Lock()
+        # tile name -> when it was marked stale (UTC, like generated_at)
+        self._stale: Dict[str, datetime] = {}
+
+    def mark_stale(self, tiles: Iterable[str]):
+        now = datetime.utcnow()
+        with self._lock:
+            for name in tiles:
+                self._stale[name] = now
+
+    def on_price_event(self, event: dict):
+        """Price event hub listener: updates carry the tiles they made stale."""
+        if event.get("stale_tiles"):
+            self.mark_stale(event["stale_tiles"])
+
+    def is_stale(self, snapshot: PriceSnapshot, name: str) -> bool:
+        """Whether `name` changed after `snapshot` was generated."""
+        marked_at = self._stale.get(name)
+        if marked_at is None:
+            return False
+        if marked_at < snapshot.generated_at:
+            with self._lock:
+                if self._stale.get(name) == marked_at:
+                    del self._stale[name]
+            return False
+        return True
+
+    def current(self) -> Optional[PriceSnapshot]:
+        """Return the newest snapshot, or None if snapshots are disabled/stale."""
+        if not self.root:
+            return None
+        manifest_path = os.path.join(self.root, MANIFEST_NAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                if mtime != self._manifest_mtime:
+                    try:
+                        with open(manifest_path) as f:
+                            self._snapshot = PriceSnapshot(self.root, json.load(f))
+                        self._manifest_mtime = mtime
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error(f"❌ Could not load price snapshot manifest: {e}")
+                        return None
+
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age_seconds() > self.max_age_seconds:
+            return None
+        return snapshot
+
+
+def _build_from_config():
+    from app.config import PRICE_SNAPSHOT_DIR, PRICE_SNAPSHOT_KEEP_VERSIONS
+    from app.database.database import SessionLocal
+
+    if not PRICE_SNAPSHOT_DIR:
+        raise SystemExit("PRICE_SNAPSHOT_DIR is not set")
+    db = SessionLocal()
+    try:
+        return build_snapshot(db, PRICE_SNAPSHOT_DIR, PRICE_SNAPSHOT_KEEP_VERSIONS)
+    finally:
+        db.close()
+
+
+def run_periodically(interval_seconds: float, stop_event):
+    """Rebuild the snapshot every `interval_seconds` until `stop_event` is set."""
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            _build_from_config()
+        except Exception as e:
+            logger.error(f"❌ Price snapshot build failed: {type(e).__name__}: {e}")
+        stop_event.wait(max(interval_seconds - (time.monotonic() - started), 1.0))
+
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+    import threading
+
+    parser = argparse.ArgumentParser(description="Build a static fuel price snapshot")
+    parser.add_argument("--every", type=float, help="Keep rebuilding every N seconds until SIGTERM")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.every:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            run_periodically(args.every, stop)
+        except KeyboardInterrupt:
+            pass
+    else:
+        published = _build_from_config()
+        print(f"✅ Snapshot {published['version']} published with {len(published['tiles'])} tiles")
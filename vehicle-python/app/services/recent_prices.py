@@ -0,0 +1,215 @@
+"""
+Hot table of recent fuel price reports.
+
+Nearby-price aggregation and snapshots never look back more than
+MAX_DAYS_BACK days, but Fuel_Info keeps every log ever written.
+Recent_Fuel_Prices mirrors only the station-tagged logs of the last
+RETENTION_DAYS days, so price queries scan a table sized by recent activity
+instead of total history.
+
+Amounts are stored as fixed-point integers (centavos, milliliters,
+watt-hours) with a generated unit_price column, so aggregation runs on
+integers and doubles in SQL instead of converting DECIMALs row by row.
+
+Rows are maintained by Fuel mapper events inside the writing transaction, so
+every ORM write path (routes, seed scripts, the benchmark fleet generator)
+feeds the table. Bulk Core statements bypass the events; rebuild() restores
+the table from Fuel_Info.
+
+prune() drops rows that fell out of the window. Run it daily from cron:
+
+    python -m app.services.recent_prices            # prune
+    python -m app.services.recent_prices --rebuild  # repopulate from Fuel_Info
+
+or let the API do it every RECENT_PRICES_PRUNE_INTERVAL_SECONDS.
+"""
+import logging
+import time
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+from sqlalchemy import BigInteger, cast, delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+logger = logging.getLogger(__name__)
+
+# Longest time window served by /fuel-prices/nearby
+MAX_DAYS_BACK = 7
+# One spare day so "today" computed on a server in another timezone still
+# finds a full window
+RETENTION_DAYS = MAX_DAYS_BACK + 1
+
+# Fuel_Info columns copied into the table
+PRICE_COLUMNS = ("vehicle_id", "station_id", "date", "liters", "kwh", "cost")
+# Fuel_Info amount -> (integer column, units per peso/liter/kWh)
+FIXED_POINT = {
+    "liters": ("liters_ml", 1000),
+    "kwh": ("kwh_wh", 1000),
+    "cost": ("cost_centavos", 100),
+}
+
+recent_prices = models.RecentFuelPrice.__table__
+
+
+def retention_cutoff(today: Optional[date] = None) -> date:
+    return (today or date.today()) - timedelta(days=RETENTION_DAYS)
+
+
+def _is_recent(fuel: models.Fuel) -> bool:
+    return fuel.station_id is not None and fuel.date is not None and fuel.date >= retention_cutoff()
+
+
+def to_fixed(value, scale: int) -> Optional[int]:
+    """Convert a DECIMAL amount to an integer count of 1/scale units."""
+    if value is None:
+        return None
+    return int((Decimal(str(value)) * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def _row(fuel: models.Fuel) -> dict:
+    row = {"fuel_id": fuel.fuel_id}
+    for column in PRICE_COLUMNS:
+        if column in FIXED_POINT:
+            name, scale = FIXED_POINT[column]
+            row[name] = to_fixed(getattr(fuel, column), scale)
+        else:
+            row[column] = getattr(fuel, column)
+    return row
+
+
+def _copied_columns():
+    """(Recent_Fuel_Prices column, Fuel_Info expression) pairs, for copying in SQL."""
+    yield "fuel_id", models.Fuel.fuel_id
+    for column in PRICE_COLUMNS:
+        if column in FIXED_POINT:
+            name, scale = FIXED_POINT[column]
+            yield name, cast(func.round(getattr(models.Fuel, column) * scale), BigInteger)
+        else:
+            yield column, getattr(models.Fuel, column)
+
+
+@event.listens_for(models.Fuel, "after_insert")
+def _copy_new_log(mapper, connection, fuel):
+    if _is_recent(fuel):
+        connection.execute(insert(recent_prices).values(_row(fuel)))
+
+
+@event.listens_for(models.Fuel, "after_update")
+def _copy_updated_log(mapper, connection, fuel):
+    state = inspect(fuel)
+    if not any(state.attrs[column].history.has_changes() for column in PRICE_COLUMNS):
+        return
+    connection.execute(delete(recent_prices).where(recent_prices.c.fuel_id == fuel.fuel_id))
+    if _is_recent(fuel):
+        connection.execute(insert(recent_prices).values(_row(fuel)))
+
+
+@event.listens_for(models.Fuel, "after_delete")
+def _drop_deleted_log(mapper, connection, fuel):
+    # Older logs were never copied (or are pruned and never read)
+    if _is_recent(fuel):
+        connection.execute(delete(recent_prices).where(recent_prices.c.fuel_id == fuel.fuel_id))
+
+
+def daily_prices(db: Session, since: date, station_ids=None, fuel_type: Optional[str] = None):
+    """
+    Aggregate prices per (station_id, fuel_type, day) in the database.
+
+    Returns rows of (station_id, fuel_type, date, price_sum, price_count,
+    min_price, max_price). Logs without a price still produce a row (count
+    0), so callers see when a fuel type was last reported.
+
+    Args:
+        station_ids: Limit to these stations (all stations when None)
+        fuel_type: Partial match on the vehicle's fuel type, e.g. "Gasoline"
+            matches "Gasoline (Unleaded)" and "Gasoline (Premium)"
+    """
+    price = models.RecentFuelPrice.unit_price
+    query = db.query(
+        models.RecentFuelPrice.station_id,
+        models.Vehicle.fuel_type,
+        models.RecentFuelPrice.date,
+        func.sum(price),
+        func.count(price),
+        func.min(price),
+        func.max(price)
+    ).join(models.Vehicle, models.Vehicle.vehicle_id == models.RecentFuelPrice.vehicle_id).filter(
+        models.RecentFuelPrice.date >= since,
+        models.Vehicle.fuel_type.isnot(None),
+        models.Vehicle.fuel_type != ""
+    )
+    if station_ids is not None:
+        query = query.filter(models.RecentFuelPrice.station_id.in_(station_ids))
+    if fuel_type:
+        query = query.filter(models.Vehicle.fuel_type.like(f"%{fuel_type}%"))
+    return query.group_by(
+        models.RecentFuelPrice.station_id, models.Vehicle.fuel_type, models.RecentFuelPrice.date
+    ).all()
+
+
+def prune(db: Session, today: Optional[date] = None) -> int:
+    """Delete rows older than the retention window. Returns the number removed."""
+    result = db.execute(delete(recent_prices).where(recent_prices.c.date < retention_cutoff(today)))
+    db.commit()
+    return result.rowcount
+
+
+def rebuild(db: Session) -> int:
+    """Repopulate the table from Fuel_Info. Returns the number of rows copied."""
+    db.execute(delete(recent_prices))
+    columns, expressions = zip(*_copied_columns())
+    result = db.execute(insert(recent_prices).from_select(
+        columns,
+        select(*expressions).where(
+            models.Fuel.station_id.isnot(None),
+            models.Fuel.date >= retention_cutoff()
+        )
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def _prune_from_config():
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        removed = prune(db)
+    finally:
+        db.close()
+    logger.info(f"🧹 Pruned {removed} recent price rows older than {retention_cutoff()}")
+    return removed
+
+
+def run_periodically(interval_seconds: float, stop_event):
+    """Prune every `interval_seconds` until `stop_event` is set."""
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            _prune_from_config()
+        except Exception as e:
+            logger.error(f"❌ Recent price pruning failed: {type(e).__name__}: {e}")
+        stop_event.wait(max(interval_seconds - (time.monotonic() - started), 1.0))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the Recent_Fuel_Prices table")
+    parser.add_argument("--rebuild", action="store_true", help="Repopulate from Fuel_Info instead of pruning")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.rebuild:
+        db = SessionLocal()
+        try:
+            print(f"✅ Copied {rebuild(db)} recent fuel logs")
+        finally:
+            db.close()
+    else:
+        print(f"✅ Removed {_prune_from_config()} expired rows")
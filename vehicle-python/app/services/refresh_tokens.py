@@ -0,0 +1,151 @@
+"""
+Rotating refresh tokens.
+
+/auth/token checks the password with bcrypt, which is deliberately slow. It
+also returns a refresh token, and clients renew their short-lived access
+token at /auth/refresh. That costs one indexed lookup and one UPDATE, with
+no bcrypt.
+
+Each signed-in device has one Refresh_Tokens row. Only a SHA-256 of the
+token is stored: the tokens are 256-bit random strings, so a fast hash is
+enough and lookups go straight to the unique token_hash index. Every refresh
+replaces the token and pushes the session's expiry forward, so active users
+never have to log in again.
+
+The replaced token is kept in previous_hash. Within
+REFRESH_TOKEN_RETRY_SECONDS of the rotation, presenting it again is taken
+as a client retrying after a lost response, and the session is rotated
+again. Later, the token was copied: the session is revoked and that device
+must log in. A password change or reset revokes all of the user's sessions.
+"""
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import REFRESH_TOKEN_EXPIRE_DAYS, REFRESH_TOKEN_RETRY_SECONDS
+from app.models import models
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _expiry(now: datetime) -> datetime:
+    return now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def issue(db: Session, user_id: int) -> str:
+    """Start a session for a user who just logged in. The caller commits."""
+    now = datetime.utcnow()
+    # Housekeeping while we are here: drop the user's dead sessions
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id,
+        or_(models.RefreshToken.expires_at < now, models.RefreshToken.revoked_at.isnot(None))
+    ).delete(synchronize_session=False)
+
+    token = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(user_id=user_id, token_hash=_hash(token), expires_at=_expiry(now), created_at=now))
+    return token
+
+
+def rotate(db: Session, token: str) -> Optional[Tuple[str, str]]:
+    """
+    Exchange a refresh token for a new one.
+    Returns (user email, new token), or None if the token is not usable.
+    The caller commits.
+    """
+    now = datetime.utcnow()
+    token_hash = _hash(token)
+    session = db.query(
+        models.RefreshToken.token_id, models.RefreshToken.expires_at, models.RefreshToken.revoked_at,
+        models.User.email, models.User.deleted_at
+    ).join(models.User).filter(models.RefreshToken.token_hash == token_hash).first()
+
+    if session is None:
+        retried = _rotate_retried(db, token_hash, now)
+        if retried is None:
+            _revoke_replayed(db, token_hash, now)
+        return retried
+    if session.revoked_at is not None or session.expires_at < now or session.deleted_at is not None:
+        return None
+
+    new_token = secrets.token_urlsafe(32)
+    # Conditional on the old hash, so two requests racing with one token cannot both win
+    rotated = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_id == session.token_id,
+        models.RefreshToken.token_hash == token_hash,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({
+        models.RefreshToken.token_hash: _hash(new_token),
+        models.RefreshToken.previous_hash: token_hash,
+        models.RefreshToken.expires_at: _expiry(now),
+        models.RefreshToken.last_used_at: now,
+    }, synchronize_session=False)
+    if rotated != 1:
+        return None
+    return session.email, new_token
+
+
+def _rotate_retried(db: Session, token_hash: str, now: datetime) -> Optional[Tuple[str, str]]:
+    """
+    Rotate again for the token a session was just rotated from, if that was
+    less than REFRESH_TOKEN_RETRY_SECONDS ago. The token issued by the lost
+    response is dropped.
+    """
+    session = db.query(
+        models.RefreshToken.token_id, models.RefreshToken.token_hash, models.RefreshToken.last_used_at,
+        models.RefreshToken.expires_at, models.RefreshToken.revoked_at, models.User.email, models.User.deleted_at
+    ).join(models.User).filter(models.RefreshToken.previous_hash == token_hash).first()
+    if session is None or session.last_used_at is None:
+        return None
+    if now - session.last_used_at > timedelta(seconds=REFRESH_TOKEN_RETRY_SECONDS):
+        return None
+    if session.revoked_at is not None or session.expires_at < now or session.deleted_at is not None:
+        return None
+
+    new_token = secrets.token_urlsafe(32)
+    # last_used_at is left alone, so retries cannot stretch the window
+    rotated = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_id == session.token_id,
+        models.RefreshToken.token_hash == session.token_hash,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({
+        models.RefreshToken.token_hash: _hash(new_token),
+        models.RefreshToken.expires_at: _expiry(now),
+    }, synchronize_session=False)
+    if rotated != 1:
+        return None
+    logger.info("🔁 Refresh token retried within the grace window, rotating again")
+    return session.email, new_token
+
+
+def _revoke_replayed(db: Session, token_hash: str, now: datetime):
+    replayed = db.query(models.RefreshToken).filter(
+        models.RefreshToken.previous_hash == token_hash,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: now}, synchronize_session=False)
+    if replayed:
+        logger.warning("⚠️ Replayed refresh token, revoking its session")
+
+
+def revoke(db: Session, token: str) -> bool:
+    """End the session a token belongs to (logout). The caller commits."""
+    return db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == _hash(token),
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False) > 0
+
+
+def revoke_all(db: Session, user_id: int) -> int:
+    """End every session of a user, e.g. after a password change. The caller commits."""
+    return db.query(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
@@ -0,0 +1,379 @@
+"""
+In-memory index of gas station clusters.
+
+Nearby-price reads and station matching used to load every
+Gas_Station_Clusters row and compute a distance to each one in Python.
+Clusters are small and change rarely compared to how often they are read,
+so every worker keeps them in NumPy arrays instead (station ids, degrees and
+radians, brand codes, plus the slugs and names responses need), bucketed in
+a GRID_DEGREES grid. Radius and nearest lookups only compute distances, in
+one vectorized pass, for stations in the grid cells around the query.
+
+Workers are kept in step through counters in Cache_Versions:
+
+- Cluster writes set the rows' index_version to NULL, in the writer's
+  transaction; no shared row is locked there, so writers to different
+  clusters run concurrently.
+- After committing, the writer calls announce_version(): a short transaction
+  of its own that bumps the "stations" counter and stamps the clusters it
+  wrote with the new version.
+- Lookups read the counters first (one primary key query). When "stations"
+  moved, they fetch only the clusters stamped after their version (or not
+  stamped yet) and update the arrays in place of a reload.
+- Writers hand their clusters to apply() after announcing (write-through).
+  When the version they got is exactly one ahead of the index, nobody else
+  wrote in between and the index moves to it without reading anything.
+- ORM writes (seed scripts, the benchmark fleet generator) bump the
+  "stations_reload" counter through mapper events instead, and lookups
+  reload the whole index when it moves; that also covers deletes.
+
+The API loads the index at startup; lookups load it on first use otherwise.
+Exported metrics: station_index_stations and station_index_reloads_total.
+"""
+import logging
+import math
+import sys
+import threading
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import event, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services.geo import bounding_box, haversine_radians
+from app.utils.metrics import CounterMetric, GaugeMetric
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = "stations"
+RELOAD_NAME = "stations_reload"
+# Grid cell size in degrees (~5.5 km)
+GRID_DEGREES = 0.05
+# Cell keys are row * CELL_SPAN + column + CELL_OFFSET (columns span +-3600)
+CELL_SPAN = 1 << 14
+CELL_OFFSET = 1 << 13
+KM_PER_DEGREE = 111.32
+
+versions = models.CacheVersion.__table__
+cluster_table = models.GasStationCluster.__table__
+
+
+class IndexedStation(NamedTuple):
+    """The cluster fields lookups need, under GasStationCluster's attribute names."""
+    station_id: int
+    cluster_id: str
+    normalized_name: str
+    brand: Optional[str]
+    latitude: float
+    longitude: float
+
+    @classmethod
+    def from_cluster(cls, cluster) -> "IndexedStation":
+        return cls(cluster.station_id, cluster.cluster_id, cluster.normalized_name, cluster.brand,
+                   float(cluster.latitude), float(cluster.longitude))
+
+
+def _bump_statement(dialect_name: str, name: str = VERSION_NAME):
+    values = {"name": name, "version": 1}
+    if dialect_name == "mysql":
+        return mysql_insert(versions).values(values).on_duplicate_key_update(version=versions.c.version + 1)
+    return sqlite_insert(versions).values(values).on_conflict_do_update(
+        index_elements=[versions.c.name], set_={"version": versions.c.version + 1}
+    )
+
+
+def read_version(db: Session) -> int:
+    return db.execute(select(versions.c.version).where(versions.c.name == VERSION_NAME)).scalar() or 0
+
+
+def read_versions(db: Session) -> Tuple[int, int]:
+    """The "stations" and "stations_reload" counters, in one query."""
+    found = dict(db.execute(
+        select(versions.c.name, versions.c.version).where(versions.c.name.in_((VERSION_NAME, RELOAD_NAME)))
+    ).all())
+    return found.get(VERSION_NAME, 0), found.get(RELOAD_NAME, 0)
+
+
+def announce_version(db: Session, station_ids: Iterable[int]) -> int:
+    """
+    Tell other workers which clusters changed, after the write that changed
+    them committed: bump the counter and stamp the clusters with the new
+    version, in a transaction of its own. Returns the version for apply().
+    """
+    db.execute(_bump_statement(db.get_bind().dialect.name))
+    version = read_version(db)
+    db.execute(
+        update(cluster_table).where(cluster_table.c.station_id.in_(set(station_ids))).values(index_version=version)
+    )
+    db.commit()
+    return version
+
+
+@event.listens_for(models.GasStationCluster, "after_insert")
+@event.listens_for(models.GasStationCluster, "after_update")
+@event.listens_for(models.GasStationCluster, "after_delete")
+def _bump_on_orm_write(mapper, connection, cluster):
+    connection.execute(_bump_statement(connection.dialect.name, RELOAD_NAME))
+
+
+def _read_stations(db: Session, *criteria) -> List[IndexedStation]:
+    rows = db.execute(select(
+        cluster_table.c.station_id, cluster_table.c.cluster_id, cluster_table.c.normalized_name,
+        cluster_table.c.brand, cluster_table.c.latitude, cluster_table.c.longitude
+    ).where(*criteria)).all()
+    return [
+        IndexedStation(station_id, cluster_id, name, brand, float(latitude), float(longitude))
+        for station_id, cluster_id, name, brand, latitude, longitude in rows
+    ]
+
+
+def _cell_keys(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    rows = np.floor(latitudes / GRID_DEGREES).astype(np.int64)
+    columns = np.floor(longitudes / GRID_DEGREES).astype(np.int64)
+    return rows * CELL_SPAN + columns + CELL_OFFSET
+
+
+class _Stations:
+    """
+    One generation of the index, sorted by station_id. Never modified once
+    built, so lookups keep using the generation they started with.
+    """
+
+    def __init__(self, station_ids, latitudes, longitudes, brand_codes, brands: List[Optional[str]],
+                 cluster_ids: List[str], names: List[str], grid: Optional[Tuple] = None):
+        self.station_ids = np.asarray(station_ids, dtype=np.int64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.lat_radians = np.radians(self.latitudes)
+        self.lng_radians = np.radians(self.longitudes)
+        self.brand_codes = np.asarray(brand_codes, dtype=np.int16)
+        self.brands = brands  # Code -> brand; code 0 is "no brand"
+        self.cluster_ids = cluster_ids
+        self.names = names
+
+        if grid is None:
+            cells = _cell_keys(self.latitudes, self.longitudes)
+            order = np.argsort(cells, kind="stable").astype(np.int32)
+            cell_keys, cell_starts = np.unique(cells[order], return_index=True)
+            grid = (order, cell_keys, np.append(cell_starts, len(order)).astype(np.int32))
+        # Station positions sorted by cell, and where each occupied cell's run starts/ends
+        self.order, self.cell_keys, self.cell_bounds = grid
+
+    @classmethod
+    def build(cls, stations: Iterable[IndexedStation]) -> "_Stations":
+        stations = sorted(stations, key=lambda station: station.station_id)
+        brands, brand_codes = [None], {None: 0}
+        for station in stations:
+            brand_codes.setdefault(station.brand, len(brand_codes))
+            if len(brands) < len(brand_codes):
+                brands.append(station.brand)
+        return cls(
+            [station.station_id for station in stations],
+            [station.latitude for station in stations],
+            [station.longitude for station in stations],
+            [brand_codes[station.brand] for station in stations],
+            brands,
+            [station.cluster_id for station in stations],
+            [station.normalized_name for station in stations],
+        )
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    def station(self, position: int) -> IndexedStation:
+        return IndexedStation(
+            int(self.station_ids[position]), self.cluster_ids[position], self.names[position],
+            self.brands[self.brand_codes[position]],
+            float(self.latitudes[position]), float(self.longitudes[position])
+        )
+
+    def updated(self, stations: Sequence[IndexedStation]) -> "_Stations":
+        """A new generation with `stations` replaced or added (NumPy copies, no reload)."""
+        station_ids, latitudes, longitudes, brand_codes = (
+            self.station_ids.copy(), self.latitudes.copy(), self.longitudes.copy(), self.brand_codes.copy()
+        )
+        brands, cluster_ids, names = list(self.brands), list(self.cluster_ids), list(self.names)
+        added, moved_cell = [], False
+        for station in stations:
+            if station.brand not in brands:
+                brands.append(station.brand)
+            code = brands.index(station.brand)
+            position = int(np.searchsorted(station_ids, station.station_id))
+            if position < len(station_ids) and station_ids[position] == station.station_id:
+                moved_cell = moved_cell or (
+                    _cell_keys(np.array([station.latitude]), np.array([station.longitude]))[0]
+                    != _cell_keys(latitudes[position:position + 1], longitudes[position:position + 1])[0]
+                )
+                latitudes[position], longitudes[position] = station.latitude, station.longitude
+                brand_codes[position] = code
+                cluster_ids[position], names[position] = station.cluster_id, station.normalized_name
+            else:
+                added.append((station, code))
+        if not added:
+            # Centroids drift by metres, so the grid usually still holds
+            grid = None if moved_cell else (self.order, self.cell_keys, self.cell_bounds)
+            return _Stations(station_ids, latitudes, longitudes, brand_codes, brands, cluster_ids, names, grid)
+
+        station_ids = np.append(station_ids, [station.station_id for station, _ in added])
+        latitudes = np.append(latitudes, [station.latitude for station, _ in added])
+        longitudes = np.append(longitudes, [station.longitude for station, _ in added])
+        brand_codes = np.append(brand_codes, [code for _, code in added])
+        cluster_ids += [station.cluster_id for station, _ in added]
+        names += [station.normalized_name for station, _ in added]
+        # New station_ids are normally the highest, so this rarely reorders
+        order = np.argsort(station_ids, kind="stable")
+        if not np.array_equal(order, np.arange(len(order))):
+            station_ids, latitudes, longitudes, brand_codes = (
+                station_ids[order], latitudes[order], longitudes[order], brand_codes[order]
+            )
+            cluster_ids = [cluster_ids[i] for i in order]
+            names = [names[i] for i in order]
+        return _Stations(station_ids, latitudes, longitudes, brand_codes, brands, cluster_ids, names)
+
+    def candidates(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        """Positions of the stations in grid cells overlapping the radius's bounding box."""
+        south, north, west, east = bounding_box(latitude, longitude, radius_km)
+        rows = np.arange(math.floor(south / GRID_DEGREES), math.floor(north / GRID_DEGREES) + 1, dtype=np.int64)
+        columns = np.arange(math.floor(west / GRID_DEGREES), math.floor(east / GRID_DEGREES) + 1, dtype=np.int64)
+        if len(rows) * len(columns) >= len(self.cell_keys):
+            # Covers most occupied cells anyway
+            return np.arange(len(self), dtype=np.int32)
+
+        wanted = (rows[:, None] * CELL_SPAN + columns[None, :] + CELL_OFFSET).ravel()
+        slots = np.searchsorted(self.cell_keys, wanted)
+        occupied = slots < len(self.cell_keys)
+        occupied[occupied] = self.cell_keys[slots[occupied]] == wanted[occupied]
+        slots = slots[occupied]
+        if not len(slots):
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([
+            self.order[self.cell_bounds[slot]:self.cell_bounds[slot + 1]] for slot in slots
+        ])
+
+    def memory_bytes(self) -> int:
+        arrays = (self.station_ids, self.latitudes, self.longitudes, self.lat_radians, self.lng_radians,
+                  self.brand_codes, self.order, self.cell_keys, self.cell_bounds)
+        strings = (self.cluster_ids, self.names, self.brands)
+        return (sum(array.nbytes for array in arrays)
+                + sum(sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values) for values in strings))
+
+
+class StationIndex:
+    """This process's copy of Gas_Station_Clusters, for radius and nearest lookups."""
+
+    def __init__(self):
+        self._stations: Optional[_Stations] = None
+        self.version: Optional[int] = None
+        self.reload_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.reloads = CounterMetric("station_index_reloads_total", "Full reloads of the in-memory station index")
+        self.refreshes = CounterMetric(
+            "station_index_refreshes_total", "Station index updates from other workers' writes, without a reload"
+        )
+        self.size = GaugeMetric("station_index_stations", "Stations in this process's station index", self.__len__)
+
+    def metrics(self):
+        return (self.size, self.reloads, self.refreshes)
+
+    def __len__(self) -> int:
+        stations = self._stations
+        return len(stations) if stations is not None else 0
+
+    def load(self, db: Session, counters: Optional[Tuple[int, int]] = None):
+        """Read every cluster into a new generation of the index."""
+        if counters is None:
+            counters = read_versions(db)
+        version, reload_version = counters
+        stations = _Stations.build(_read_stations(db))
+        with self._lock:
+            # A slower load of an older version must not replace a newer one
+            if self.version is None or (version, reload_version) >= (self.version, self.reload_version):
+                self._stations, self.version, self.reload_version = stations, version, reload_version
+        self.reloads.inc()
+        logger.info(f"🗺️ Station index loaded: {len(stations)} stations at version {version}")
+
+    def refresh(self, db: Session, version: int):
+        """Fetch the clusters written since this index's version and update them in place."""
+        since = self.version
+        stations = _read_stations(
+            db, or_(cluster_table.c.index_version > since, cluster_table.c.index_version.is_(None))
+        )
+        with self._lock:
+            if self._stations is None or self.version != since:
+                return  # Another thread got there first
+            self._stations = self._stations.updated(stations) if stations else self._stations
+            self.version = version
+        self.refreshes.inc()
+
+    def ensure_current(self, db: Session):
+        """
+        Catch up with other workers' writes. One primary key query when
+        nothing changed, one query for the changed clusters otherwise.
+        """
+        version, reload_version = read_versions(db)
+        if self._stations is None or self.version is None or reload_version > self.reload_version:
+            self.load(db, (version, reload_version))
+        # A lagging replica may report an older version; the index is newer then
+        elif version > self.version:
+            self.refresh(db, version)
+
+    def apply(self, clusters: Iterable, version: int) -> bool:
+        """
+        Write-through of clusters this process committed, announced as
+        `version` by announce_version(). Returns False (and leaves the
+        update to the next lookup's refresh) when other writes happened in
+        between.
+        """
+        stations = [IndexedStation.from_cluster(cluster) for cluster in clusters]
+        with self._lock:
+            if self._stations is None or self.version is None or version != self.version + 1:
+                return False
+            self._stations = self._stations.updated(stations)
+            self.version = version
+            return True
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[IndexedStation, float]]:
+        """Stations within radius_km of a point, nearest first, with their distance in km."""
+        stations = self._stations
+        if stations is None or not len(stations):
+            return []
+        positions = stations.candidates(latitude, longitude, radius_km)
+        distances = haversine_radians(math.radians(latitude), math.radians(longitude),
+                                      stations.lat_radians[positions], stations.lng_radians[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        by_distance = np.argsort(distances, kind="stable")
+        return [(stations.station(positions[i]), float(distances[i])) for i in by_distance]
+
+    def nearest(self, latitude: float, longitude: float, count: int = 1,
+                max_km: float = 50.0) -> List[Tuple[IndexedStation, float]]:
+        """The `count` stations closest to a point, within max_km, nearest first."""
+        radius = min(GRID_DEGREES * KM_PER_DEGREE, max_km)
+        while True:
+            found = self.within(latitude, longitude, radius)
+            # Everything within `radius` is found, so the closest ones are exact
+            if len(found) >= count or radius >= max_km:
+                return found[:count]
+            radius = min(radius * 4, max_km)
+
+    def memory_bytes(self) -> int:
+        stations = self._stations
+        return stations.memory_bytes() if stations is not None else 0
+
+
+station_index = StationIndex()
+
+
+if __name__ == "__main__":
+    from app.database.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        station_index.load(db)
+    finally:
+        db.close()
+    print(f"✅ {len(station_index)} stations, {station_index.memory_bytes() / 1024 / 1024:.1f} MiB")
@@ -7,6 +7,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from ..schemas import schemas
 from ..database.database import get_db
+from ..database.replicas import require_fresh
 from ..models import models
 from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
@@ -32,7 +33,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,10 +48,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
         
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    user = db.query(models.User).filter(
+        models.User.email == token_data.email,
+        models.User.deleted_at.is_(None)
+    ).first()
     if user is None:
         raise credentials_exception
+    # Replica reads must include this user's latest write
+    require_fresh(db, user.data_updated_at)
     return user
 
-async def get_current_active_user(current_user = Depends(get_current_user)):
+def get_current_active_user(current_user = Depends(get_current_user)):
     return current_user
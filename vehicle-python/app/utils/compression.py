@@ -0,0 +1,217 @@
+"""
+Negotiated response compression.
+
+CompressionMiddleware gzip- or brotli-encodes responses (brotli only when the
+optional `brotli` package is installed) according to the client's
+Accept-Encoding. Bodies under the size threshold are sent as-is, and bodies
+are compressed chunk by chunk as the app sends them, so streamed responses
+are never buffered whole.
+
+Responses that already carry a Content-Encoding pass through untouched, which
+is how routes serving precompressed bytes (snapshot tiles, PrecompressedBody)
+avoid recompressing on every hit. Server-Sent Events are never compressed so
+each event reaches the client as soon as it is sent.
+"""
+import zlib
+from threading import Lock
+from typing import Dict, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+# Server preference order when the client accepts several equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml", "text/")
+UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str],
+                       available: Sequence[str] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Pick the best of `available` for an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class StreamEncoder:
+    """Incremental gzip/brotli encoder."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31: gzip container
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress a chunk; `flush` forces out everything buffered so far."""
+        if self.encoding == "br":
+            output = self._brotli.process(data)
+            return output + self._brotli.flush() if flush else output
+        output = self._zlib.compress(data)
+        return output + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 9, brotli_quality: int = 11) -> bytes:
+    """One-shot compression, defaulting to maximum ratio for bytes that are cached."""
+    encoder = StreamEncoder(encoding, gzip_level, brotli_quality)
+    return encoder.compress(data) + encoder.finish()
+
+
+class PrecompressedBody:
+    """
+    A cacheable response body whose compressed variants are computed once,
+    on first request for each encoding, and reused for every later hit.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._variants: Dict[str, bytes] = {}
+        self._lock = Lock()
+
+    def encoded(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Body and Content-Encoding (None for identity) for a request."""
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            return self.data, None
+        with self._lock:
+            variant = self._variants.get(encoding)
+            if variant is None:
+                variant = self._variants[encoding] = compress(self.data, encoding)
+        return variant, encoding
+
+
+def _add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing eligible responses on the fly."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.gzip_level, self.brotli_quality)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._start: Optional[dict] = None
+        self._encoder: Optional[StreamEncoder] = None
+        self._passthrough = False
+
+    def _eligible(self, message: dict) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(UNCOMPRESSIBLE_TYPES) or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        content_length = headers.get("content-length")
+        return content_length is None or int(content_length) >= self.minimum_size
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            if self._eligible(message):
+                # Hold the headers until the first body chunk shows the size
+                self._start = message
+            else:
+                self._passthrough = True
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._encoder is None:
+            start, self._start = self._start, None
+            if not more_body and len(body) < self.minimum_size:
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            del headers["content-length"]
+            headers["Content-Encoding"] = self.encoding
+            _add_vary(headers)
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ, so a strong validator no longer applies
+                headers["ETag"] = f"W/{etag}"
+            self._encoder = StreamEncoder(self.encoding, self.gzip_level, self.brotli_quality)
+            if not more_body:
+                # Whole body in one message: compress it and keep a Content-Length
+                body = self._encoder.compress(body) + self._encoder.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            await self._send(start)
+
+        if more_body:
+            chunk = self._encoder.compress(body, flush=True)
+            if chunk:
+                await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            chunk = self._encoder.compress(body) + self._encoder.finish()
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": False})
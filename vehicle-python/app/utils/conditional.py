@@ -0,0 +1,127 @@
+"""
+Conditional GET support (ETag / If-None-Match / Last-Modified).
+
+Users and vehicles carry a data_version counter that every write in the
+vehicles, fuel, maintenance and reminders routes bumps. List endpoints turn
+the version into an ETag and answer 304 Not Modified before running their
+list query. The version comes from rows the route loads anyway (the current
+user, or the vehicle ownership check), so a 304 costs no extra queries.
+
+With read replicas configured, the user's data_updated_at is stamped again
+once the transaction has committed: it is the read-your-writes watermark
+(see database.replicas), and a time taken before a slow commit could let a
+replica that has not applied the write look fresh enough.
+"""
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import event, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..database import database
+from ..models import models
+
+logger = logging.getLogger(__name__)
+
+
+def bump_versions(db: Session, user_id: int, vehicle_id: Optional[int] = None,
+                  vehicle_changed: bool = False) -> int:
+    """
+    Mark a user's data (and optionally one vehicle's logs) as changed.
+    Runs as atomic UPDATEs in the caller's transaction and returns the user's
+    new data_version, which callers stamp on the rows they write (/sync).
+    Pass vehicle_changed when the vehicle row itself changed (e.g. mileage),
+    so /sync re-sends it; log writes alone only invalidate its ETags.
+
+    The UPDATE locks the user row until commit, so one user's writes are
+    serialized and commit in data_version order.
+    """
+    now = datetime.utcnow()
+    # Pending row changes are flushed once, after the caller stamps them
+    with db.no_autoflush:
+        db.query(models.User).filter(models.User.user_id == user_id).update(
+            {models.User.data_version: models.User.data_version + 1, models.User.data_updated_at: now},
+            synchronize_session=False
+        )
+        version = db.query(models.User.data_version).filter(models.User.user_id == user_id).scalar()
+        if vehicle_id is not None:
+            changes = {models.Vehicle.data_version: models.Vehicle.data_version + 1,
+                       models.Vehicle.data_updated_at: now}
+            if vehicle_changed:
+                # Re-sending the vehicle means re-sending its (multi-MB) image
+                changes[models.Vehicle.sync_version] = version
+            db.query(models.Vehicle).filter(models.Vehicle.vehicle_id == vehicle_id).update(
+                changes, synchronize_session=False
+            )
+    db.info.setdefault("written_users", set()).add(user_id)
+    return version
+
+
+@event.listens_for(Session, "after_commit")
+def _stamp_committed_writes(db: Session):
+    user_ids = db.info.pop("written_users", None)
+    if not user_ids or not database.replica_router.replicas:
+        return
+    # The session's transaction is over, so stamp on a connection of its own
+    try:
+        with db.get_bind(models.User.__mapper__).begin() as conn:
+            conn.execute(
+                update(models.User).where(models.User.user_id.in_(user_ids)).values(data_updated_at=datetime.utcnow())
+            )
+    except SQLAlchemyError as e:
+        logger.warning(f"⚠️ Could not stamp read-your-writes watermark for users {sorted(user_ids)}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(db: Session):
+    db.info.pop("written_users", None)
+
+
+def make_etag(scope: str, owner_id: int, version: Optional[int], request: Request, *extra) -> str:
+    """Weak ETag for one resource version; query params and extras are folded in."""
+    variant = "|".join([str(request.url.path), str(request.url.query)] + [str(value) for value in extra])
+    return f'W/"{scope}{owner_id}-{version or 0}-{zlib.crc32(variant.encode()):08x}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(request: Request, response: Response, etag: str,
+                 last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Return a 304 response if the client's cached copy is current; otherwise
+    set the validators on `response` and return None so the route continues.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True
+        )
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    elif last_modified is not None and "if-modified-since" in request.headers:
+        # Last-Modified has one-second resolution; only trust it for data that
+        # has not changed within the last second
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"]).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            since = None
+        if (since is not None and last_modified < datetime.utcnow() - timedelta(seconds=1)
+                and last_modified.replace(microsecond=0) <= since):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,145 @@
+"""
+Idempotency-Key support for create endpoints.
+
+Mobile clients retry POSTs whose response got lost. Without a key every
+retry inserts another row (and for fuel logs re-clusters the station and
+counts the price twice). With `Idempotency-Key: <uuid>` the first request
+claims the key and later requests with the same key get the stored response
+back (marked `Idempotent-Replayed: true`) without touching anything.
+
+Keys live in Idempotency_Keys, scoped to the user, for
+IDEMPOTENCY_KEY_TTL_HOURS:
+
+- claim: INSERT of the key, committed at once so concurrent retries see it.
+  A retry while the first request is still running gets 409; the same key
+  with a different body gets 422. A claim left behind by a crashed worker
+  can be taken over after IDEMPOTENCY_PENDING_TIMEOUT_SECONDS.
+- store: the response is saved in the same transaction as the created row,
+  so a committed write always has a replayable response. Nothing the route
+  calls before store may commit (MileageService takes commit=False).
+- release: a failed request deletes its claim so the client can retry.
+
+Claiming also deletes the user's expired keys, which keeps the table small
+without a cleanup job.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Type
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import IDEMPOTENCY_KEY_TTL_HOURS, IDEMPOTENCY_PENDING_TIMEOUT_SECONDS
+from ..models import models
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 64
+
+
+class IdempotencyClaim:
+    """The outcome of claiming a key: go ahead (key_id), replay, or no key at all."""
+
+    def __init__(self, key_id: Optional[int] = None, replay: Optional[Response] = None):
+        self.key_id = key_id
+        self.replay = replay
+
+    def store(self, db: Session, obj, schema: Type[BaseModel]):
+        """Save the response for `obj` in the caller's transaction (before its commit)."""
+        if self.key_id is None:
+            return
+        db.flush()
+        db.refresh(obj)  # Read back as stored (id, rounded decimals), like the response itself
+        db.query(models.IdempotencyKey).filter(models.IdempotencyKey.key_id == self.key_id).update({
+            models.IdempotencyKey.status_code: status.HTTP_200_OK,
+            models.IdempotencyKey.response_body: schema.model_validate(obj).model_dump_json(),
+        }, synchronize_session=False)
+
+    def release(self, db: Session):
+        """Forget a claim whose request failed. Call after rolling back."""
+        if self.key_id is None:
+            return
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.key_id == self.key_id,
+            models.IdempotencyKey.status_code.is_(None)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+def _fingerprint(request: Request, body: bytes) -> str:
+    return hashlib.sha256(request.method.encode() + b" " + request.url.path.encode() + b"\n" + body).hexdigest()
+
+
+async def request_body(request: Request) -> bytes:
+    """
+    The raw body, for claim(). A dependency so the route itself can be a
+    plain `def` (its database work runs in the threadpool, off the event loop).
+    """
+    return await request.body()
+
+
+def claim(request: Request, body: bytes, db: Session, user_id: int) -> IdempotencyClaim:
+    key = request.headers.get(HEADER)
+    if key is None:
+        return IdempotencyClaim()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters"
+        )
+
+    now = datetime.utcnow()
+    fingerprint = _fingerprint(request, body)
+    db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.expires_at < now
+    ).delete(synchronize_session=False)
+    row = models.IdempotencyKey(
+        user_id=user_id, idempotency_key=key, request_hash=fingerprint,
+        created_at=now, expires_at=now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    )
+    db.add(row)
+    try:
+        db.commit()
+        return IdempotencyClaim(key_id=row.key_id)
+    except IntegrityError:
+        db.rollback()
+
+    existing = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.idempotency_key == key
+    ).first()
+    if existing is None:  # Expired and deleted by another request meanwhile
+        return claim(request, body, db, user_id)
+    if existing.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"{HEADER} was already used for a different request"
+        )
+    if existing.status_code is not None:
+        logger.info(f"🔁 Replaying idempotent response for user {user_id}")
+        return IdempotencyClaim(replay=Response(
+            content=existing.response_body,
+            status_code=existing.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        ))
+
+    # Still running, unless the worker handling it died
+    stale_before = now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+    taken_over = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.key_id == existing.key_id,
+        models.IdempotencyKey.status_code.is_(None),
+        models.IdempotencyKey.created_at < stale_before
+    ).update({models.IdempotencyKey.created_at: now}, synchronize_session=False)
+    db.commit()
+    if taken_over:
+        return IdempotencyClaim(key_id=existing.key_id)
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still being processed"
+    )
@@ -0,0 +1,253 @@
+"""
+Lightweight request and database instrumentation.
+
+- MetricsMiddleware records per-route latency histograms and, through
+  SQLAlchemy engine events, the number of SQL statements each request runs.
+- Statements slower than SLOW_QUERY_MS and requests that repeat the same
+  statement N_PLUS_ONE_THRESHOLD times (the classic N+1 pattern) are counted
+  and logged with their route.
+- Everything is exposed in Prometheus text format by MetricsRegistry.render(),
+  served at /metrics.
+
+All bookkeeping is a few dict updates under a lock, so it is cheap enough to
+leave enabled in production.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label set (Prometheus semantics)."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(key, le=bound)} {cumulative}"
+            yield f"{self.name}_count{_labels(key)} {cumulative}"
+            yield f"{self.name}_sum{_labels(key)} {series[-1]}"
+
+
+class CounterMetric:
+    """Monotonic counter keyed by label set."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            snapshot = dict(self._values)
+        for key, value in sorted(snapshot.items()):
+            yield f"{self.name}{_labels(key)} {value}"
+
+
+class GaugeMetric:
+    """Current value read from a callback when rendered (queue depths and the like)."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.read()}"
+
+
+def _labels(key: Labels, **extra) -> str:
+    items = list(key) + [(name, value) for name, value in extra.items()]
+    if not items:
+        return ""
+    rendered = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in items
+    )
+    return "{" + ",".join(rendered) + "}"
+
+
+class RequestQueryStats:
+    """SQL statements issued while serving one request."""
+
+    __slots__ = ("count", "statements", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.statements: Counter = Counter()
+        self.slow = 0
+
+
+class MetricsRegistry:
+    def __init__(self, slow_query_ms: float = 200, n_plus_one_threshold: int = 10):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            "http_request_db_queries", "SQL statements executed per request", QUERY_COUNT_BUCKETS)
+        self.query_latency = Histogram(
+            "db_query_duration_seconds", "SQL statement latency", LATENCY_BUCKETS)
+        self.requests = CounterMetric("http_requests_total", "HTTP requests by route and status")
+        self.slow_queries = CounterMetric("db_slow_queries_total", "SQL statements slower than the slow query threshold")
+        self.n_plus_one = CounterMetric("db_n_plus_one_total", "Requests repeating one statement past the N+1 threshold")
+        self._current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+        self._instrumented = set()
+        self._extra = []
+
+    def register(self, *extra_metrics):
+        """Export metrics owned by other components (e.g. the rate limiter)."""
+        self._extra.extend(extra_metrics)
+
+    def all_metrics(self):
+        return (self.request_latency, self.request_queries, self.query_latency,
+                self.requests, self.slow_queries, self.n_plus_one, *self._extra)
+
+    # --- SQLAlchemy hooks -------------------------------------------------
+
+    def instrument_engine(self, engine: Engine):
+        """Attach statement counting/timing hooks to an engine (once)."""
+        if id(engine) in self._instrumented:
+            return
+        self._instrumented.add(id(engine))
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_times"].pop()
+        elapsed = time.perf_counter() - started
+        self.query_latency.observe(elapsed)
+
+        stats = self._current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.statements[statement] += 1
+
+        if elapsed >= self.slow_query_seconds:
+            self.slow_queries.inc()
+            if stats is not None:
+                stats.slow += 1
+            logger.warning(f"🐢 Slow query ({elapsed * 1000:.0f} ms): {statement[:300]}")
+
+    # --- Request tracking ---------------------------------------------------
+
+    def start_request(self):
+        return self._current.set(RequestQueryStats())
+
+    def finish_request(self, token, method: str, route: str, status: int, elapsed: float) -> RequestQueryStats:
+        stats = self._current.get()
+        self._current.reset(token)
+
+        self.request_latency.observe(elapsed, method=method, route=route)
+        self.requests.inc(method=method, route=route, status=str(status))
+        self.request_queries.observe(stats.count, method=method, route=route)
+
+        if stats.statements:
+            statement, repeats = stats.statements.most_common(1)[0]
+            if repeats >= self.n_plus_one_threshold:
+                self.n_plus_one.inc(method=method, route=route)
+                logger.warning(
+                    f"🔁 Possible N+1 on {method} {route}: statement repeated {repeats}x "
+                    f"({stats.count} queries total): {statement[:200]}"
+                )
+        return stats
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.all_metrics():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request and its SQL statements."""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        token = self.registry.start_request()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.registry.finish_request(
+                token,
+                scope["method"],
+                getattr(route, "path", "<unmatched>"),
+                status_holder["status"],
+                time.perf_counter() - started
+            )
+
+
+# Process-wide registry used by the middleware and /metrics
+metrics = MetricsRegistry(SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD)
@@ -0,0 +1,21 @@
+"""
+Partial updates.
+
+PUT and PATCH handlers apply the fields a client sent with apply_changes(),
+which only assigns attributes whose value actually differs. Unchanged
+attributes stay clean, so the flush's UPDATE lists just the changed columns
+(and is skipped entirely when nothing changed), and handlers can run
+expensive side effects only for the fields in the returned set.
+"""
+from typing import Any, Dict, Set
+
+
+def apply_changes(obj, changes: Dict[str, Any]) -> Set[str]:
+    """Set each differing attribute on `obj`; returns the names that changed."""
+    changed = set()
+    for key, value in changes.items():
+        # Decimal("30") == Decimal("30.00"), so re-sent amounts compare equal
+        if getattr(obj, key) != value:
+            setattr(obj, key, value)
+            changed.add(key)
+    return changed
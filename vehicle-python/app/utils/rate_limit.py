@@ -0,0 +1,307 @@
+"""
+Token-bucket rate limiting and admission control.
+
+Every request spends tokens from a bucket keyed by the caller: the user from
+a valid JWT, otherwise the client IP. Routes have costs (a 50 km
+/fuel-prices/nearby search costs more than a 2 km one), and login/password
+reset routes draw from a separate, much smaller per-IP bucket so they cannot
+be used to flood SMTP or brute-force passwords.
+
+Expensive routes are additionally capped per worker by an in-flight limit,
+so under load they get 429 + Retry-After instead of queueing on the
+database pool and slowing down every other request.
+
+Buckets live in process memory by default. With several workers set
+RATE_LIMIT_REDIS_URL so all workers share them (one atomic Lua script per
+request, awaited with redis.asyncio so a slow Redis never blocks the event
+loop); if Redis is unreachable the limiter falls back to local buckets.
+Allowed/rejected counts are exported on /metrics.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers, QueryParams
+
+from ..config import (
+    SECRET_KEY, ALGORITHM, RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_PER_SECOND,
+    RATE_LIMIT_AUTH_CAPACITY, RATE_LIMIT_AUTH_REFILL_PER_MINUTE, RATE_LIMIT_EXPENSIVE_CONCURRENCY,
+    RATE_LIMIT_REDIS_URL, RATE_LIMIT_TRUST_FORWARDED
+)
+from .metrics import CounterMetric
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitPolicy:
+    """Bucket size and refill rate; `per_ip` policies ignore the JWT."""
+
+    def __init__(self, name: str, capacity: float, refill_per_second: float, per_ip: bool = False):
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.per_ip = per_ip
+
+
+def nearby_cost(query: QueryParams) -> float:
+    """Wider searches aggregate more stations: 1 token per 10 km of radius, minimum 1."""
+    try:
+        radius_km = float(query.get("radius_km", 5.0))
+    except ValueError:
+        return 1
+    # nan and infinities parse as floats, but math.ceil rejects them
+    if not math.isfinite(radius_km):
+        return 1
+    return max(1.0, math.ceil(min(radius_km, 50.0) / 10.0))
+
+
+Cost = Union[float, Callable[[QueryParams], float]]
+
+# (method, path) -> (policy name, cost, expensive)
+ROUTE_COSTS: Dict[Tuple[str, str], Tuple[str, Cost, bool]] = {
+    ("POST", "/auth/token"): ("auth", 1, False),
+    ("POST", "/auth/refresh"): ("auth", 1, False),
+    ("POST", "/auth/register"): ("auth", 2, False),
+    ("POST", "/auth/forgot-password"): ("auth", 5, False),  # Sends an email
+    ("POST", "/auth/reset-password"): ("auth", 2, False),
+    ("POST", "/auth/change-password"): ("auth", 2, False),
+    ("GET", "/fuel-prices/nearby"): ("api", nearby_cost, True),
+    ("GET", "/locations/search"): ("api", 5, True),  # Proxied to Nominatim
+    ("GET", "/dashboard/"): ("api", 3, False),
+    ("GET", "/sync/"): ("api", 3, False),
+}
+DEFAULT_COST = ("api", 1, False)
+EXEMPT_PATHS = {"/", "/metrics", "/docs", "/redoc", "/openapi.json"}
+
+
+class MemoryBackend:
+    """Per-process buckets."""
+
+    def __init__(self):
+        self._buckets: Dict[str, list] = {}  # key -> [tokens, updated_at, seconds to refill]
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    async def take(self, key: str, cost: float, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+        """Spend `cost` tokens. Returns (allowed, tokens left, seconds until allowed)."""
+        return self.take_now(key, cost, policy)
+
+    def take_now(self, key: str, cost: float, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [policy.capacity, now, policy.capacity / policy.refill_per_second]
+            tokens = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            bucket[0], bucket[1] = tokens, now
+            self._sweep(now)
+        retry_after = 0.0 if allowed else (cost - tokens) / policy.refill_per_second
+        return allowed, tokens, retry_after
+
+    def _sweep(self, now: float):
+        # Buckets untouched long enough to be full again carry no state
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for key in [k for k, (_, updated, refill) in self._buckets.items() if now - updated > refill]:
+            del self._buckets[key]
+
+
+class RedisBackend:
+    """Buckets shared by all workers through Redis."""
+
+    # Uses the Redis server clock so workers never disagree about refill
+    TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    # After a failure, requests use local buckets for this long instead of
+    # each waiting out the timeout again
+    RETRY_SECONDS = 5.0
+
+    def __init__(self, redis_url: str, timeout_seconds: float = 0.2):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed") from e
+        self._client = redis.Redis.from_url(
+            redis_url, socket_timeout=timeout_seconds, socket_connect_timeout=timeout_seconds
+        )
+        self._take = self._client.register_script(self.TAKE_SCRIPT)
+        self._fallback = MemoryBackend()
+        self._retry_at = 0.0
+
+    async def take(self, key: str, cost: float, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+        if time.monotonic() < self._retry_at:
+            return self._fallback.take_now(key, cost, policy)
+        try:
+            allowed, tokens = await self._take(
+                keys=[f"ratelimit:{key}"], args=[policy.capacity, policy.refill_per_second, cost]
+            )
+        except Exception as e:
+            # Limiting is best effort; never fail requests because Redis is down
+            logger.warning(f"⚠️ Rate limit backend unavailable, using local buckets: {e}")
+            self._retry_at = time.monotonic() + self.RETRY_SECONDS
+            return self._fallback.take_now(key, cost, policy)
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (cost - tokens) / policy.refill_per_second
+        return bool(allowed), tokens, retry_after
+
+
+def create_backend(redis_url: Optional[str] = None):
+    return RedisBackend(redis_url) if redis_url else MemoryBackend()
+
+
+class RateLimiter:
+    def __init__(self, policies: Dict[str, RateLimitPolicy], backend=None,
+                 expensive_concurrency: int = 8, trust_forwarded: bool = False):
+        self.policies = policies
+        self.backend = backend or MemoryBackend()
+        self.expensive_concurrency = expensive_concurrency
+        self.trust_forwarded = trust_forwarded
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.allowed = CounterMetric("rate_limit_allowed_total", "Requests admitted by the rate limiter")
+        self.rejected = CounterMetric("rate_limit_rejected_total", "Requests rejected with 429, by reason")
+
+    def metrics(self):
+        return (self.allowed, self.rejected)
+
+    def client_ip(self, scope, headers: Headers) -> str:
+        if self.trust_forwarded:
+            forwarded = headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def caller_key(self, scope, headers: Headers, per_ip: bool) -> str:
+        """User from a valid bearer token, otherwise the client IP."""
+        if not per_ip:
+            authorization = headers.get("authorization", "")
+            if authorization.lower().startswith("bearer "):
+                try:
+                    subject = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+                except JWTError:
+                    subject = None
+                if subject:
+                    return f"user:{subject}"
+        return f"ip:{self.client_ip(scope, headers)}"
+
+    async def check(self, scope) -> Tuple[Optional[dict], bool]:
+        """
+        Admit or reject one request. Returns (rejection, holds_slot): rejection
+        is None when admitted, otherwise the 429 details; holds_slot means
+        the caller must call release() when the request finishes.
+        """
+        path = scope["path"]
+        if path in EXEMPT_PATHS:
+            return None, False
+
+        policy_name, cost, expensive = ROUTE_COSTS.get((scope["method"], path), DEFAULT_COST)
+        policy = self.policies[policy_name]
+        if callable(cost):
+            cost = cost(QueryParams(scope.get("query_string", b"")))
+        cost = min(cost, policy.capacity)
+
+        # Shed load before charging the caller: an overload 429 costs no tokens
+        if expensive:
+            with self._in_flight_lock:
+                if self._in_flight >= self.expensive_concurrency:
+                    self.rejected.inc(policy=policy.name, reason="overload")
+                    return {"retry_after": 1, "limit": policy.capacity, "remaining": None}, False
+                self._in_flight += 1
+
+        headers = Headers(scope=scope)
+        key = f"{policy.name}:{self.caller_key(scope, headers, policy.per_ip)}"
+        try:
+            allowed, remaining, retry_after = await self.backend.take(key, cost, policy)
+        except BaseException:
+            # Cancelled (client gone) while waiting on the backend
+            if expensive:
+                self.release()
+            raise
+        if not allowed:
+            if expensive:
+                self.release()
+            self.rejected.inc(policy=policy.name, reason="rate")
+            return {"retry_after": retry_after, "limit": policy.capacity, "remaining": remaining}, False
+
+        self.allowed.inc(policy=policy.name)
+        return None, expensive
+
+    def release(self):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 for callers over their budget."""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rejection, holds_slot = await self.limiter.check(scope)
+        if rejection is not None:
+            await self._reject(send, rejection)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if holds_slot:
+                self.limiter.release()
+
+    async def _reject(self, send, rejection: dict):
+        body = json.dumps({"detail": "Too many requests, please slow down"}).encode("utf-8")
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(rejection["retry_after"]))).encode()),
+            (b"x-ratelimit-limit", str(int(rejection["limit"])).encode()),
+        ]
+        if rejection["remaining"] is not None:
+            headers.append((b"x-ratelimit-remaining", str(max(0, int(rejection["remaining"]))).encode()))
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+# Process-wide limiter used by RateLimitMiddleware
+rate_limiter = RateLimiter(
+    {
+        "api": RateLimitPolicy("api", RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_PER_SECOND),
+        "auth": RateLimitPolicy("auth", RATE_LIMIT_AUTH_CAPACITY, RATE_LIMIT_AUTH_REFILL_PER_MINUTE / 60.0, per_ip=True),
+    },
+    backend=create_backend(RATE_LIMIT_REDIS_URL),
+    expensive_concurrency=RATE_LIMIT_EXPENSIVE_CONCURRENCY,
+    trust_forwarded=RATE_LIMIT_TRUST_FORWARDED
+)
@@ -0,0 +1,71 @@
+"""
+Fast JSON path for large lists of trusted database rows.
+
+With a response_model, FastAPI validates every ORM object against the schema
+(from_attributes) before Pydantic encodes it. For rows we just read from our
+own tables that validation only costs CPU: the ORM objects have to be
+hydrated and tracked, and every attribute goes through the validator.
+
+select_as() queries only the schema's columns as plain tuples and
+rows_response() encodes them with orjson. The bytes are identical to the
+response_model output (same field order, Decimals as strings), so routes keep
+response_model for the OpenAPI docs. See benchmarks/serialization.py.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Optional, Tuple, Type
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, Session
+
+
+def _default(value: Any):
+    # Pydantic encodes Decimal as its string form ("1950.00"); keep that contract
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson, for content that is not a response_model."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def schema_columns(model, schema: Type[BaseModel], joined: Tuple = ()) -> Tuple:
+    """Model columns for each schema field, in the schema's field order."""
+    overrides = dict(joined)
+    return tuple(
+        (overrides[name] if name in overrides else getattr(model, name)).label(name)
+        for name in schema.model_fields
+    )
+
+
+def select_as(db: Session, model, schema: Type[BaseModel], **joined) -> Query:
+    """
+    Query returning `schema`'s fields of `model` as plain rows. Fields that
+    are not columns of `model` are given as keyword arguments (columns of a
+    table the caller joins), e.g. station_cluster_id=GasStationCluster.cluster_id.
+    """
+    return db.query(*schema_columns(model, schema, tuple(sorted(joined.items(), key=lambda item: item[0]))))
+
+
+def rows_response(query: Query, response: Optional[Response] = None) -> Response:
+    """
+    Run a select_as() query and encode its rows as a JSON array. Headers
+    already set on the route's injected `response` (ETag, Cache-Control) are
+    carried over.
+    """
+    names = [column["name"] for column in query.column_descriptions]
+    content = dumps([dict(zip(names, row)) for row in query.all()])
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=content, media_type="application/json", headers=headers)
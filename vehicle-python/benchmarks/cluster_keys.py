@@ -0,0 +1,115 @@
+"""
+Station key benchmark: the old 100-char slug against the integer station_id.
+
+Builds Fuel_Info-shaped tables with the same rows twice, once referencing
+stations by slug (as before the c81f4e2b9d36 migration) and once by
+station_id, then reports for each:
+
+- index_kb: size of the Fuel_Info index on the station column, measured as
+  the pages CREATE INDEX adds to the database file
+- join_ms: median time of the nearby-price read, logs joined to their
+  stations and filtered to the stations near a point
+
+Slugs come from LocationService._generate_cluster_id, so their length
+matches production. Data lives in a private SQLite database; .env is
+only read for app config.
+
+Usage:
+    python -m benchmarks.cluster_keys --rows 200000 --stations 2000 --repeat 20
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, text
+
+from app.services.location_service import LocationService
+from benchmarks.fleet_generator import BRANDS, METRO_MANILA_LAT, METRO_MANILA_LNG, STREETS
+
+SEARCH_BOX = (14.55, 14.65, 120.95, 121.05)
+
+KEYS = {
+    "slug": ("VARCHAR(100)", "cluster_id"),
+    "station_id": ("INTEGER", "station_id"),
+}
+
+
+def _seed(conn, rows: int, stations: int, rng: random.Random):
+    conn.execute(text(
+        "CREATE TABLE stations (station_id INTEGER PRIMARY KEY, cluster_id VARCHAR(100) NOT NULL UNIQUE, "
+        "latitude DECIMAL(10,8) NOT NULL, longitude DECIMAL(11,8) NOT NULL)"
+    ))
+    clusters = []
+    for station_id in range(1, stations + 1):
+        lat, lng = rng.uniform(*METRO_MANILA_LAT), rng.uniform(*METRO_MANILA_LNG)
+        slug = LocationService._generate_cluster_id(f"{rng.choice(BRANDS)}, {rng.choice(STREETS)}", lat, lng)
+        clusters.append({"station_id": station_id, "cluster_id": slug, "latitude": lat, "longitude": lng})
+    conn.execute(text(
+        "INSERT INTO stations VALUES (:station_id, :cluster_id, :latitude, :longitude)"
+    ), clusters)
+
+    for name, (column_type, _) in KEYS.items():
+        conn.execute(text(
+            f"CREATE TABLE logs_{name} (fuel_id INTEGER PRIMARY KEY, station {column_type}, cost DECIMAL(10,2))"
+        ))
+    logs = []
+    for fuel_id in range(1, rows + 1):
+        cluster = rng.choice(clusters)
+        logs.append({"fuel_id": fuel_id, "station_id": cluster["station_id"], "cluster_id": cluster["cluster_id"],
+                     "cost": round(rng.uniform(800, 3500), 2)})
+    for name, (_, key) in KEYS.items():
+        conn.execute(text(f"INSERT INTO logs_{name} VALUES (:fuel_id, :{key}, :cost)"), logs)
+
+
+def _index_kb(conn, name: str) -> float:
+    page_size = conn.execute(text("PRAGMA page_size")).scalar()
+    before = conn.execute(text("PRAGMA page_count")).scalar()
+    conn.execute(text(f"CREATE INDEX idx_logs_{name} ON logs_{name} (station)"))
+    return round((conn.execute(text("PRAGMA page_count")).scalar() - before) * page_size / 1024, 1)
+
+
+def _join_ms(conn, name: str, key: str, repeat: int) -> float:
+    query = text(
+        f"SELECT stations.cluster_id, COUNT(*), AVG(logs.cost) FROM logs_{name} AS logs "
+        f"JOIN stations ON stations.{key} = logs.station "
+        "WHERE stations.latitude BETWEEN :south AND :north AND stations.longitude BETWEEN :west AND :east "
+        "GROUP BY stations.cluster_id"
+    )
+    south, north, west, east = SEARCH_BOX
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(query, {"south": south, "north": north, "west": west, "east": east}).all()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return round(samples[len(samples) // 2] * 1000, 2)
+
+
+def run_benchmark(rows: int, stations: int, repeat: int, seed: int = 1) -> Dict:
+    directory = tempfile.mkdtemp(prefix="cluster-keys-")
+    engine = create_engine(f"sqlite:///{directory}/bench.db")
+    with engine.begin() as conn:
+        _seed(conn, rows, stations, random.Random(seed))
+        results = {}
+        for name in KEYS:
+            results[name] = {"index_kb": _index_kb(conn, name)}
+        conn.execute(text("ANALYZE"))
+        for name, (_, key) in KEYS.items():
+            results[name]["join_ms"] = _join_ms(conn, name, key, repeat)
+    return {"rows": rows, "stations": stations, "repeat": repeat, **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare slug and integer station keys")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--stations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.rows, args.stations, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Synthetic fleet data generator for benchmarks and load tests.
+
+Creates users, vehicles, fuel logs at gas stations around Metro Manila,
+maintenance logs and reminders directly through the SQLAlchemy models.
+Every generated user shares one password so a load test can log in as any
+of them without paying for one bcrypt hash per user at generation time.
+
+Usage (writes to DATABASE_URL from .env):
+    python -m benchmarks.fleet_generator --users 200 --vehicles-per-user 3
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services.location_service import LocationService
+from app.utils.auth import get_password_hash
+
+# Metro Manila bounding box
+METRO_MANILA_LAT = (14.40, 14.76)
+METRO_MANILA_LNG = (120.93, 121.13)
+
+BRANDS = ["Petron", "Shell", "Caltex", "Phoenix", "Seaoil", "Unioil", "Cleanfuel"]
+STREETS = [
+    "EDSA", "C-5 Road", "Commonwealth Avenue", "Quezon Avenue", "España Boulevard",
+    "Ortigas Avenue", "Shaw Boulevard", "Roxas Boulevard", "Taft Avenue", "Aurora Boulevard",
+    "Marcos Highway", "Katipunan Avenue", "Buendia Avenue", "Sucat Road", "Alabang-Zapote Road"
+]
+CITIES = ["Quezon City", "Manila", "Makati", "Pasig", "Taguig", "Mandaluyong", "Parañaque", "Marikina"]
+MAKES = {
+    "Toyota": ["Vios", "Fortuner", "Innova", "Hiace"],
+    "Mitsubishi": ["Mirage", "Montero Sport", "L300"],
+    "Honda": ["City", "Civic", "BR-V"],
+    "Nissan": ["Navara", "Almera"],
+    "Ford": ["Ranger", "Everest"],
+}
+FUEL_TYPES = ["Gasoline (Unleaded)", "Gasoline (Premium)", "Diesel", "Electric"]
+PRICE_RANGES = {  # PHP per liter / kWh
+    "Gasoline (Unleaded)": (58.0, 66.0),
+    "Gasoline (Premium)": (63.0, 72.0),
+    "Diesel": (55.0, 62.0),
+    "Electric": (10.0, 14.0),
+}
+MAINTENANCE_TYPES = ["Oil Change", "Tire Rotation", "Brake Pads", "Air Filter", "PMS", "Battery"]
+
+DEFAULT_PASSWORD = "benchmark-password"
+
+
+def _random_station(rng: random.Random, index: int) -> models.GasStationCluster:
+    brand = rng.choice(BRANDS)
+    street = rng.choice(STREETS)
+    lat = rng.uniform(*METRO_MANILA_LAT)
+    lng = rng.uniform(*METRO_MANILA_LNG)
+    normalized_name = f"{brand}, {street}"
+    return models.GasStationCluster(
+        cluster_id=f"{LocationService._generate_cluster_id(normalized_name, lat, lng)}_{index}"[:100],
+        normalized_name=normalized_name,
+        latitude=round(lat, 8),
+        longitude=round(lng, 8),
+        brand=brand,
+        street=street,
+        city=rng.choice(CITIES),
+        report_count=0
+    )
+
+
+def generate_fleet(
+    db: Session,
+    users: int = 100,
+    vehicles_per_user: int = 2,
+    fuel_logs_per_vehicle: int = 50,
+    maintenance_per_vehicle: int = 10,
+    reminders_per_vehicle: int = 3,
+    stations: int = 300,
+    days_of_history: int = 180,
+    seed: int = 42,
+    prefix: str = "bench",
+    password: str = DEFAULT_PASSWORD,
+    batch_size: int = 5000
+) -> Dict:
+    """
+    Insert a synthetic fleet and return the credentials and ids created.
+
+    Returns:
+        {
+            "password": str,
+            "users": [{"email": str, "user_id": int, "vehicle_ids": [int]}],
+            "station_count": int,
+            "row_counts": {"users": int, "vehicles": int, "fuel": int, ...}
+        }
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    password_hash = get_password_hash(password)
+
+    clusters = [_random_station(rng, i) for i in range(stations)]
+    db.add_all(clusters)
+    db.flush()
+
+    user_rows = [
+        models.User(
+            full_name=f"Benchmark Driver {i}",
+            email=f"{prefix}-{i}@example.com",
+            password=password_hash,
+            mileage_type="kilometers"
+        )
+        for i in range(users)
+    ]
+    db.add_all(user_rows)
+    db.flush()
+
+    vehicle_rows = []
+    for user in user_rows:
+        for _ in range(vehicles_per_user):
+            make = rng.choice(list(MAKES))
+            vehicle_rows.append(models.Vehicle(
+                user_id=user.user_id,
+                make=make,
+                model=rng.choice(MAKES[make]),
+                year=rng.randint(2010, 2025),
+                license_plate=f"{prefix[:4].upper()}{len(vehicle_rows):06d}",
+                current_mileage=rng.randint(1000, 150000),
+                fuel_type=rng.choice(FUEL_TYPES),
+                purchase_date=today - timedelta(days=rng.randint(365, 3650))
+            ))
+    db.add_all(vehicle_rows)
+    db.flush()
+
+    counts = {"users": len(user_rows), "vehicles": len(vehicle_rows), "fuel": 0, "maintenance": 0, "reminders": 0}
+    pending: List = []
+
+    def flush_pending():
+        if pending:
+            db.add_all(pending)
+            db.flush()
+            pending.clear()
+
+    for vehicle in vehicle_rows:
+        electric = vehicle.fuel_type == "Electric"
+        low, high = PRICE_RANGES[vehicle.fuel_type]
+        home_stations = rng.sample(clusters, k=min(5, len(clusters)))
+        for _ in range(fuel_logs_per_vehicle):
+            cluster = rng.choice(home_stations) if rng.random() < 0.8 else rng.choice(clusters)
+            amount = round(rng.uniform(15, 60), 2)
+            cluster.report_count += 1
+            pending.append(models.Fuel(
+                vehicle_id=vehicle.vehicle_id,
+                date=today - timedelta(days=int(rng.expovariate(1 / 20)) % days_of_history),
+                liters=None if electric else amount,
+                kwh=amount if electric else None,
+                cost=round(amount * rng.uniform(low, high), 2),
+                location=f"{cluster.normalized_name}, {cluster.city}, Metro Manila",
+                latitude=cluster.latitude,
+                longitude=cluster.longitude,
+                normalized_location=cluster.normalized_name,
+                station=cluster,
+                full_tank=rng.random() < 0.6
+            ))
+        for j in range(maintenance_per_vehicle):
+            pending.append(models.Maintenance(
+                vehicle_id=vehicle.vehicle_id,
+                date=today - timedelta(days=j * days_of_history // max(maintenance_per_vehicle, 1)),
+                maintenance_type=rng.choice(MAINTENANCE_TYPES),
+                description="Synthetic benchmark entry",
+                mileage=max(vehicle.current_mileage - j * rng.randint(500, 5000), 0),
+                cost=round(rng.uniform(500, 15000), 2),
+                location=rng.choice(CITIES)
+            ))
+        for j in range(reminders_per_vehicle):
+            pending.append(models.Reminder(
+                user_id=vehicle.user_id,
+                vehicle_id=vehicle.vehicle_id,
+                title=rng.choice(MAINTENANCE_TYPES),
+                due_date=today + timedelta(days=rng.randint(-30, 90)),
+                repeat_interval=rng.choice([None, "monthly", "yearly"]),
+                mileage_interval=rng.choice([None, 5000, 10000])
+            ))
+        counts["fuel"] += fuel_logs_per_vehicle
+        counts["maintenance"] += maintenance_per_vehicle
+        counts["reminders"] += reminders_per_vehicle
+        if len(pending) >= batch_size:
+            flush_pending()
+
+    flush_pending()
+    for cluster in clusters:
+        # Every synthetic report sits exactly on its station
+        cluster.sum_latitude = cluster.latitude * cluster.report_count
+        cluster.sum_longitude = cluster.longitude * cluster.report_count
+    db.commit()
+
+    vehicles_by_user: Dict[int, List[int]] = {}
+    for vehicle in vehicle_rows:
+        vehicles_by_user.setdefault(vehicle.user_id, []).append(vehicle.vehicle_id)
+
+    return {
+        "password": password,
+        "users": [
+            {"email": user.email, "user_id": user.user_id, "vehicle_ids": vehicles_by_user.get(user.user_id, [])}
+            for user in user_rows
+        ],
+        "station_count": len(clusters),
+        "row_counts": counts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic fleet for benchmarks")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--vehicles-per-user", type=int, default=2)
+    parser.add_argument("--fuel-logs-per-vehicle", type=int, default=50)
+    parser.add_argument("--maintenance-per-vehicle", type=int, default=10)
+    parser.add_argument("--reminders-per-vehicle", type=int, default=3)
+    parser.add_argument("--stations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="bench", help="Email/plate prefix, change it to generate more data")
+    parser.add_argument("--output", default="fleet.json", help="Where to write the generated credentials")
+    args = parser.parse_args()
+
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        fleet = generate_fleet(
+            db,
+            users=args.users,
+            vehicles_per_user=args.vehicles_per_user,
+            fuel_logs_per_vehicle=args.fuel_logs_per_vehicle,
+            maintenance_per_vehicle=args.maintenance_per_vehicle,
+            reminders_per_vehicle=args.reminders_per_vehicle,
+            stations=args.stations,
+            seed=args.seed,
+            prefix=args.prefix
+        )
+    finally:
+        db.close()
+
+    with open(args.output, "w") as f:
+        json.dump(fleet, f, indent=2)
+    print(f"✅ Generated {fleet['row_counts']} in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
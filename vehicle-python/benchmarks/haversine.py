@@ -0,0 +1,127 @@
+"""
+Distance kernel benchmark: the scalar calculate_distance loop against the
+vectorized kernels in app.services.geo.
+
+For each size, points are spread over the Philippines and the search point
+is in Metro Manila. Reports per size:
+
+- scalar_ms: LocationService.calculate_distance in a Python loop
+- haversine_ms: geo.haversine_km over the whole array
+- equirectangular_ms: geo.equirectangular_km over the whole array
+- within_100m_ms: geo.within_km at the clustering radius (bounding box
+  prefilter, then the equirectangular fast path)
+- speedup: scalar_ms / haversine_ms and scalar_ms / within_100m_ms
+- haversine_max_error_km: largest difference to the scalar loop
+- equirectangular_max_error_km: largest difference to Haversine over
+  points within geo.EQUIRECTANGULAR_MAX_KM of the search point (extra
+  points are added there so the sample is not empty)
+
+Plus one many-to-many run (matrix_*), --origins points against 1k stations.
+No database is used.
+
+Usage:
+    python -m benchmarks.haversine --sizes 1000 100000 1000000 --repeat 5
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.services import geo
+from app.services.location_service import LocationService
+
+PHILIPPINES_LAT = (5.0, 19.0)
+PHILIPPINES_LNG = (117.0, 127.0)
+SEARCH_POINT = (14.5995, 120.9842)
+NEAR_POINTS = 10000
+
+
+def _median(run: Callable, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def _scalar(latitudes: List[float], longitudes: List[float]) -> List[float]:
+    return [LocationService.calculate_distance(*SEARCH_POINT, lat, lng) for lat, lng in zip(latitudes, longitudes)]
+
+
+def _size(points: int, repeat: int, rng: np.random.Generator) -> Dict:
+    latitudes, longitudes = rng.uniform(*PHILIPPINES_LAT, points), rng.uniform(*PHILIPPINES_LNG, points)
+    lat_list, lng_list = latitudes.tolist(), longitudes.tolist()
+
+    scalar = _scalar(lat_list, lng_list)
+    # The scalar loop is slow; fewer samples are enough at large sizes
+    scalar_seconds = _median(lambda: _scalar(lat_list, lng_list), max(1, min(repeat, 100000 // points * repeat)))
+    haversine_seconds = _median(lambda: geo.haversine_km(*SEARCH_POINT, latitudes, longitudes), repeat)
+    equirectangular_seconds = _median(lambda: geo.equirectangular_km(*SEARCH_POINT, latitudes, longitudes), repeat)
+    within_seconds = _median(
+        lambda: geo.within_km(*SEARCH_POINT, latitudes, longitudes, LocationService.CLUSTER_RADIUS_KM), repeat
+    )
+
+    near_lat = SEARCH_POINT[0] + rng.uniform(-0.01, 0.01, NEAR_POINTS)
+    near_lng = SEARCH_POINT[1] + rng.uniform(-0.01, 0.01, NEAR_POINTS)
+    exact = geo.haversine_km(*SEARCH_POINT, near_lat, near_lng)
+    short = exact <= geo.EQUIRECTANGULAR_MAX_KM
+    approximate = geo.equirectangular_km(*SEARCH_POINT, near_lat[short], near_lng[short])
+
+    return {
+        "points": points,
+        "scalar_ms": round(scalar_seconds * 1000, 3),
+        "haversine_ms": round(haversine_seconds * 1000, 3),
+        "equirectangular_ms": round(equirectangular_seconds * 1000, 3),
+        "within_100m_ms": round(within_seconds * 1000, 3),
+        "haversine_speedup": round(scalar_seconds / haversine_seconds, 1),
+        "within_100m_speedup": round(scalar_seconds / within_seconds, 1),
+        "haversine_max_error_km": float(np.abs(geo.haversine_km(*SEARCH_POINT, latitudes, longitudes) - scalar).max()),
+        "equirectangular_max_error_km": float(np.abs(approximate - exact[short]).max()),
+    }
+
+
+def _matrix(origins: int, stations: int, repeat: int, rng: np.random.Generator) -> Dict:
+    from_lat, from_lng = rng.uniform(*PHILIPPINES_LAT, origins), rng.uniform(*PHILIPPINES_LNG, origins)
+    to_lat, to_lng = rng.uniform(*PHILIPPINES_LAT, stations), rng.uniform(*PHILIPPINES_LNG, stations)
+    pairs = [(a, b, c, d) for a, b in zip(from_lat.tolist(), from_lng.tolist())
+             for c, d in zip(to_lat.tolist(), to_lng.tolist())]
+
+    def scalar():
+        return [LocationService.calculate_distance(*pair) for pair in pairs]
+
+    scalar_seconds = _median(scalar, 1)
+    matrix_seconds = _median(lambda: geo.distance_matrix_km(from_lat, from_lng, to_lat, to_lng), repeat)
+    error = np.abs(geo.distance_matrix_km(from_lat, from_lng, to_lat, to_lng).ravel() - scalar()).max()
+    return {
+        "matrix_shape": [origins, stations],
+        "matrix_scalar_ms": round(scalar_seconds * 1000, 1),
+        "matrix_ms": round(matrix_seconds * 1000, 2),
+        "matrix_speedup": round(scalar_seconds / matrix_seconds, 1),
+        "matrix_max_error_km": float(error),
+    }
+
+
+def run_benchmark(sizes: List[int], origins: int, repeat: int, seed: int = 1) -> Dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "repeat": repeat,
+        "sizes": [_size(points, repeat, rng) for points in sizes],
+        **_matrix(origins, 1000, repeat, rng),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized distance kernels")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--origins", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.sizes, args.origins, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Mixed-workload load test for the API.
+
+Each virtual user logs in once (measured as `login`), then loops over a
+weighted mix of the requests the mobile app makes: the dashboard (sent with
+the last ETag, as the app revalidates it), the per-screen lists, nearby fuel
+prices, station tiles from the price snapshot, location search and fuel log
+creation. Results are written as JSON with
+p50/p95/p99 latency and throughput per operation so runs from different
+commits can be diffed. station_tiles needs the server to publish price
+snapshots (PRICE_SNAPSHOT_DIR); without them every station_tiles request
+is a 404 and counts as an error.
+
+Usage:
+    python -m benchmarks.fleet_generator --users 200 --output fleet.json
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load_test --fleet fleet.json --concurrency 50 --duration 60 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks.fleet_generator import METRO_MANILA_LAT, METRO_MANILA_LNG
+
+# Relative frequency of each operation in the mix. The home screen loads
+# /dashboard/ instead of the separate lists, so it carries most of the reads
+WORKLOAD = {
+    "dashboard": 25,
+    "users_me": 5,
+    "vehicles_list": 5,
+    "fuel_list": 8,
+    "maintenance_list": 5,
+    "reminders_upcoming": 5,
+    "nearby_prices": 25,
+    "station_tiles": 10,
+    "location_search": 2,
+    "create_fuel_log": 10,
+}
+# location_search is proxied to Nominatim at 1 request per second, so its
+# latency is mostly queueing behind that limiter
+LOCATION_QUERIES = ["Quezon City", "Makati", "EDSA", "Ortigas", "Bonifacio Global City", "Pasig"]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, operation: str, seconds: float, ok: bool):
+        if ok:
+            self.latencies[operation].append(seconds)
+        else:
+            self.errors[operation] += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        operations = {}
+        for operation in sorted(set(self.latencies) | set(self.errors)):
+            samples = np.asarray(self.latencies.get(operation, []), dtype=np.float64) * 1000
+            operations[operation] = {
+                "count": int(samples.size),
+                "errors": self.errors.get(operation, 0),
+                "throughput_rps": round(samples.size / elapsed, 2) if elapsed else 0,
+                "mean_ms": round(float(samples.mean()), 2) if samples.size else None,
+                "p50_ms": round(float(np.percentile(samples, 50)), 2) if samples.size else None,
+                "p95_ms": round(float(np.percentile(samples, 95)), 2) if samples.size else None,
+                "p99_ms": round(float(np.percentile(samples, 99)), 2) if samples.size else None,
+            }
+        total = sum(op["count"] for op in operations.values())
+        errors = sum(op["errors"] for op in operations.values())
+        all_samples = np.concatenate([
+            np.asarray(v, dtype=np.float64) for v in self.latencies.values()
+        ]) * 1000 if self.latencies else np.asarray([])
+        return {
+            "total": {
+                "requests": total,
+                "errors": errors,
+                "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+                "p50_ms": round(float(np.percentile(all_samples, 50)), 2) if all_samples.size else None,
+                "p95_ms": round(float(np.percentile(all_samples, 95)), 2) if all_samples.size else None,
+                "p99_ms": round(float(np.percentile(all_samples, 99)), 2) if all_samples.size else None,
+            },
+            "operations": operations,
+        }
+
+
+async def _timed(recorder: Recorder, operation: str, request):
+    started = time.perf_counter()
+    try:
+        response = await request
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.record(operation, time.perf_counter() - started, ok)
+    return response
+
+
+async def _station_tile(client: httpx.AsyncClient, latitude: float, longitude: float) -> httpx.Response:
+    """The app's station map: the snapshot manifest, then the tile under the point if it has stations."""
+    manifest = await client.get("/fuel-prices/snapshot/manifest", headers={"Accept-Encoding": "gzip"})
+    if manifest.status_code != 200:
+        return manifest
+    tile_degrees = manifest.json()["tile_degrees"]
+    tile = f"{math.floor(longitude / tile_degrees)}_{math.floor(latitude / tile_degrees)}"
+    if tile not in manifest.json()["tiles"]:
+        return manifest
+    return await client.get(f"/fuel-prices/snapshot/tiles/{tile}", headers={"Accept-Encoding": "br, gzip"})
+
+
+async def virtual_user(client: httpx.AsyncClient, user: Dict, password: str,
+                       recorder: Recorder, deadline: float, rng: random.Random):
+    response = await _timed(recorder, "login", client.post(
+        "/auth/token", data={"username": user["email"], "password": password}
+    ))
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    vehicle_ids = user["vehicle_ids"] or [0]
+    operations, weights = zip(*WORKLOAD.items())
+    dashboard_etag = None
+
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        vehicle_id = rng.choice(vehicle_ids)
+        lat = rng.uniform(*METRO_MANILA_LAT)
+        lng = rng.uniform(*METRO_MANILA_LNG)
+
+        if operation == "dashboard":
+            conditional = {"If-None-Match": dashboard_etag} if dashboard_etag else {}
+            response = await _timed(recorder, operation, client.get("/dashboard/", headers={**headers, **conditional}))
+            if response is not None and response.status_code == 200:
+                dashboard_etag = response.headers.get("etag")
+            continue
+        elif operation == "users_me":
+            request = client.get("/users/me", headers=headers)
+        elif operation == "vehicles_list":
+            request = client.get("/vehicles/", headers=headers)
+        elif operation == "fuel_list":
+            request = client.get(f"/fuel/vehicle/{vehicle_id}", headers=headers)
+        elif operation == "maintenance_list":
+            request = client.get(f"/maintenance/vehicle/{vehicle_id}", headers=headers)
+        elif operation == "reminders_upcoming":
+            request = client.get("/reminders/upcoming", headers=headers)
+        elif operation == "nearby_prices":
+            request = client.get("/fuel-prices/nearby", params={
+                "latitude": lat, "longitude": lng,
+                "radius_km": rng.choice([2, 5, 10]),
+                "time_window": rng.choice(["today", "3d", "7d"]),
+            })
+        elif operation == "station_tiles":
+            request = _station_tile(client, lat, lng)
+        elif operation == "location_search":
+            request = client.get("/locations/search", params={"query": rng.choice(LOCATION_QUERIES)})
+        else:
+            liters = round(rng.uniform(15, 50), 2)
+            request = client.post("/fuel/", headers=headers, json={
+                "vehicle_id": vehicle_id,
+                "date": date.today().isoformat(),
+                "liters": liters,
+                "cost": round(liters * rng.uniform(55, 70), 2),
+                "location": f"{rng.choice(['Petron', 'Shell', 'Caltex'])}, EDSA, Quezon City, Metro Manila",
+                "latitude": round(lat, 8),
+                "longitude": round(lng, 8),
+            })
+        await _timed(recorder, operation, request)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_load_test(base_url: str, fleet: Dict, concurrency: int, duration: float, seed: int = 1) -> Dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        users = fleet["users"]
+        await asyncio.gather(*(
+            virtual_user(client, users[i % len(users)], fleet["password"], recorder,
+                         deadline, random.Random(seed + i))
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {"base_url": base_url, "concurrency": concurrency, "duration_s": duration,
+                   "seed": seed, "workload": WORKLOAD},
+        "elapsed_s": round(elapsed, 2),
+        **recorder.summary(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mixed-workload load test against the API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--fleet", default="fleet.json", help="Output of benchmarks.fleet_generator")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args()
+
+    with open(args.fleet) as f:
+        fleet = json.load(f)
+
+    results = asyncio.run(run_load_test(args.base_url, fleet, args.concurrency, args.duration, args.seed))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+        total = results["total"]
+        print(f"✅ {total['requests']} requests, {total['throughput_rps']} req/s, "
+              f"p95 {total['p95_ms']} ms -> {args.output}")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
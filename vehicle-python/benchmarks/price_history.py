@@ -0,0 +1,153 @@
+"""
+Nearby-price latency as fuel log history grows.
+
+Seeds a fixed week of recent price reports around Metro Manila, then keeps
+adding older history to Fuel_Info and times a 10 km /fuel-prices/nearby
+aggregation after each step:
+
+- fuel_info: the previous query, filtering Fuel_Info by cluster and date
+  (with the production index on Fuel_Info.station_id)
+- recent_prices: LocationService.get_fuel_price_data, which reads
+  Recent_Fuel_Prices
+
+History rows are bulk-inserted with Core, so like real old logs they never
+reach the hot table. Data lives in a private SQLite database; .env is only
+read for app config.
+
+Usage:
+    python -m benchmarks.price_history --recent 5000 --history 0,100000,400000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import models
+from app.services.location_service import LocationService
+from benchmarks.fleet_generator import METRO_MANILA_LAT, METRO_MANILA_LNG
+
+SEARCH_POINT = (14.5995, 120.9842)
+FUEL_TYPES = ["Gasoline (Unleaded)", "Gasoline (Premium)", "Diesel"]
+
+
+def _seed(db, recent: int, stations: int, rng: random.Random) -> Tuple[List[int], List[int]]:
+    clusters = [
+        models.GasStationCluster(
+            cluster_id=f"station_{i}", normalized_name=f"Station {i}",
+            latitude=rng.uniform(*METRO_MANILA_LAT), longitude=rng.uniform(*METRO_MANILA_LNG), report_count=0
+        )
+        for i in range(stations)
+    ]
+    db.add_all(clusters)
+    user = models.User(full_name="Bench", email="bench@example.com", password="x")
+    db.add(user)
+    db.flush()
+    vehicles = [
+        models.Vehicle(user_id=user.user_id, make="Toyota", model="Vios", year=2020, fuel_type=FUEL_TYPES[i % 3])
+        for i in range(50)
+    ]
+    db.add_all(vehicles)
+    db.flush()
+
+    # ORM inserts, so the recent week also lands in Recent_Fuel_Prices
+    today = date.today()
+    for _ in range(recent):
+        liters = round(rng.uniform(15, 50), 2)
+        db.add(models.Fuel(
+            vehicle_id=rng.choice(vehicles).vehicle_id, date=today - timedelta(days=rng.randint(0, 6)),
+            liters=liters, cost=round(liters * rng.uniform(55, 70), 2),
+            station=rng.choice(clusters)
+        ))
+    db.commit()
+    return [vehicle.vehicle_id for vehicle in vehicles], [cluster.station_id for cluster in clusters]
+
+
+def _add_history(engine, rows: int, vehicle_ids: List[int], station_ids: List[int], rng: random.Random):
+    today = date.today()
+    batch = []
+    for _ in range(rows):
+        liters = round(rng.uniform(15, 50), 2)
+        batch.append({
+            "vehicle_id": rng.choice(vehicle_ids), "date": today - timedelta(days=rng.randint(30, 3 * 365)),
+            "liters": liters, "cost": round(liters * rng.uniform(40, 70), 2),
+            "station_id": rng.choice(station_ids), "sync_version": 0,
+        })
+        if len(batch) == 10000:
+            with engine.begin() as conn:
+                conn.execute(models.Fuel.__table__.insert(), batch)
+            batch = []
+    if batch:
+        with engine.begin() as conn:
+            conn.execute(models.Fuel.__table__.insert(), batch)
+
+
+def _fuel_info_query(db, station_ids: List[int], cutoff: date):
+    """The aggregation's read before Recent_Fuel_Prices."""
+    return db.query(
+        models.Fuel.station_id, models.Fuel.date, models.Fuel.cost,
+        models.Fuel.liters, models.Fuel.kwh, models.Vehicle.fuel_type
+    ).join(models.Vehicle).filter(
+        models.Fuel.station_id.in_(station_ids),
+        models.Fuel.date >= cutoff
+    ).all()
+
+
+def _median_ms(run, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return round(samples[len(samples) // 2] * 1000, 2)
+
+
+def run_benchmark(recent: int, history_steps: List[int], stations: int, repeat: int, seed: int = 1) -> Dict:
+    rng = random.Random(seed)
+    directory = tempfile.mkdtemp(prefix="price-history-")
+    engine = create_engine(f"sqlite:///{directory}/bench.db")
+    models.Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    with session_factory() as db:
+        vehicle_ids, all_station_ids = _seed(db, recent, stations, rng)
+        station_ids = [
+            cluster.station_id for cluster in db.query(models.GasStationCluster).all()
+            if LocationService.calculate_distance(*SEARCH_POINT, float(cluster.latitude), float(cluster.longitude)) <= 10
+        ]
+
+    cutoff = date.today() - timedelta(days=7)
+    results, total_history = [], 0
+    for step in history_steps:
+        _add_history(engine, step - total_history, vehicle_ids, all_station_ids, rng)
+        total_history = step
+        with session_factory() as db:
+            results.append({
+                "history_rows": total_history,
+                "fuel_info_ms": _median_ms(lambda: _fuel_info_query(db, station_ids, cutoff), repeat),
+                "recent_prices_ms": _median_ms(lambda: LocationService.get_fuel_price_data(
+                    db, *SEARCH_POINT, radius_km=10, days_back=7
+                ), repeat),
+            })
+    return {"recent_rows": recent, "stations": stations, "repeat": repeat, "steps": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nearby-price latency against history size")
+    parser.add_argument("--recent", type=int, default=5000, help="Price reports in the last week")
+    parser.add_argument("--history", default="0,100000,400000", help="Cumulative older rows per step")
+    parser.add_argument("--stations", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    steps = [int(n) for n in args.history.split(",") if n]
+    print(json.dumps(run_benchmark(args.recent, steps, args.stations, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
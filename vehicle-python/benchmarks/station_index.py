@@ -0,0 +1,120 @@
+"""
+In-memory station index benchmark.
+
+Seeds Gas_Station_Clusters with stations spread over the Philippines and
+reports:
+
+- memory: bytes the index holds, and MiB per 100k stations
+- load_ms: one full reload from the database
+- scan_ms: the previous lookup, loading every cluster and computing a
+  distance to each in Python
+- within_10km_us / within_100m_us / nearest_us: index lookups (radius for
+  nearby prices, radius for station matching, closest station)
+- write_through_ms: applying one written cluster without a reload
+
+Data lives in a private SQLite database; .env is only read for app config.
+
+Usage:
+    python -m benchmarks.station_index --stations 100000 --repeat 200
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import models
+from app.services.location_service import LocationService
+from app.services.station_index import IndexedStation, StationIndex
+from benchmarks.fleet_generator import BRANDS, STREETS
+
+PHILIPPINES_LAT = (5.0, 19.0)
+PHILIPPINES_LNG = (117.0, 127.0)
+SEARCH_POINT = (14.5995, 120.9842)
+
+
+def _seed(engine, stations: int, rng: random.Random):
+    rows = []
+    for i in range(stations):
+        brand = rng.choice(BRANDS)
+        name = f"{brand}, {rng.choice(STREETS)}"
+        latitude, longitude = rng.uniform(*PHILIPPINES_LAT), rng.uniform(*PHILIPPINES_LNG)
+        rows.append({
+            "cluster_id": f"{LocationService._generate_cluster_id(name, latitude, longitude)}_{i}",
+            "normalized_name": name, "brand": brand, "latitude": round(latitude, 8), "longitude": round(longitude, 8),
+            "sum_latitude": 0, "sum_longitude": 0, "report_count": 0,
+        })
+    with engine.begin() as conn:
+        conn.execute(models.GasStationCluster.__table__.insert(), rows)
+
+
+def _median(run: Callable, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def _scan(db, latitude: float, longitude: float, radius_km: float):
+    return [
+        cluster for cluster in db.query(models.GasStationCluster).all()
+        if LocationService.calculate_distance(latitude, longitude,
+                                              float(cluster.latitude), float(cluster.longitude)) <= radius_km
+    ]
+
+
+def run_benchmark(stations: int, repeat: int, seed: int = 1) -> Dict:
+    directory = tempfile.mkdtemp(prefix="station-index-")
+    engine = create_engine(f"sqlite:///{directory}/bench.db")
+    models.Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    _seed(engine, stations, random.Random(seed))
+
+    index = StationIndex()
+    with session_factory() as db:
+        load_seconds = _median(lambda: index.load(db), 3)
+        scan_seconds = _median(lambda: _scan(db, *SEARCH_POINT, 10.0), 3)
+        nearby = index.within(*SEARCH_POINT, 10.0)
+        if sorted(station.station_id for station, _ in nearby) != sorted(
+            cluster.station_id for cluster in _scan(db, *SEARCH_POINT, 10.0)
+        ):
+            raise AssertionError("index lookup differs from the full scan")
+
+    station = nearby[0][0] if nearby else index.nearest(*SEARCH_POINT, max_km=1000)[0][0]
+    moved = IndexedStation(*station[:4], station.latitude + 0.0001, station.longitude)
+
+    def write_through():
+        index.apply([moved], index.version + 1)
+
+    memory = index.memory_bytes()
+    return {
+        "stations": stations,
+        "memory_bytes": memory,
+        "memory_mib_per_100k": round(memory / stations * 100000 / 1024 / 1024, 2),
+        "load_ms": round(load_seconds * 1000, 1),
+        "scan_ms": round(scan_seconds * 1000, 1),
+        "stations_within_10km": len(nearby),
+        "within_10km_us": round(_median(lambda: index.within(*SEARCH_POINT, 10.0), repeat) * 1e6, 1),
+        "within_100m_us": round(_median(lambda: index.within(*SEARCH_POINT, 0.1), repeat) * 1e6, 1),
+        "nearest_us": round(_median(lambda: index.nearest(*SEARCH_POINT), repeat) * 1e6, 1),
+        "write_through_ms": round(_median(write_through, 20) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory station index")
+    parser.add_argument("--stations", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.stations, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
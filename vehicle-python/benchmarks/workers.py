@@ -0,0 +1,115 @@
+"""
+Single-process vs multi-worker server benchmark.
+
+Starts each server configuration in turn on a free port, runs the
+benchmarks.load_test workload against it, stops it with SIGTERM and prints
+the throughput and latency of every run side by side:
+
+- single: `uvicorn app.main:app`, the README's default
+- N workers: `python -m app.serve --workers N` (gunicorn + uvicorn workers)
+
+The servers use DATABASE_URL from .env, which must already hold the fleet
+written by benchmarks.fleet_generator.
+
+Usage:
+    python -m benchmarks.fleet_generator --users 200 --output fleet.json
+    python -m benchmarks.workers --fleet fleet.json --workers 2,4 --concurrency 50 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import run_load_test
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(base_url + "/", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def _run_server(command: List[str], port: int, fleet: Dict, concurrency: int, duration: float) -> Dict:
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_ready(base_url, process)
+        result = asyncio.run(run_load_test(base_url, fleet, concurrency, duration))
+    finally:
+        stopping = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            # A worker stuck waiting on its connection pool never drains
+            process.kill()
+            process.wait()
+    result["shutdown_s"] = round(time.monotonic() - stopping, 2)
+    return result
+
+
+def run_benchmark(fleet: Dict, worker_counts: List[int], concurrency: int, duration: float) -> Dict:
+    configurations = {"single": lambda port: [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)
+    ]}
+    for workers in worker_counts:
+        configurations[f"{workers}_workers"] = lambda port, workers=workers: [
+            sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)
+        ]
+
+    runs = {}
+    for name, command in configurations.items():
+        port = _free_port()
+        result = _run_server(command(port), port, fleet, concurrency, duration)
+        runs[name] = {"total": result["total"], "operations": result["operations"],
+                      "shutdown_s": result["shutdown_s"]}
+        total = result["total"]
+        print(f"✅ {name}: {total['throughput_rps']} req/s, p95 {total['p95_ms']} ms, "
+              f"{total['errors']} errors, stopped in {result['shutdown_s']} s", file=sys.stderr)
+    return {"concurrency": concurrency, "duration_s": duration, "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the single-process server with app.serve workers")
+    parser.add_argument("--fleet", default="fleet.json", help="Output of benchmarks.fleet_generator")
+    parser.add_argument("--workers", default="2,4", help="Comma-separated worker counts to try")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per configuration")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args()
+
+    with open(args.fleet) as f:
+        fleet = json.load(f)
+    worker_counts = [int(n) for n in args.workers.split(",") if n]
+
+    report = json.dumps(run_benchmark(fleet, worker_counts, args.concurrency, args.duration), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
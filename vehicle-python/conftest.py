@@ -0,0 +1,184 @@
+"""
+Shared pytest fixtures.
+
+Tests run the real FastAPI app against a throwaway SQLite database (or a
+local MySQL given in TEST_DATABASE_URL) seeded with a realistic amount of
+data, and count the SQL statements each request issues.
+"""
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+
+# Configure the app before it is imported; never point tests at the .env database
+_test_dir = tempfile.mkdtemp(prefix="vehicle-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_test_dir}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("GMAIL_EMAIL", "tests@example.com")
+os.environ.setdefault("GMAIL_APP_PASSWORD", "not-used")
+os.environ.pop("PRICE_SNAPSHOT_DIR", None)
+# The whole suite runs as one client; limiter behaviour is tested on its own app
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+# No background clustering threads issuing SQL while queries are counted;
+# tests that need clusters call clustering_queue.flush()
+os.environ["CLUSTERING_WORKERS"] = "0"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database.database import SessionLocal, engine
+from app.main import app
+from app.models import models
+from app.utils.auth import get_password_hash
+
+# Manual script that talks to Gmail; run it directly with python
+collect_ignore = ["test_email_setup.py"]
+
+TEST_EMAIL = "fleet.owner@example.com"
+TEST_PASSWORD = "correct-horse-battery"
+SEARCH_POINT = (14.5995, 120.9842)  # Manila
+FUEL_TYPES = ["Gasoline (Unleaded)", "Gasoline (Premium)", "Diesel"]
+
+
+def _seed(db):
+    """Insert one fleet account plus community data around Metro Manila."""
+    rng = random.Random(42)
+    today = date.today()
+
+    clusters = []
+    for i in range(40):
+        lat = SEARCH_POINT[0] + rng.uniform(-0.15, 0.15)
+        lng = SEARCH_POINT[1] + rng.uniform(-0.15, 0.15)
+        brand = rng.choice(["Petron", "Shell", "Caltex", "Seaoil"])
+        cluster = models.GasStationCluster(
+            cluster_id=f"{brand.lower()}_station_{i}",
+            normalized_name=f"{brand}, Street {i}",
+            latitude=lat,
+            longitude=lng,
+            brand=brand,
+            report_count=0
+        )
+        clusters.append(cluster)
+    db.add_all(clusters)
+
+    owner = models.User(full_name="Fleet Owner", email=TEST_EMAIL, password=get_password_hash(TEST_PASSWORD))
+    community = [
+        models.User(full_name=f"Driver {i}", email=f"driver{i}@example.com", password="not-a-real-hash")
+        for i in range(50)
+    ]
+    db.add_all([owner] + community)
+    db.flush()
+
+    vehicles = []
+    for i in range(10):
+        vehicles.append(models.Vehicle(
+            user_id=owner.user_id, make="Toyota", model="Hiace", year=2018 + i % 5,
+            license_plate=f"FLT {1000 + i}", current_mileage=50000 + i * 1000,
+            fuel_type=FUEL_TYPES[i % len(FUEL_TYPES)]
+        ))
+    for i, user in enumerate(community):
+        vehicles.append(models.Vehicle(
+            user_id=user.user_id, make="Honda", model="City", year=2020,
+            fuel_type=FUEL_TYPES[i % len(FUEL_TYPES)]
+        ))
+    db.add_all(vehicles)
+    db.flush()
+
+    rows = []
+    for vehicle in vehicles:
+        fleet_vehicle = vehicle.user_id == owner.user_id
+        for _ in range(100 if fleet_vehicle else 20):
+            cluster = rng.choice(clusters)
+            liters = rng.uniform(20, 60)
+            rows.append(models.Fuel(
+                vehicle_id=vehicle.vehicle_id,
+                date=today - timedelta(days=rng.randint(0, 30)),
+                liters=round(liters, 2),
+                cost=round(liters * rng.uniform(55, 75), 2),
+                location=cluster.normalized_name,
+                latitude=cluster.latitude,
+                longitude=cluster.longitude,
+                normalized_location=cluster.normalized_name,
+                station=cluster
+            ))
+            cluster.report_count += 1
+        if fleet_vehicle:
+            for j in range(30):
+                rows.append(models.Maintenance(
+                    vehicle_id=vehicle.vehicle_id,
+                    date=today - timedelta(days=j * 10),
+                    maintenance_type="Oil Change",
+                    mileage=vehicle.current_mileage - j * 500,
+                    cost=2500
+                ))
+            for j in range(5):
+                rows.append(models.Reminder(
+                    user_id=owner.user_id,
+                    vehicle_id=vehicle.vehicle_id,
+                    title="PMS",
+                    due_date=today + timedelta(days=j * 3 - 6)
+                ))
+    for cluster in clusters:
+        # Every seeded report sits exactly on its station
+        cluster.sum_latitude = cluster.latitude * cluster.report_count
+        cluster.sum_longitude = cluster.longitude * cluster.report_count
+    db.add_all(rows)
+    db.commit()
+
+    return {
+        "vehicle_id": vehicles[0].vehicle_id,
+        "fuel_id": db.query(models.Fuel.fuel_id).filter(models.Fuel.vehicle_id == vehicles[0].vehicle_id).first()[0],
+    }
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def seeded(client):
+    db = SessionLocal()
+    try:
+        ids = _seed(db)
+    finally:
+        db.close()
+
+    response = client.post("/auth/token", data={"username": TEST_EMAIL, "password": TEST_PASSWORD})
+    assert response.status_code == 200, response.text
+    ids["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    ids["latitude"], ids["longitude"] = SEARCH_POINT
+    return ids
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager collecting every SQL statement executed inside it."""
+
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            counter.statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield counter
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counting
@@ -0,0 +1,35 @@
+"""add_data_version_counters
+
+Revision ID: 4f2a9c1d7e3b
+Revises: 53bd2bac071c
+Create Date: 2026-10-19 09:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2a9c1d7e3b'
+down_revision: Union[str, None] = '53bd2bac071c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Version counters bumped on every write, used for ETag / Last-Modified
+    op.add_column('Users', sa.Column('data_version', sa.Integer, nullable=False, server_default='0'))
+    op.add_column('Users', sa.Column('data_updated_at', sa.DateTime, nullable=True))
+    op.add_column('Vehicles_Info', sa.Column('data_version', sa.Integer, nullable=False, server_default='0'))
+    op.add_column('Vehicles_Info', sa.Column('data_updated_at', sa.DateTime, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('Vehicles_Info', 'data_updated_at')
+    op.drop_column('Vehicles_Info', 'data_version')
+    op.drop_column('Users', 'data_updated_at')
+    op.drop_column('Users', 'data_version')
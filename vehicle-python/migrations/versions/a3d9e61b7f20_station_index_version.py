@@ -0,0 +1,37 @@
+"""station_index_version
+
+Revision ID: a3d9e61b7f20
+Revises: f8a1c6d2e457
+Create Date: 2026-10-20 14:03:27.884120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9e61b7f20'
+down_revision: Union[str, None] = 'f8a1c6d2e457'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Cluster writes are announced after their commit, by stamping the
+    # clusters with the new "stations" version; other workers fetch only the
+    # clusters stamped after theirs (NULL: committed, not announced yet)
+    op.add_column('Gas_Station_Clusters',
+                  sa.Column('index_version', sa.BigInteger, nullable=True, server_default='0'))
+    op.create_index('ix_Gas_Station_Clusters_index_version', 'Gas_Station_Clusters', ['index_version'])
+    op.bulk_insert(sa.table('Cache_Versions', sa.column('name', sa.String), sa.column('version', sa.BigInteger)),
+                   [{'name': 'stations_reload', 'version': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM Cache_Versions WHERE name = 'stations_reload'")
+    op.drop_index('ix_Gas_Station_Clusters_index_version', table_name='Gas_Station_Clusters')
+    op.drop_column('Gas_Station_Clusters', 'index_version')
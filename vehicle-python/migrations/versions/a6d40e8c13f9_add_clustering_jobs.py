@@ -0,0 +1,40 @@
+"""add_clustering_jobs
+
+Revision ID: a6d40e8c13f9
+Revises: f2c85d3e7a10
+Create Date: 2026-10-19 20:41:05.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d40e8c13f9'
+down_revision: Union[str, None] = 'f2c85d3e7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # New fuel logs waiting for their station cluster
+    op.create_table(
+        'Clustering_Jobs',
+        sa.Column('job_id', sa.Integer, primary_key=True),
+        sa.Column('fuel_id', sa.Integer, sa.ForeignKey('Fuel_Info.fuel_id', ondelete='CASCADE'),
+                  nullable=False, unique=True),
+        sa.Column('enqueued_at', sa.DateTime, nullable=True),
+        sa.Column('claimed_by', sa.String(32), nullable=True),
+        sa.Column('claimed_at', sa.DateTime, nullable=True),
+        sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+    )
+    op.create_index('ix_Clustering_Jobs_job_id', 'Clustering_Jobs', ['job_id'])
+    op.create_index('ix_Clustering_Jobs_enqueued_at', 'Clustering_Jobs', ['enqueued_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('Clustering_Jobs')
@@ -0,0 +1,40 @@
+"""cluster_running_sums
+
+Revision ID: b52e7f90c8d1
+Revises: a6d40e8c13f9
+Create Date: 2026-10-19 21:34:12.506917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e7f90c8d1'
+down_revision: Union[str, None] = 'a6d40e8c13f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Running coordinate sums, so a report is counted with one atomic UPDATE
+    op.add_column('Gas_Station_Clusters',
+                  sa.Column('sum_latitude', sa.DECIMAL(18, 8), nullable=False, server_default='0'))
+    op.add_column('Gas_Station_Clusters',
+                  sa.Column('sum_longitude', sa.DECIMAL(18, 8), nullable=False, server_default='0'))
+    # The stored centroid is the mean of report_count reports
+    op.execute(
+        "UPDATE Gas_Station_Clusters SET "
+        "sum_latitude = latitude * COALESCE(report_count, 0), "
+        "sum_longitude = longitude * COALESCE(report_count, 0), "
+        "report_count = COALESCE(report_count, 0)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('Gas_Station_Clusters', 'sum_longitude')
+    op.drop_column('Gas_Station_Clusters', 'sum_latitude')
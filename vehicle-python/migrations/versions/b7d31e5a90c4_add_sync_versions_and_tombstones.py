@@ -0,0 +1,51 @@
+"""add_sync_versions_and_tombstones
+
+Revision ID: b7d31e5a90c4
+Revises: 4f2a9c1d7e3b
+Create Date: 2026-10-19 11:03:27.541876
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d31e5a90c4'
+down_revision: Union[str, None] = '4f2a9c1d7e3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNCED_TABLES = ('Vehicles_Info', 'Fuel_Info', 'Maintenance_Info', 'Reminders_Info')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep sync_version 0 and are only sent on a full sync
+    for table in SYNCED_TABLES:
+        op.add_column(table, sa.Column('sync_version', sa.Integer, nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime, nullable=True))
+        op.create_index(f'ix_{table}_sync_version', table, ['sync_version'])
+
+    op.create_table(
+        'Sync_Tombstones',
+        sa.Column('tombstone_id', sa.Integer, primary_key=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('Users.user_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('entity', sa.String(20), nullable=False),
+        sa.Column('entity_id', sa.Integer, nullable=False),
+        sa.Column('sync_version', sa.Integer, nullable=False),
+        sa.Column('deleted_at', sa.DateTime, nullable=True),
+    )
+    op.create_index('ix_Sync_Tombstones_tombstone_id', 'Sync_Tombstones', ['tombstone_id'])
+    op.create_index('ix_Sync_Tombstones_user_id', 'Sync_Tombstones', ['user_id'])
+    op.create_index('ix_Sync_Tombstones_sync_version', 'Sync_Tombstones', ['sync_version'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('Sync_Tombstones')
+    for table in reversed(SYNCED_TABLES):
+        op.drop_index(f'ix_{table}_sync_version', table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'sync_version')
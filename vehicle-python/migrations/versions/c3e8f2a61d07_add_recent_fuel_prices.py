@@ -0,0 +1,55 @@
+"""add_recent_fuel_prices
+
+Revision ID: c3e8f2a61d07
+Revises: b7d31e5a90c4
+Create Date: 2026-10-19 14:12:05.318902
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f2a61d07'
+down_revision: Union[str, None] = 'b7d31e5a90c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Matches app.services.recent_prices.RETENTION_DAYS at the time of writing
+RETENTION_DAYS = 8
+PRICE_COLUMNS = ('fuel_id', 'vehicle_id', 'station_cluster_id', 'date', 'liters', 'kwh', 'cost')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'Recent_Fuel_Prices',
+        sa.Column('fuel_id', sa.Integer, sa.ForeignKey('Fuel_Info.fuel_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('vehicle_id', sa.Integer, nullable=False),
+        sa.Column('station_cluster_id', sa.String(100), nullable=False),
+        sa.Column('date', sa.Date, nullable=False),
+        sa.Column('liters', sa.DECIMAL(10, 2)),
+        sa.Column('kwh', sa.DECIMAL(10, 2)),
+        sa.Column('cost', sa.DECIMAL(10, 2)),
+    )
+    op.create_index('idx_recent_price_cluster_date', 'Recent_Fuel_Prices', ['station_cluster_id', 'date'])
+    op.create_index('ix_Recent_Fuel_Prices_date', 'Recent_Fuel_Prices', ['date'])
+
+    # Backfill the retention window from Fuel_Info
+    fuel = sa.table('Fuel_Info', *(sa.column(name) for name in PRICE_COLUMNS))
+    recent = sa.table('Recent_Fuel_Prices', *(sa.column(name) for name in PRICE_COLUMNS))
+    op.execute(recent.insert().from_select(
+        PRICE_COLUMNS,
+        sa.select(*(fuel.c[name] for name in PRICE_COLUMNS)).where(
+            fuel.c.station_cluster_id.isnot(None),
+            fuel.c.date >= date.today() - timedelta(days=RETENTION_DAYS)
+        )
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('Recent_Fuel_Prices')
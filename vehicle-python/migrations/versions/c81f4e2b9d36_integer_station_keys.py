@@ -0,0 +1,151 @@
+"""integer_station_keys
+
+Revision ID: c81f4e2b9d36
+Revises: b52e7f90c8d1
+Create Date: 2026-10-19 23:02:47.613204
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f4e2b9d36'
+down_revision: Union[str, None] = 'b52e7f90c8d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Matches app.services.recent_prices.RETENTION_DAYS at the time of writing
+RETENTION_DAYS = 8
+# Fuel_Info rows per backfill UPDATE, so no single statement locks the whole table
+BACKFILL_CHUNK = 10000
+CLUSTER_COLUMNS = (
+    'cluster_id', 'normalized_name', 'latitude', 'longitude', 'sum_latitude', 'sum_longitude',
+    'brand', 'street', 'city', 'report_count', 'created_at', 'updated_at',
+)
+
+
+def _cluster_table(name: str, integer_key: bool) -> None:
+    """Create a Gas_Station_Clusters table keyed by station_id (integer_key) or by the slug."""
+    if integer_key:
+        keys = [sa.Column('station_id', sa.Integer, primary_key=True, autoincrement=True),
+                sa.Column('cluster_id', sa.String(100), nullable=False, unique=True)]
+    else:
+        keys = [sa.Column('cluster_id', sa.String(100), primary_key=True)]
+    op.create_table(
+        name,
+        *keys,
+        sa.Column('normalized_name', sa.String(255), nullable=False),
+        sa.Column('latitude', sa.DECIMAL(10, 8), nullable=False),
+        sa.Column('longitude', sa.DECIMAL(11, 8), nullable=False),
+        sa.Column('sum_latitude', sa.DECIMAL(18, 8), nullable=False, server_default='0'),
+        sa.Column('sum_longitude', sa.DECIMAL(18, 8), nullable=False, server_default='0'),
+        sa.Column('brand', sa.String(100), nullable=True),
+        sa.Column('street', sa.String(255), nullable=True),
+        sa.Column('city', sa.String(100), nullable=True),
+        sa.Column('report_count', sa.Integer, default=0),
+        sa.Column('created_at', sa.DateTime, nullable=True),
+        sa.Column('updated_at', sa.DateTime, nullable=True),
+    )
+
+
+def _rebuild_clusters(integer_key: bool) -> None:
+    """Copy Gas_Station_Clusters into a table with the other primary key.
+
+    The table holds one row per station, so a copy is cheap and works the
+    same on MySQL and SQLite, unlike swapping a primary key in place.
+    """
+    _cluster_table('Gas_Station_Clusters_new', integer_key)
+    columns = ', '.join(CLUSTER_COLUMNS)
+    # Oldest stations get the lowest station_id
+    op.execute(
+        f"INSERT INTO Gas_Station_Clusters_new ({columns}) "
+        f"SELECT {columns} FROM Gas_Station_Clusters ORDER BY created_at, cluster_id"
+    )
+    op.drop_index('idx_cluster_location', 'Gas_Station_Clusters')
+    op.drop_table('Gas_Station_Clusters')
+    op.rename_table('Gas_Station_Clusters_new', 'Gas_Station_Clusters')
+    op.create_index('idx_cluster_location', 'Gas_Station_Clusters', ['latitude', 'longitude'])
+
+
+def _backfill(column: str, value_sql: str) -> None:
+    """Set Fuel_Info.<column> from the clusters table, BACKFILL_CHUNK fuel_ids at a time."""
+    low, high = op.get_bind().execute(sa.text("SELECT MIN(fuel_id), MAX(fuel_id) FROM Fuel_Info")).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_CHUNK):
+        op.execute(sa.text(
+            f"UPDATE Fuel_Info SET {column} = ({value_sql}) "
+            "WHERE fuel_id >= :start AND fuel_id < :end"
+        ).bindparams(start=start, end=start + BACKFILL_CHUNK))
+
+
+def _recent_prices(station_column: sa.Column, index_name: str) -> None:
+    """Recreate Recent_Fuel_Prices around station_column and refill its retention window."""
+    op.drop_table('Recent_Fuel_Prices')
+    op.create_table(
+        'Recent_Fuel_Prices',
+        sa.Column('fuel_id', sa.Integer, sa.ForeignKey('Fuel_Info.fuel_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('vehicle_id', sa.Integer, nullable=False),
+        station_column,
+        sa.Column('date', sa.Date, nullable=False),
+        sa.Column('liters', sa.DECIMAL(10, 2)),
+        sa.Column('kwh', sa.DECIMAL(10, 2)),
+        sa.Column('cost', sa.DECIMAL(10, 2)),
+    )
+    op.create_index(index_name, 'Recent_Fuel_Prices', [station_column.name, 'date'])
+    op.create_index('ix_Recent_Fuel_Prices_date', 'Recent_Fuel_Prices', ['date'])
+
+    columns = ('fuel_id', 'vehicle_id', station_column.name, 'date', 'liters', 'kwh', 'cost')
+    fuel = sa.table('Fuel_Info', *(sa.column(name) for name in columns))
+    recent = sa.table('Recent_Fuel_Prices', *(sa.column(name) for name in columns))
+    op.execute(recent.insert().from_select(
+        columns,
+        sa.select(*(fuel.c[name] for name in columns)).where(
+            fuel.c[station_column.name].isnot(None),
+            fuel.c.date >= date.today() - timedelta(days=RETENTION_DAYS)
+        )
+    ))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fuel_Info and Recent_Fuel_Prices referenced stations by their 100-char
+    # slug; an INT key makes those indexes and the joins on them much smaller.
+    # The slug stays as a unique column, since the API exposes it.
+    _rebuild_clusters(integer_key=True)
+
+    op.add_column('Fuel_Info', sa.Column('station_id', sa.Integer, nullable=True))
+    _backfill('station_id', (
+        "SELECT Gas_Station_Clusters.station_id FROM Gas_Station_Clusters "
+        "WHERE Gas_Station_Clusters.cluster_id = Fuel_Info.station_cluster_id"
+    ))
+    op.create_index('ix_Fuel_Info_station_id', 'Fuel_Info', ['station_id'])
+    if op.get_bind().dialect.name != 'sqlite':
+        # SQLite cannot add a foreign key to an existing table
+        op.create_foreign_key('fk_fuel_station', 'Fuel_Info', 'Gas_Station_Clusters',
+                              ['station_id'], ['station_id'])
+    op.drop_index('idx_fuel_cluster', 'Fuel_Info')
+    op.drop_column('Fuel_Info', 'station_cluster_id')
+
+    _recent_prices(sa.Column('station_id', sa.Integer, nullable=False), 'idx_recent_price_station_date')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('Fuel_Info', sa.Column('station_cluster_id', sa.String(100), nullable=True))
+    _backfill('station_cluster_id', (
+        "SELECT Gas_Station_Clusters.cluster_id FROM Gas_Station_Clusters "
+        "WHERE Gas_Station_Clusters.station_id = Fuel_Info.station_id"
+    ))
+    op.create_index('idx_fuel_cluster', 'Fuel_Info', ['station_cluster_id'])
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_fuel_station', 'Fuel_Info', type_='foreignkey')
+    op.drop_index('ix_Fuel_Info_station_id', 'Fuel_Info')
+    op.drop_column('Fuel_Info', 'station_id')
+
+    _recent_prices(sa.Column('station_cluster_id', sa.String(100), nullable=False), 'idx_recent_price_cluster_date')
+    _rebuild_clusters(integer_key=False)
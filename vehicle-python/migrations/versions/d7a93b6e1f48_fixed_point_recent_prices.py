@@ -0,0 +1,85 @@
+"""fixed_point_recent_prices
+
+Revision ID: d7a93b6e1f48
+Revises: c81f4e2b9d36
+Create Date: 2026-10-20 00:41:19.270583
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a93b6e1f48'
+down_revision: Union[str, None] = 'c81f4e2b9d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Matches app.services.recent_prices.RETENTION_DAYS at the time of writing
+RETENTION_DAYS = 8
+KEY_COLUMNS = ('fuel_id', 'vehicle_id', 'station_id', 'date')
+# Fuel_Info amount -> (integer column, units per peso/liter/kWh)
+FIXED_POINT = {'liters': ('liters_ml', 1000), 'kwh': ('kwh_wh', 1000), 'cost': ('cost_centavos', 100)}
+UNIT_PRICE = (
+    "CASE WHEN cost_centavos <> 0 AND liters_ml > 0 THEN 10.0 * cost_centavos / liters_ml "
+    "WHEN cost_centavos <> 0 AND kwh_wh > 0 THEN 10.0 * cost_centavos / kwh_wh END"
+)
+fuel = sa.table('Fuel_Info', *(sa.column(name) for name in (*KEY_COLUMNS, *FIXED_POINT)))
+
+
+def _create(amount_columns, index_name, index_columns) -> None:
+    op.drop_table('Recent_Fuel_Prices')
+    op.create_table(
+        'Recent_Fuel_Prices',
+        sa.Column('fuel_id', sa.Integer, sa.ForeignKey('Fuel_Info.fuel_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('vehicle_id', sa.Integer, nullable=False),
+        sa.Column('station_id', sa.Integer, nullable=False),
+        sa.Column('date', sa.Date, nullable=False),
+        *amount_columns,
+    )
+    op.create_index(index_name, 'Recent_Fuel_Prices', index_columns)
+    op.create_index('ix_Recent_Fuel_Prices_date', 'Recent_Fuel_Prices', ['date'])
+
+
+def _refill(columns, expressions) -> None:
+    """Copy the retention window from Fuel_Info."""
+    recent = sa.table('Recent_Fuel_Prices', *(sa.column(name) for name in columns))
+    op.execute(recent.insert().from_select(
+        columns,
+        sa.select(*expressions).where(
+            fuel.c.station_id.isnot(None),
+            fuel.c.date >= date.today() - timedelta(days=RETENTION_DAYS)
+        )
+    ))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Amounts as centavos / milliliters / watt-hours plus a generated price,
+    # so price aggregation runs in SQL on integers. The index covers the
+    # nearby-price read (vehicle_id is joined for the current fuel type)
+    _create(
+        [sa.Column(name, sa.BigInteger) for name, _ in FIXED_POINT.values()]
+        + [sa.Column('unit_price', sa.Double, sa.Computed(UNIT_PRICE, persisted=True))],
+        'idx_recent_price_station_date_price', ['station_id', 'date', 'vehicle_id', 'unit_price']
+    )
+    _refill(
+        [*KEY_COLUMNS, *(name for name, _ in FIXED_POINT.values())],
+        [*(fuel.c[name] for name in KEY_COLUMNS),
+         *(sa.cast(sa.func.round(fuel.c[column] * scale), sa.BigInteger) for column, (_, scale) in FIXED_POINT.items())]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _create(
+        [sa.Column(column, sa.DECIMAL(10, 2)) for column in FIXED_POINT],
+        'idx_recent_price_station_date', ['station_id', 'date']
+    )
+    _refill(
+        [*KEY_COLUMNS, *FIXED_POINT],
+        [fuel.c[name] for name in (*KEY_COLUMNS, *FIXED_POINT)]
+    )
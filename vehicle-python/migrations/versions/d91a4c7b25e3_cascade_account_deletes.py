@@ -0,0 +1,60 @@
+"""cascade_account_deletes
+
+Revision ID: d91a4c7b25e3
+Revises: c3e8f2a61d07
+Create Date: 2026-10-19 16:40:27.551093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91a4c7b25e3'
+down_revision: Union[str, None] = 'c3e8f2a61d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referenced table, referenced column) now deleted by the database
+CASCADES = [
+    ('Vehicles_Info', 'user_id', 'Users', 'user_id'),
+    ('Fuel_Info', 'vehicle_id', 'Vehicles_Info', 'vehicle_id'),
+    ('Maintenance_Info', 'vehicle_id', 'Vehicles_Info', 'vehicle_id'),
+    ('Reminders_Info', 'user_id', 'Users', 'user_id'),
+    ('Reminders_Info', 'vehicle_id', 'Vehicles_Info', 'vehicle_id'),
+    ('Password_Reset_Tokens', 'user_id', 'Users', 'user_id'),
+]
+
+
+def _cascade_foreign_keys() -> None:
+    """Recreate each foreign key in CASCADES that does not cascade yet."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # SQLite databases are created from the models, which already cascade
+        return
+    inspector = sa.inspect(bind)
+    for table, column, referred_table, referred_column in CASCADES:
+        for fk in inspector.get_foreign_keys(table):
+            if fk['constrained_columns'] != [column] or fk['referred_table'] != referred_table:
+                continue
+            if (fk['options'].get('ondelete') or '').upper() == 'CASCADE':
+                continue
+            op.drop_constraint(fk['name'], table, type_='foreignkey')
+            op.create_foreign_key(fk['name'], table, referred_table, [column], [referred_column], ondelete='CASCADE')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Deletes now rely on ON DELETE CASCADE (passive_deletes) instead of the
+    # ORM loading every child row
+    _cascade_foreign_keys()
+    op.add_column('Users', sa.Column('deleted_at', sa.DateTime, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('Users', 'deleted_at')
+    # The foreign keys keep cascading: the ORM cascade of older code works
+    # the same on top of it
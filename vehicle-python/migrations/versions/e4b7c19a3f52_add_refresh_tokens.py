@@ -0,0 +1,43 @@
+"""add_refresh_tokens
+
+Revision ID: e4b7c19a3f52
+Revises: d91a4c7b25e3
+Create Date: 2026-10-19 18:05:13.704219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c19a3f52'
+down_revision: Union[str, None] = 'd91a4c7b25e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rotating refresh tokens, stored as SHA-256 hashes (app/services/refresh_tokens.py)
+    op.create_table(
+        'Refresh_Tokens',
+        sa.Column('token_id', sa.Integer, primary_key=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('Users.user_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('token_hash', sa.String(64), nullable=False),
+        sa.Column('previous_hash', sa.String(64), nullable=True),
+        sa.Column('expires_at', sa.DateTime, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=True),
+        sa.Column('last_used_at', sa.DateTime, nullable=True),
+        sa.Column('revoked_at', sa.DateTime, nullable=True),
+        sa.UniqueConstraint('token_hash'),
+    )
+    op.create_index('ix_Refresh_Tokens_token_id', 'Refresh_Tokens', ['token_id'])
+    op.create_index('ix_Refresh_Tokens_user_id', 'Refresh_Tokens', ['user_id'])
+    op.create_index('ix_Refresh_Tokens_previous_hash', 'Refresh_Tokens', ['previous_hash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('Refresh_Tokens')
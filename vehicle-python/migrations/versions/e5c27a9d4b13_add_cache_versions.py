@@ -0,0 +1,35 @@
+"""add_cache_versions
+
+Revision ID: e5c27a9d4b13
+Revises: d7a93b6e1f48
+Create Date: 2026-10-20 02:15:38.904126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c27a9d4b13'
+down_revision: Union[str, None] = 'd7a93b6e1f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Bumped by every cluster write, so each worker's in-memory station
+    # index knows when to reload
+    cache_versions = op.create_table(
+        'Cache_Versions',
+        sa.Column('name', sa.String(50), primary_key=True),
+        sa.Column('version', sa.BigInteger, nullable=False, server_default='0'),
+    )
+    op.bulk_insert(cache_versions, [{'name': 'stations', 'version': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('Cache_Versions')
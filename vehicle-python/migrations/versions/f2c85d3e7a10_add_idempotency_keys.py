@@ -0,0 +1,41 @@
+"""add_idempotency_keys
+
+Revision ID: f2c85d3e7a10
+Revises: e4b7c19a3f52
+Create Date: 2026-10-19 19:22:48.160533
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c85d3e7a10'
+down_revision: Union[str, None] = 'e4b7c19a3f52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Stored responses for create requests sent with an Idempotency-Key
+    op.create_table(
+        'Idempotency_Keys',
+        sa.Column('key_id', sa.Integer, primary_key=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('Users.user_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('idempotency_key', sa.String(64), nullable=False),
+        sa.Column('request_hash', sa.String(64), nullable=False),
+        sa.Column('status_code', sa.Integer, nullable=True),
+        sa.Column('response_body', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime, nullable=True),
+        sa.Column('expires_at', sa.DateTime, nullable=False),
+        sa.UniqueConstraint('user_id', 'idempotency_key', name='uq_idempotency_user_key'),
+    )
+    op.create_index('ix_Idempotency_Keys_key_id', 'Idempotency_Keys', ['key_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('Idempotency_Keys')
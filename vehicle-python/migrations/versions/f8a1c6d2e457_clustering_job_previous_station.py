@@ -0,0 +1,34 @@
+"""clustering_job_previous_station
+
+Revision ID: f8a1c6d2e457
+Revises: e5c27a9d4b13
+Create Date: 2026-10-20 09:12:44.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8a1c6d2e457'
+down_revision: Union[str, None] = 'e5c27a9d4b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Updates that move a clustered fuel log re-cluster it through the queue;
+    # the job remembers which cluster (and position) to take the report off
+    op.add_column('Clustering_Jobs', sa.Column('previous_station_id', sa.Integer, nullable=True))
+    op.add_column('Clustering_Jobs', sa.Column('previous_latitude', sa.DECIMAL(10, 8), nullable=True))
+    op.add_column('Clustering_Jobs', sa.Column('previous_longitude', sa.DECIMAL(11, 8), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('Clustering_Jobs', 'previous_longitude')
+    op.drop_column('Clustering_Jobs', 'previous_latitude')
+    op.drop_column('Clustering_Jobs', 'previous_station_id')
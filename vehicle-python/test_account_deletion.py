@@ -0,0 +1,137 @@
+"""
+Vehicle and account deletion: children go through ON DELETE CASCADE, never
+loaded into the session, and whole accounts are purged in chunks.
+"""
+from datetime import date, timedelta
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.services import account_purge
+
+
+def _account(client, email):
+    password = "delete-me-please"
+    response = client.post("/auth/register", json={"full_name": "Leaving", "email": email, "password": password})
+    assert response.status_code == 200, response.text
+    token = client.post("/auth/token", data={"username": email, "password": password}).json()["access_token"]
+    return response.json()["user_id"], {"Authorization": f"Bearer {token}"}, password
+
+
+def _vehicle_with_logs(client, headers, user_id, logs=50):
+    response = client.post("/vehicles/", headers=headers, json={
+        "make": "Mitsubishi", "model": "L300", "year": 2019, "fuel_type": "Diesel"
+    })
+    assert response.status_code == 200, response.text
+    vehicle_id = response.json()["vehicle_id"]
+
+    db = SessionLocal()
+    try:
+        today = date.today()
+        db.execute(models.Fuel.__table__.insert(), [
+            {"vehicle_id": vehicle_id, "date": today - timedelta(days=i), "liters": 30, "cost": 1900,
+             "notes": "x" * 1000, "sync_version": 0}
+            for i in range(logs)
+        ])
+        db.execute(models.Maintenance.__table__.insert(), [
+            {"vehicle_id": vehicle_id, "date": today, "maintenance_type": "Oil Change", "sync_version": 0}
+            for _ in range(logs)
+        ])
+        db.add(models.Reminder(user_id=user_id, vehicle_id=vehicle_id, title="PMS", due_date=today))
+        db.commit()
+    finally:
+        db.close()
+    return vehicle_id
+
+
+def _remaining(user_id, vehicle_ids):
+    db = SessionLocal()
+    try:
+        return {
+            "users": db.query(models.User).filter(models.User.user_id == user_id).count(),
+            "vehicles": db.query(models.Vehicle).filter(models.Vehicle.vehicle_id.in_(vehicle_ids)).count(),
+            "fuel": db.query(models.Fuel).filter(models.Fuel.vehicle_id.in_(vehicle_ids)).count(),
+            "maintenance": db.query(models.Maintenance).filter(models.Maintenance.vehicle_id.in_(vehicle_ids)).count(),
+            "reminders": db.query(models.Reminder).filter(models.Reminder.user_id == user_id).count(),
+        }
+    finally:
+        db.close()
+
+
+def test_delete_vehicle_does_not_load_children(client, count_queries):
+    user_id, headers, _ = _account(client, "vehicle.delete@example.com")
+    vehicle_id = _vehicle_with_logs(client, headers, user_id)
+
+    with count_queries() as queries:
+        assert client.delete(f"/vehicles/{vehicle_id}", headers=headers).status_code == 204
+    child_tables = ("Fuel_Info", "Maintenance_Info", "Reminders_Info")
+    assert not [statement for statement in queries.statements if any(table in statement for table in child_tables)]
+    assert sum(statement.startswith("DELETE") for statement in queries.statements) == 1
+
+    remaining = _remaining(user_id, [vehicle_id])
+    assert remaining["vehicles"] == remaining["fuel"] == remaining["maintenance"] == remaining["reminders"] == 0
+
+
+def test_delete_account_purges_everything(client):
+    user_id, headers, password = _account(client, "account.delete@example.com")
+    vehicle_ids = [_vehicle_with_logs(client, headers, user_id) for _ in range(2)]
+
+    assert client.delete("/users/me", headers=headers).status_code == 204
+    assert _remaining(user_id, vehicle_ids) == {"users": 0, "vehicles": 0, "fuel": 0, "maintenance": 0, "reminders": 0}
+    assert client.get("/users/me", headers=headers).status_code == 401
+    login = client.post("/auth/token", data={"username": "account.delete@example.com", "password": password})
+    assert login.status_code == 401
+
+
+def test_purge_user_deletes_in_chunks(client, count_queries):
+    user_id, headers, _ = _account(client, "chunked.delete@example.com")
+    vehicle_ids = [_vehicle_with_logs(client, headers, user_id, logs=25) for _ in range(2)]
+
+    db = SessionLocal()
+    try:
+        with count_queries() as queries:
+            removed = account_purge.purge_user(db, user_id, chunk_size=20)
+    finally:
+        db.close()
+
+    assert removed == 100
+    # 50 fuel and 50 maintenance rows: three chunks each, then the user row
+    assert sum(statement.startswith("DELETE") for statement in queries.statements) == 7
+    assert _remaining(user_id, vehicle_ids) == {"users": 0, "vehicles": 0, "fuel": 0, "maintenance": 0, "reminders": 0}
+
+
+def test_interrupted_purges_are_finished(client):
+    user_id, headers, _ = _account(client, "interrupted.delete@example.com")
+    vehicle_id = _vehicle_with_logs(client, headers, user_id, logs=5)
+
+    db = SessionLocal()
+    try:
+        db.query(models.User).filter(models.User.user_id == user_id).update({models.User.deleted_at: date.today()})
+        db.commit()
+        assert account_purge.purge_pending(db) == 1
+    finally:
+        db.close()
+    assert _remaining(user_id, [vehicle_id])["users"] == 0
+
+
+def test_email_is_released_when_the_purge_fails(client, monkeypatch):
+    user_id, headers, _ = _account(client, "failed.purge@example.com")
+
+    def fail(db, user_id):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(account_purge, "purge_user", fail)
+    assert client.delete("/users/me", headers=headers).status_code == 204
+    assert _remaining(user_id, [])["users"] == 1
+    monkeypatch.undo()
+
+    again_id, again_headers, _ = _account(client, "failed.purge@example.com")
+    assert again_id != user_id
+    assert client.get("/users/me", headers=again_headers).json()["email"] == "failed.purge@example.com"
+
+    db = SessionLocal()
+    try:
+        assert account_purge.purge_pending(db) == 1
+    finally:
+        db.close()
+    assert _remaining(user_id, [])["users"] == 0
+    assert client.delete("/users/me", headers=again_headers).status_code == 204
@@ -0,0 +1,70 @@
+"""
+Station cluster counts and centroids under concurrent writers: 50 threads
+reporting the same station must neither lose increments nor collide when
+creating it.
+"""
+import threading
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.services.location_service import LocationService
+
+# Away from the seeded Metro Manila stations, so other tests' clusters are untouched
+ZAMBOANGA = (6.92145, 122.07905)
+NAME = "Petron, Veterans Ave, Zamboanga"
+WRITERS = 50
+
+
+def _report_concurrently():
+    barrier = threading.Barrier(WRITERS)
+    station_ids, errors = [], []
+
+    def report(i):
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            # Jitter stays inside one generated cluster_id cell
+            station_ids.append(LocationService.find_or_create_station_cluster(
+                db, ZAMBOANGA[0] + i * 1e-7, ZAMBOANGA[1] + i * 1e-7, NAME, "Petron", "Veterans Ave"
+            ))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=report, args=(i,)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return station_ids, errors
+
+
+def _cluster(station_id):
+    db = SessionLocal()
+    try:
+        return db.get(models.GasStationCluster, station_id)
+    finally:
+        db.close()
+
+
+def test_concurrent_reports_are_all_counted():
+    mean_offset = sum(range(WRITERS)) / WRITERS * 1e-7
+
+    # All writers find no cluster and create the same one
+    station_ids, errors = _report_concurrently()
+    assert errors == []
+    assert len(set(station_ids)) == 1
+    cluster = _cluster(station_ids[0])
+    assert cluster.report_count == WRITERS
+    assert abs(float(cluster.latitude) - (ZAMBOANGA[0] + mean_offset)) < 1e-7
+    assert abs(float(cluster.longitude) - (ZAMBOANGA[1] + mean_offset)) < 1e-7
+
+    # All writers match the existing cluster
+    station_ids, errors = _report_concurrently()
+    assert errors == []
+    assert set(station_ids) == {cluster.station_id}
+    cluster = _cluster(cluster.station_id)
+    assert cluster.report_count == 2 * WRITERS
+    assert abs(float(cluster.sum_latitude) - 2 * WRITERS * (ZAMBOANGA[0] + mean_offset)) < 1e-5
+    assert abs(float(cluster.latitude) - (ZAMBOANGA[0] + mean_offset)) < 1e-7
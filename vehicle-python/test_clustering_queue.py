@@ -0,0 +1,193 @@
+"""
+Post-commit station clustering: fuel logs are written without a cluster and
+clustered in batches by the queue, with the Clustering_Jobs table as the
+durable fallback.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.services.clustering_queue import ClusteringQueue, clustering_queue
+
+# Away from the seeded Metro Manila stations, so other tests' clusters are untouched
+ILOILO = (10.7202, 122.5621)
+
+
+def _create(client, seeded, location="Caltex, Diversion Road, Iloilo", offset=0.0):
+    response = client.post("/fuel/", headers=seeded["headers"], json={
+        "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 25, "cost": 1600,
+        "location": location, "latitude": ILOILO[0] + offset, "longitude": ILOILO[1]
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _fuel(fuel_id):
+    db = SessionLocal()
+    try:
+        return db.get(models.Fuel, fuel_id)
+    finally:
+        db.close()
+
+
+def _jobs(fuel_ids):
+    db = SessionLocal()
+    try:
+        return db.query(models.ClusteringJob).filter(models.ClusteringJob.fuel_id.in_(fuel_ids)).all()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def cleanup(client, seeded):
+    fuel_ids = []
+    yield fuel_ids
+    for fuel_id in fuel_ids:
+        client.delete(f"/fuel/{fuel_id}", headers=seeded["headers"])
+
+
+def test_create_skips_clustering_and_queue_assigns_it(client, seeded, count_queries, cleanup):
+    with count_queries() as queries:
+        created = _create(client, seeded)
+    cleanup.append(created["fuel_id"])
+    # Fuel reads join the station; no cluster is scanned or written
+    assert not [statement for statement in queries.statements
+                if 'FROM "Gas_Station_Clusters"' in statement or statement.startswith(("INSERT", "UPDATE"))
+                and "Gas_Station_Clusters" in statement]
+    assert created["station_cluster_id"] is None
+    assert created["normalized_location"].startswith("Caltex")
+    assert len(_jobs([created["fuel_id"]])) == 1
+    written_version = _fuel(created["fuel_id"]).sync_version
+
+    assert clustering_queue.flush() >= 1
+    fuel = _fuel(created["fuel_id"])
+    assert fuel.station_id is not None
+    # Re-synced, so clients see the cluster on their next /sync
+    assert fuel.sync_version > written_version
+    assert _jobs([created["fuel_id"]]) == []
+
+
+def test_batch_shares_one_cluster_lookup(client, seeded, count_queries, cleanup):
+    created = [_create(client, seeded, "Seaoil, Jaro, Iloilo", offset=0.05 + i * 0.00001) for i in range(5)]
+    cleanup.extend(log["fuel_id"] for log in created)
+
+    with count_queries() as queries:
+        assert clustering_queue.flush() == 5
+    # One spatial lookup for the whole batch, and one write for its new cluster
+    lookups = [statement for statement in queries.statements
+               if statement.startswith("SELECT") and "Gas_Station_Clusters" in statement and "BETWEEN" in statement]
+    assert len(lookups) == 1
+    assert sum(statement.startswith("INSERT INTO \"Gas_Station_Clusters\"") for statement in queries.statements) == 1
+
+    # Later logs of the batch join the cluster the first one created
+    station_ids = {_fuel(log["fuel_id"]).station_id for log in created}
+    assert len(station_ids) == 1
+    db = SessionLocal()
+    try:
+        assert db.get(models.GasStationCluster, station_ids.pop()).report_count == 5
+    finally:
+        db.close()
+
+
+def test_worker_threads_cluster_submitted_jobs(client, seeded, cleanup):
+    created = [_create(client, seeded, "Shell, Molo, Iloilo", offset=0.1 + i * 0.00001) for i in range(3)]
+    cleanup.extend(log["fuel_id"] for log in created)
+    workers = ClusteringQueue(workers=2, batch_size=2, batch_wait_seconds=0.01, queue_size=10, sweep_seconds=60)
+    workers.start()
+    try:
+        for job in _jobs([log["fuel_id"] for log in created]):
+            workers.submit(job.job_id)
+        assert workers.flush(timeout=10) == 0  # Nothing left for the caller
+    finally:
+        workers.stop()
+
+    assert all(_fuel(log["fuel_id"]).station_id for log in created)
+    assert workers.jobs.value(result="clustered") == 3
+    assert "clustering_lag_seconds_count 3" in "\n".join(workers.lag.render())
+
+
+def test_only_expired_claims_are_taken_over(client, seeded, cleanup):
+    crashed = _create(client, seeded, "Petron, Mandurriao, Iloilo", offset=0.2)
+    running = _create(client, seeded, "Petron, La Paz, Iloilo", offset=0.3)
+    cleanup.extend([crashed["fuel_id"], running["fuel_id"]])
+    db = SessionLocal()
+    try:
+        for fuel_id, claimed_at in ((crashed["fuel_id"], datetime.utcnow() - timedelta(hours=1)),
+                                    (running["fuel_id"], datetime.utcnow())):
+            db.query(models.ClusteringJob).filter(models.ClusteringJob.fuel_id == fuel_id).update(
+                {models.ClusteringJob.claimed_by: "another-process", models.ClusteringJob.claimed_at: claimed_at}
+            )
+        db.commit()
+    finally:
+        db.close()
+
+    clustering_queue.flush()
+    assert _fuel(crashed["fuel_id"]).station_id is not None
+    assert _fuel(running["fuel_id"]).station_id is None
+    assert len(_jobs([running["fuel_id"]])) == 1
+
+
+def test_deleted_log_drops_its_job(client, seeded):
+    created = _create(client, seeded, "Phoenix, Arevalo, Iloilo", offset=0.4)
+    assert client.delete(f"/fuel/{created['fuel_id']}", headers=seeded["headers"]).status_code == 204
+    assert _jobs([created["fuel_id"]]) == []
+
+
+def _cluster(station_id):
+    db = SessionLocal()
+    try:
+        return db.get(models.GasStationCluster, station_id)
+    finally:
+        db.close()
+
+
+def test_moved_log_is_reclustered_by_the_queue(client, seeded, count_queries, cleanup):
+    stays = _create(client, seeded, "Petron, Tabuc Suba, Iloilo", offset=0.5)
+    moves = _create(client, seeded, "Petron, Tabuc Suba, Iloilo", offset=0.5 + 0.00001)
+    cleanup.extend([stays["fuel_id"], moves["fuel_id"]])
+    clustering_queue.flush()
+    old_station = _fuel(moves["fuel_id"]).station_id
+    assert _cluster(old_station).report_count == 2
+
+    with count_queries() as queries:
+        response = client.put(f"/fuel/{moves['fuel_id']}", headers=seeded["headers"], json={
+            "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 25, "cost": 1600,
+            "location": "Shell, Tabuc Suba, Iloilo", "latitude": ILOILO[0] + 0.6, "longitude": ILOILO[1]
+        })
+    assert response.status_code == 200, response.text
+    # No cluster written (or committed) inside the request
+    assert not [statement for statement in queries.statements
+                if statement.startswith(("INSERT", "UPDATE")) and "Gas_Station_Clusters" in statement]
+    assert response.json()["station_cluster_id"] is None
+    assert len(_jobs([moves["fuel_id"]])) == 1
+
+    assert clustering_queue.flush() == 1
+    new_station = _fuel(moves["fuel_id"]).station_id
+    assert new_station not in (None, old_station)
+    assert _cluster(new_station).report_count == 1
+    # The report left the old cluster, whose centroid is the remaining log again
+    old_cluster = _cluster(old_station)
+    assert old_cluster.report_count == 1
+    assert float(old_cluster.latitude) == pytest.approx(ILOILO[0] + 0.5)
+    db = SessionLocal()
+    try:
+        assert db.get(models.RecentFuelPrice, moves["fuel_id"]).station_id == new_station
+    finally:
+        db.close()
+
+
+def test_log_moved_off_the_map_leaves_its_cluster(client, seeded, cleanup):
+    created = _create(client, seeded, "Caltex, Oton, Iloilo", offset=0.7)
+    cleanup.append(created["fuel_id"])
+    clustering_queue.flush()
+    station_id = _fuel(created["fuel_id"]).station_id
+
+    response = client.patch(f"/fuel/{created['fuel_id']}", headers=seeded["headers"],
+                            json={"latitude": None, "longitude": None})
+    assert response.status_code == 200, response.text
+    assert clustering_queue.flush() == 0  # Nothing to cluster, only a report to take off
+    assert _fuel(created["fuel_id"]).station_id is None
+    assert _cluster(station_id).report_count == 0
+    assert _jobs([created["fuel_id"]]) == []
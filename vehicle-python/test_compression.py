@@ -0,0 +1,134 @@
+"""
+Response compression: negotiation, size threshold, streaming without
+buffering, and reuse of precompressed bodies.
+"""
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from app.utils.compression import CompressionMiddleware, PrecompressedBody, negotiate_encoding
+
+
+@pytest.mark.parametrize("accept_encoding,available,expected", [
+    (None, ("br", "gzip"), None),
+    ("", ("br", "gzip"), None),
+    ("identity", ("br", "gzip"), None),
+    ("gzip", ("br", "gzip"), "gzip"),
+    ("gzip, deflate, br", ("br", "gzip"), "br"),
+    ("br;q=0.5, gzip", ("br", "gzip"), "gzip"),
+    ("br;q=0, gzip;q=0", ("br", "gzip"), None),
+    ("*", ("br", "gzip"), "br"),
+    ("br", ("gzip",), None),
+    ("GZIP;q=0.8", ("br", "gzip"), "gzip"),
+])
+def test_negotiate_encoding(accept_encoding, available, expected):
+    assert negotiate_encoding(accept_encoding, available) == expected
+
+
+def test_large_list_is_compressed(client, seeded):
+    url = f"/fuel/vehicle/{seeded['vehicle_id']}"
+    plain = client.get(url, headers={**seeded["headers"], "Accept-Encoding": "identity"})
+    compressed = client.get(url, headers={**seeded["headers"], "Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in compressed.headers["vary"].lower()
+    assert compressed.json() == plain.json()
+    assert int(compressed.headers["content-length"]) < len(plain.content) / 3
+
+
+def test_small_response_is_not_compressed(client, seeded):
+    response = client.get("/users/me", headers={**seeded["headers"], "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_not_modified_is_not_compressed(client, seeded):
+    headers = {**seeded["headers"], "Accept-Encoding": "gzip"}
+    first = client.get("/vehicles/", headers=headers)
+    second = client.get("/vehicles/", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert "content-encoding" not in second.headers
+
+
+def _run(app, accept_encoding="gzip"):
+    """Drive an ASGI app through the middleware, returning the sent messages."""
+    sent = []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, receive, send))
+    return sent
+
+
+def test_streamed_body_is_compressed_incrementally():
+    chunks = [(b'{"row":%d}' % i) * 50 for i in range(5)]
+    flushed_before_next_chunk = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        for chunk in chunks:
+            sent_so_far = len(sent)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            flushed_before_next_chunk.append(len(sent) > sent_so_far)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def collect(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+
+    async def receive():
+        return {"type": "http.request"}
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, receive, collect))
+
+    assert all(flushed_before_next_chunk)
+    start = sent[0]
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+    body = b"".join(message["body"] for message in sent[1:])
+    assert zlib.decompress(body, 31) == b"".join(chunks)
+
+
+def test_event_stream_is_not_compressed():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: x\n\n" * 100, "more_body": False})
+
+    sent = _run(app)
+    assert not any(name == b"content-encoding" for name, _ in sent[0]["headers"])
+    assert sent[1]["body"] == b"data: x\n\n" * 100
+
+
+def test_strong_etag_is_weakened_when_compressed():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"etag", b'"abc"')]})
+        await send({"type": "http.response.body", "body": b"[" + b"1," * 200 + b"1]", "more_body": False})
+
+    headers = dict(_run(app)[0]["headers"])
+    assert headers[b"etag"] == b'W/"abc"'
+
+
+def test_precompressed_body_is_compressed_once():
+    body = PrecompressedBody(b'{"tiles":{}}' * 100)
+
+    first, encoding = body.encoded("gzip")
+    second, _ = body.encoded("gzip, deflate")
+
+    assert encoding == "gzip"
+    assert first is second
+    assert gzip.decompress(first) == body.data
+    assert body.encoded(None) == (body.data, None)
@@ -0,0 +1,83 @@
+"""
+Conditional GET: unchanged lists answer 304 without running the list query,
+and every write invalidates the ETag of the lists it touches.
+"""
+from datetime import date
+
+import pytest
+
+CONDITIONAL_ROUTES = [
+    "/vehicles/",
+    "/vehicles/{vehicle_id}",
+    "/fuel/vehicle/{vehicle_id}",
+    "/maintenance/vehicle/{vehicle_id}",
+    "/reminders/",
+    "/reminders/upcoming",
+    "/reminders/overdue",
+    "/dashboard/",
+]
+
+
+@pytest.mark.parametrize("path", CONDITIONAL_ROUTES)
+def test_unchanged_list_returns_304(client, seeded, count_queries, path):
+    url = path.format(**seeded)
+    first = client.get(url, headers=seeded["headers"])
+    assert first.status_code == 200, first.text
+    etag = first.headers["etag"]
+
+    with count_queries() as queries:
+        second = client.get(url, headers={**seeded["headers"], "If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    # Only the auth lookup and, for per-vehicle routes, the ownership check
+    assert queries.count <= 2, "\n".join(queries.statements)
+
+
+def test_write_changes_etag(client, seeded):
+    url = f"/fuel/vehicle/{seeded['vehicle_id']}"
+    before = client.get(url, headers=seeded["headers"])
+    vehicles_before = client.get("/vehicles/", headers=seeded["headers"])
+
+    created = client.post("/fuel/", headers=seeded["headers"], json={
+        "vehicle_id": seeded["vehicle_id"],
+        "date": date.today().isoformat(),
+        "liters": 25,
+        "cost": 1600,
+        "location": "Shell, Street 2, Manila",
+    })
+    assert created.status_code == 200, created.text
+
+    after = client.get(url, headers={**seeded["headers"], "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert any(log["fuel_id"] == created.json()["fuel_id"] for log in after.json())
+
+    vehicles_after = client.get(
+        "/vehicles/", headers={**seeded["headers"], "If-None-Match": vehicles_before.headers["etag"]}
+    )
+    assert vehicles_after.status_code == 200
+
+
+def test_query_params_are_part_of_etag(client, seeded):
+    url = f"/fuel/vehicle/{seeded['vehicle_id']}"
+    full = client.get(url, headers=seeded["headers"])
+    page = client.get(url, params={"limit": 5}, headers={**seeded["headers"], "If-None-Match": full.headers["etag"]})
+
+    assert page.status_code == 200
+    assert len(page.json()) == 5
+
+
+def test_profile_update_changes_dashboard_etag(client, seeded):
+    before = client.get("/dashboard/", headers=seeded["headers"])
+    original_name = before.json()["user"]["full_name"]
+
+    renamed = client.put("/users/me", headers=seeded["headers"], json={"full_name": "Renamed Driver"})
+    assert renamed.status_code == 200, renamed.text
+    try:
+        after = client.get("/dashboard/", headers={**seeded["headers"], "If-None-Match": before.headers["etag"]})
+        assert after.status_code == 200
+        assert after.json()["user"]["full_name"] == "Renamed Driver"
+    finally:
+        client.put("/users/me", headers=seeded["headers"], json={"full_name": original_name})
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Property tests for the vectorized distance kernels.
+Checks them against the scalar LocationService.calculate_distance on
+random points, including the equirectangular fast path's tolerance and
+that bounding boxes never drop a point inside the radius.
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from app.services import geo
+from app.services.location_service import LocationService
+
+TRIALS = 200
+
+
+def random_points(rng, count, latitude, longitude, max_km):
+    """`count` points within max_km of a coordinate, in random directions."""
+    points = []
+    for _ in range(count):
+        angle = rng.uniform(0, max_km) / geo.EARTH_RADIUS_KM
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = math.radians(latitude)
+        to_lat = math.asin(math.sin(lat) * math.cos(angle) + math.cos(lat) * math.sin(angle) * math.cos(bearing))
+        to_lng = math.radians(longitude) + math.atan2(
+            math.sin(bearing) * math.sin(angle) * math.cos(lat), math.cos(angle) - math.sin(lat) * math.sin(to_lat)
+        )
+        points.append((math.degrees(to_lat), (math.degrees(to_lng) + 540) % 360 - 180))
+    return points
+
+
+def scalar_distances(latitude, longitude, points):
+    return [LocationService.calculate_distance(latitude, longitude, lat, lng) for lat, lng in points]
+
+
+def test_haversine_matches_calculate_distance():
+    rng = random.Random(1)
+    for _ in range(TRIALS):
+        latitude, longitude = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(20)]
+        distances = LocationService.calculate_distances(
+            latitude, longitude, [lat for lat, _ in points], [lng for _, lng in points]
+        )
+        assert distances == pytest.approx(scalar_distances(latitude, longitude, points), abs=1e-9)
+
+
+def test_distance_matrix_matches_calculate_distance():
+    rng = random.Random(2)
+    origins = [(rng.uniform(4, 21), rng.uniform(116, 127)) for _ in range(7)]
+    points = [(rng.uniform(4, 21), rng.uniform(116, 127)) for _ in range(11)]
+    matrix = LocationService.calculate_distance_matrix(
+        [lat for lat, _ in origins], [lng for _, lng in origins],
+        [lat for lat, _ in points], [lng for _, lng in points]
+    )
+    assert matrix.shape == (7, 11)
+    for row, (latitude, longitude) in zip(matrix, origins):
+        assert row == pytest.approx(scalar_distances(latitude, longitude, points), abs=1e-9)
+
+
+def test_equirectangular_within_tolerance_up_to_a_kilometer():
+    rng = random.Random(3)
+    for latitude in (0.0, 14.6, 45.0, 80.0, -60.0):
+        longitude = rng.choice((121.0, 179.9995, -179.9995))
+        points = random_points(rng, 500, latitude, longitude, geo.EQUIRECTANGULAR_MAX_KM)
+        distances = geo.equirectangular_km(
+            latitude, longitude, [lat for lat, _ in points], [lng for _, lng in points]
+        )
+        assert distances == pytest.approx(scalar_distances(latitude, longitude, points), abs=1e-6)
+
+
+@pytest.mark.parametrize("radius_km", [0.1, 1.0, 10.0, 500.0])
+def test_bounding_box_keeps_every_point_within_the_radius(radius_km):
+    rng = random.Random(4)
+    for latitude in (0.0, 14.6, 60.0, 89.99, -89.99):
+        longitude = rng.uniform(-180, 180)
+        points = random_points(rng, 300, latitude, longitude, radius_km)
+        south, north, west, east = geo.bounding_box(latitude, longitude, radius_km)
+        for (lat, lng), distance in zip(points, scalar_distances(latitude, longitude, points)):
+            if distance <= radius_km:
+                assert south <= lat <= north and west <= lng <= east
+
+
+@pytest.mark.parametrize("radius_km", [0.1, 5.0])
+def test_within_matches_a_scalar_loop(radius_km):
+    rng = random.Random(5)
+    latitude, longitude = 14.5995, 120.9842
+    points = random_points(rng, 2000, latitude, longitude, radius_km * 2)
+    positions, distances = geo.within_km(
+        latitude, longitude, np.array([lat for lat, _ in points]), np.array([lng for _, lng in points]), radius_km
+    )
+    expected = [i for i, distance in enumerate(scalar_distances(latitude, longitude, points))
+                if distance <= radius_km]
+    # Points within the fast path's tolerance of the edge may go either way
+    edge = {i for i, distance in enumerate(scalar_distances(latitude, longitude, points))
+            if abs(distance - radius_km) <= 1e-6}
+    assert set(positions.tolist()) ^ set(expected) <= edge
+    assert list(positions) == sorted(positions)
+    assert distances == pytest.approx(scalar_distances(latitude, longitude, [points[i] for i in positions]), abs=1e-6)
+
+
+def test_match_station_cluster_takes_the_first_similar_cluster_in_radius():
+    class Cluster:
+        def __init__(self, name, latitude, longitude):
+            self.normalized_name, self.latitude, self.longitude = name, latitude, longitude
+
+    latitude, longitude = 14.5995, 120.9842
+    clusters = [
+        Cluster("Shell, EDSA", latitude + 0.002, longitude),  # ~220 m away
+        Cluster("Petron, EDSA", latitude + 0.0005, longitude),  # ~55 m, other brand
+        Cluster("Shell, EDSA", latitude, longitude + 0.0008),  # ~86 m
+        Cluster("Shell, EDSA", latitude, longitude),
+    ]
+    assert LocationService.match_station_cluster(clusters, latitude, longitude, "Shell, EDSA") is clusters[2]
+    assert LocationService.match_station_cluster(clusters[:2], latitude, longitude, "Shell, EDSA") is None
+    assert LocationService.match_station_cluster([], latitude, longitude, "Shell, EDSA") is None
@@ -0,0 +1,183 @@
+"""
+Idempotency-Key on POST /fuel/ and POST /maintenance/: retries replay the
+first response instead of writing again.
+"""
+import uuid
+from datetime import date, datetime, timedelta
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.services.clustering_queue import clustering_queue
+
+# Away from the seeded Metro Manila stations, so other tests' clusters are untouched
+DAVAO = (7.0731, 125.6128)
+
+
+def _fuel_payload(seeded, cost=1950):
+    return {
+        "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 30, "cost": cost,
+        "location": "Petron, CM Recto, Davao", "latitude": DAVAO[0], "longitude": DAVAO[1],
+    }
+
+
+def _post(client, seeded, path, payload, key):
+    return client.post(path, json=payload, headers={**seeded["headers"], "Idempotency-Key": key})
+
+
+def _count(model, **filters):
+    db = SessionLocal()
+    try:
+        return db.query(model).filter_by(**filters).count()
+    finally:
+        db.close()
+
+
+def _report_count(cluster_id):
+    db = SessionLocal()
+    try:
+        return db.query(models.GasStationCluster.report_count).filter(
+            models.GasStationCluster.cluster_id == cluster_id
+        ).scalar()
+    finally:
+        db.close()
+
+
+def test_retried_fuel_log_is_written_once(client, seeded):
+    key = str(uuid.uuid4())
+    first = _post(client, seeded, "/fuel/", _fuel_payload(seeded), key)
+    assert first.status_code == 200, first.text
+    clustering_queue.flush()
+    cluster_id = client.get(f"/fuel/{first.json()['fuel_id']}", headers=seeded["headers"]).json()["station_cluster_id"]
+    reports = _report_count(cluster_id)
+
+    retry = _post(client, seeded, "/fuel/", _fuel_payload(seeded), key)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    clustering_queue.flush()
+    # No second row, no second clustering pass
+    assert _count(models.Fuel, vehicle_id=seeded["vehicle_id"], location="Petron, CM Recto, Davao") == 1
+    assert _report_count(cluster_id) == reports
+
+    # A new key is a new log
+    other = _post(client, seeded, "/fuel/", _fuel_payload(seeded), str(uuid.uuid4()))
+    assert other.json()["fuel_id"] != first.json()["fuel_id"]
+    for fuel_id in (first.json()["fuel_id"], other.json()["fuel_id"]):
+        client.delete(f"/fuel/{fuel_id}", headers=seeded["headers"])
+
+
+def test_retried_maintenance_log_is_written_once(client, seeded):
+    key = str(uuid.uuid4())
+    payload = {"vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "maintenance_type": "Idempotent"}
+    first = _post(client, seeded, "/maintenance/", payload, key)
+    retry = _post(client, seeded, "/maintenance/", payload, key)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["maintenance_id"] == first.json()["maintenance_id"]
+    assert _count(models.Maintenance, maintenance_type="Idempotent") == 1
+    client.delete(f"/maintenance/{first.json()['maintenance_id']}", headers=seeded["headers"])
+
+
+def test_key_reused_for_another_request_is_rejected(client, seeded):
+    key = str(uuid.uuid4())
+    first = _post(client, seeded, "/fuel/", _fuel_payload(seeded), key)
+    assert _post(client, seeded, "/fuel/", _fuel_payload(seeded, cost=2500), key).status_code == 422
+    client.delete(f"/fuel/{first.json()['fuel_id']}", headers=seeded["headers"])
+
+
+def _mark_unfinished(key, started):
+    """Make a stored claim look like its request is still running."""
+    db = SessionLocal()
+    try:
+        db.query(models.IdempotencyKey).filter(models.IdempotencyKey.idempotency_key == key).update(
+            {models.IdempotencyKey.status_code: None, models.IdempotencyKey.created_at: started}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_retry_while_first_request_runs_gets_conflict(client, seeded):
+    key = str(uuid.uuid4())
+    payload = {"vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "maintenance_type": "Pending"}
+    first = _post(client, seeded, "/maintenance/", payload, key)
+    _mark_unfinished(key, datetime.utcnow())
+
+    assert _post(client, seeded, "/maintenance/", payload, key).status_code == 409
+    client.delete(f"/maintenance/{first.json()['maintenance_id']}", headers=seeded["headers"])
+
+
+def test_abandoned_claim_is_taken_over(client, seeded):
+    key = str(uuid.uuid4())
+    payload = {"vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "maintenance_type": "Abandoned"}
+    first = _post(client, seeded, "/maintenance/", payload, key)
+    # As if the worker died before committing
+    _mark_unfinished(key, datetime.utcnow() - timedelta(minutes=10))
+
+    retry = _post(client, seeded, "/maintenance/", payload, key)
+    assert retry.status_code == 200, retry.text
+    assert "Idempotent-Replayed" not in retry.headers
+    assert _post(client, seeded, "/maintenance/", payload, key).json() == retry.json()
+    for response in (first, retry):
+        client.delete(f"/maintenance/{response.json()['maintenance_id']}", headers=seeded["headers"])
+
+
+def test_expired_keys_are_forgotten(client, seeded):
+    key = str(uuid.uuid4())
+    payload = {"vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "maintenance_type": "Expired"}
+    first = _post(client, seeded, "/maintenance/", payload, key)
+    db = SessionLocal()
+    try:
+        db.query(models.IdempotencyKey).filter(models.IdempotencyKey.idempotency_key == key).update(
+            {models.IdempotencyKey.expires_at: datetime.utcnow() - timedelta(minutes=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    again = _post(client, seeded, "/maintenance/", payload, key)
+    assert again.json()["maintenance_id"] != first.json()["maintenance_id"]
+    assert _count(models.IdempotencyKey, idempotency_key=key) == 1
+    for response in (first, again):
+        client.delete(f"/maintenance/{response.json()['maintenance_id']}", headers=seeded["headers"])
+
+
+def test_failed_request_releases_its_key(client, seeded):
+    key = str(uuid.uuid4())
+    payload = {**_fuel_payload(seeded), "vehicle_id": 999999}
+    assert _post(client, seeded, "/fuel/", payload, key).status_code >= 400
+    assert _count(models.IdempotencyKey, idempotency_key=key) == 0
+
+
+def test_failure_after_mileage_update_does_not_duplicate_on_retry(client, seeded, monkeypatch):
+    from app.routes import maintenance
+
+    key = str(uuid.uuid4())
+    payload = {"vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(),
+               "maintenance_type": "Mileage then failure", "mileage": 999999}
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("lost the database after the mileage update")
+
+    monkeypatch.setattr(maintenance, "bump_versions", fail)
+    assert _post(client, seeded, "/maintenance/", payload, key).status_code == 500
+    monkeypatch.undo()
+    # Rolled back as a whole: no row, and the mileage is unchanged
+    assert _count(models.Maintenance, maintenance_type="Mileage then failure") == 0
+    vehicle = client.get(f"/vehicles/{seeded['vehicle_id']}", headers=seeded["headers"]).json()
+    assert vehicle["current_mileage"] < 999999
+
+    retry = _post(client, seeded, "/maintenance/", payload, key)
+    assert retry.status_code == 200, retry.text
+    assert _count(models.Maintenance, maintenance_type="Mileage then failure") == 1
+
+    db = SessionLocal()
+    try:
+        # Put the seeded vehicle's mileage back for other tests
+        db.query(models.Maintenance).filter(models.Maintenance.maintenance_id == retry.json()["maintenance_id"]).delete()
+        db.query(models.Vehicle).filter(models.Vehicle.vehicle_id == seeded["vehicle_id"]).update(
+            {models.Vehicle.current_mileage: vehicle["current_mileage"]}
+        )
+        db.commit()
+    finally:
+        db.close()
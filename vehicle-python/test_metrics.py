@@ -0,0 +1,102 @@
+"""
+Request and query instrumentation: /metrics reports per-route latency
+histograms, SQL statements per request, and the N+1 and slow query
+counters, all read back from the Prometheus text.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.utils.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def _samples(body: str) -> dict:
+    """Prometheus text -> {'name{labels}': value}."""
+    samples = {}
+    for line in body.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+
+def _series(name: str, le=None, **labels) -> str:
+    items = sorted(labels.items()) + ([("le", le)] if le is not None else [])
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def test_metrics_report_route_latency_and_queries(client, seeded, count_queries):
+    route = {"method": "GET", "route": "/vehicles/{vehicle_id}"}
+    before = _samples(client.get("/metrics").text)
+
+    with count_queries() as queries:
+        for _ in range(3):
+            assert client.get(f"/vehicles/{seeded['vehicle_id']}", headers=seeded["headers"]).status_code == 200
+    after = _samples(client.get("/metrics").text)
+
+    def delta(series):
+        return after.get(series, 0) - before.get(series, 0)
+
+    assert delta(_series("http_request_duration_seconds_count", **route)) == 3
+    assert delta(_series("http_requests_total", status="200", **route)) == 3
+    assert delta(_series("http_request_db_queries_count", **route)) == 3
+    assert delta(_series("http_request_db_queries_sum", **route)) == queries.count
+    assert delta(_series("http_request_db_queries_bucket", le="+Inf", **route)) == 3
+    # Route templates, not raw paths, so label cardinality stays bounded
+    assert not any(f"/vehicles/{seeded['vehicle_id']}\"" in series for series in after)
+
+
+@pytest.fixture
+def instrumented():
+    """A small app with its own registry: one route repeating a statement, one not."""
+    registry = MetricsRegistry(slow_query_ms=10000, n_plus_one_threshold=5)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    registry.instrument_engine(engine)
+    registry.instrument_engine(engine)  # Idempotent
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with engine.connect() as conn:
+            return {"value": conn.execute(text("SELECT :id"), {"id": item_id}).scalar()}
+
+    @app.get("/items")
+    def items():
+        with engine.connect() as conn:
+            # One query per item: the N+1 pattern
+            return [conn.execute(text("SELECT :id"), {"id": i}).scalar() for i in range(8)]
+
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(registry.render())
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    return TestClient(app), registry
+
+
+def test_repeated_statement_counts_as_n_plus_one(instrumented):
+    client, registry = instrumented
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items").status_code == 200
+    assert client.get("/items").status_code == 200
+    assert client.get("/missing").status_code == 404
+
+    samples = _samples(client.get("/metrics").text)
+    assert samples[_series("db_n_plus_one_total", method="GET", route="/items")] == 2
+    assert _series("db_n_plus_one_total", method="GET", route="/items/{item_id}") not in samples
+    assert samples[_series("http_request_db_queries_sum", method="GET", route="/items")] == 16
+    assert samples[_series("http_request_db_queries_sum", method="GET", route="/items/{item_id}")] == 1
+    assert samples[_series("http_requests_total", method="GET", route="<unmatched>", status="404")] == 1
+    assert samples["db_query_duration_seconds_count"] == 17
+    assert registry.slow_queries.value() == 0
+
+
+def test_slow_queries_are_counted(instrumented):
+    client, registry = instrumented
+    registry.slow_query_seconds = 0
+    assert client.get("/items/1").status_code == 200
+    assert _samples(registry.render())["db_slow_queries_total"] == 1
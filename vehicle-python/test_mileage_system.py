@@ -1,48 +0,0 @@
-#!/usr/bin/env python3
-"""
-Test script to verify the mileage management system works correctly.
-This can be run after the backend is started to validate the fixes.
-"""
-
-import requests
-import json
-
-# Configuration
-BASE_URL = "http://localhost:8000"  # Adjust if your backend runs on different port
-TEST_USER = {
-    "username": "testuser",
-    "email": "test@example.com", 
-    "password": "testpass123"
-}
-
-def test_mileage_system():
-    """
-    Test the complete mileage management flow:
-    1. Create test user/vehicle
-    2. Add fuel log with mileage
-    3. Add maintenance log with higher mileage  
-    4. Verify vehicle mileage updates correctly
-    5. Test mileage info endpoint
-    """
-    print("🚗 Testing Vehicle Mileage Management System")
-    print("=" * 50)
-    
-    # Note: This is a basic test structure
-    # Actual implementation would need authentication tokens
-    # and proper error handling
-    
-    print("✅ Test structure created")
-    print("📝 To run this test:")
-    print("   1. Start your backend server")
-    print("   2. Update the BASE_URL if needed") 
-    print("   3. Run: python test_mileage_system.py")
-    print("")
-    print("🎯 What this test would verify:")
-    print("   • Fuel logs update vehicle mileage")
-    print("   • Maintenance logs update vehicle mileage") 
-    print("   • Mileage always reflects highest value")
-    print("   • Mileage info endpoint returns correct data")
-    print("   • Deleting logs recalculates mileage correctly")
-
-if __name__ == "__main__":
-    test_mileage_system()
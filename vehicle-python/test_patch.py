@@ -0,0 +1,130 @@
+"""
+PATCH endpoints: partial bodies, UPDATEs listing only changed columns, and
+re-clustering (through the clustering queue) only when a fuel log's location
+changes.
+"""
+from datetime import date
+
+import pytest
+
+from app.services.clustering_queue import clustering_queue
+
+# Away from the seeded Metro Manila stations, so other tests' clusters are untouched
+CEBU = (10.3157, 123.8854)
+
+
+def _updates(queries, table):
+    return [statement for statement in queries.statements if statement.startswith("UPDATE") and table in statement]
+
+
+def _clustering(queries):
+    """
+    Statements scanning or writing station clusters (fuel reads only join
+    them, and price events read the one cluster they announce by key).
+    """
+    return [statement for statement in queries.statements
+            if 'FROM "Gas_Station_Clusters"' in statement
+            and not statement.endswith('WHERE "Gas_Station_Clusters".station_id = ?')
+            or statement.startswith(("INSERT", "UPDATE")) and "Gas_Station_Clusters" in statement]
+
+
+@pytest.fixture
+def vehicle(client, seeded):
+    response = client.post("/vehicles/", headers=seeded["headers"], json={
+        "make": "Nissan", "model": "Urvan", "year": 2021, "fuel_type": "Diesel",
+        "vehicle_image": "data:image/png;base64," + "A" * 200_000
+    })
+    assert response.status_code == 200, response.text
+    yield response.json()
+    client.delete(f"/vehicles/{response.json()['vehicle_id']}", headers=seeded["headers"])
+
+
+@pytest.fixture
+def fuel_log(client, seeded, vehicle):
+    response = client.post("/fuel/", headers=seeded["headers"], json={
+        "vehicle_id": vehicle["vehicle_id"], "date": date.today().isoformat(), "liters": 30, "cost": 1950,
+        "location": "Petron, Osmena Blvd, Cebu", "latitude": CEBU[0], "longitude": CEBU[1]
+    })
+    assert response.status_code == 200, response.text
+    clustering_queue.flush()
+    return client.get(f"/fuel/{response.json()['fuel_id']}", headers=seeded["headers"]).json()
+
+
+def test_patch_vehicle_updates_only_sent_columns(client, seeded, vehicle, count_queries):
+    with count_queries() as queries:
+        response = client.patch(f"/vehicles/{vehicle['vehicle_id']}", headers=seeded["headers"],
+                                json={"current_mileage": 61000})
+    assert response.status_code == 200, response.text
+    assert response.json()["current_mileage"] == 61000
+    assert response.json()["vehicle_image"] == vehicle["vehicle_image"]
+
+    # The owner's version bump is also an UPDATE; the row write must not carry the image
+    writes = [statement for statement in _updates(queries, "Vehicles_Info") if "current_mileage" in statement]
+    assert len(writes) == 1
+    assert "vehicle_image" not in writes[0] and "make" not in writes[0]
+
+
+def test_patch_without_changes_writes_nothing(client, seeded, vehicle, count_queries):
+    with count_queries() as queries:
+        response = client.patch(f"/vehicles/{vehicle['vehicle_id']}", headers=seeded["headers"],
+                                json={"make": vehicle["make"], "year": vehicle["year"]})
+    assert response.status_code == 200
+    assert not [statement for statement in queries.statements if statement.startswith("UPDATE")]
+
+
+def test_patch_rejects_clearing_required_fields(client, seeded, fuel_log):
+    response = client.patch(f"/fuel/{fuel_log['fuel_id']}", headers=seeded["headers"], json={"cost": None})
+    assert response.status_code == 422
+    # Optional fields can still be cleared
+    response = client.patch(f"/fuel/{fuel_log['fuel_id']}", headers=seeded["headers"], json={"notes": None})
+    assert response.status_code == 200
+
+
+def test_fuel_patch_reclusters_only_when_location_changes(client, seeded, fuel_log, count_queries):
+    url = f"/fuel/{fuel_log['fuel_id']}"
+    with count_queries() as queries:
+        response = client.patch(url, headers=seeded["headers"], json={"notes": "Receipt in glovebox", "cost": 2000})
+    assert response.status_code == 200, response.text
+    assert fuel_log["station_cluster_id"] is not None
+    assert response.json()["station_cluster_id"] == fuel_log["station_cluster_id"]
+    assert not _clustering(queries)
+    fuel_writes = _updates(queries, "Fuel_Info")
+    assert len(fuel_writes) == 1 and "location" not in fuel_writes[0]
+
+    # Re-sending the same coordinates (as a PUT does) is not a move either
+    with count_queries() as queries:
+        client.patch(url, headers=seeded["headers"], json={
+            "latitude": fuel_log["latitude"], "longitude": fuel_log["longitude"], "notes": "Paid cash"
+        })
+    assert not _clustering(queries)
+
+    with count_queries() as queries:
+        response = client.patch(url, headers=seeded["headers"], json={
+            "location": "Shell, Mango Ave, Cebu", "latitude": CEBU[0] + 0.02, "longitude": CEBU[1]
+        })
+    assert response.status_code == 200, response.text
+    # Re-clustered after the commit, by the clustering queue
+    assert not _clustering(queries)
+    assert response.json()["normalized_location"].startswith("Shell")
+    assert clustering_queue.flush() == 1
+    moved = client.get(url, headers=seeded["headers"]).json()
+    assert moved["station_cluster_id"] not in (None, fuel_log["station_cluster_id"])
+
+
+def test_patch_maintenance_and_reminder(client, seeded, vehicle):
+    headers = seeded["headers"]
+    maintenance = client.post("/maintenance/", headers=headers, json={
+        "vehicle_id": vehicle["vehicle_id"], "date": date.today().isoformat(), "maintenance_type": "Oil Change",
+        "mileage": 1000, "cost": 2500
+    }).json()
+    response = client.patch(f"/maintenance/{maintenance['maintenance_id']}", headers=headers, json={"mileage": 70000})
+    assert response.status_code == 200, response.text
+    assert response.json()["maintenance_type"] == "Oil Change"
+    assert client.get(f"/vehicles/{vehicle['vehicle_id']}", headers=headers).json()["current_mileage"] == 70000
+
+    reminder = client.post("/reminders/", headers=headers, json={
+        "vehicle_id": vehicle["vehicle_id"], "title": "Registration", "due_date": date.today().isoformat()
+    }).json()
+    response = client.patch(f"/reminders/{reminder['reminder_id']}", headers=headers, json={"description": "LTO"})
+    assert response.status_code == 200, response.text
+    assert response.json()["title"] == "Registration" and response.json()["description"] == "LTO"
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Property tests for the streaming price accumulator.
+Checks that DecayedPriceAccumulator matches the original two-pass
+weighted average for randomly generated price reports.
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.price_accumulator import (
+    DecayedPriceAccumulator,
+    StationPriceAccumulators,
+)
+
+TRIALS = 200
+
+
+def reference_weighted_average(prices_with_dates):
+    """Original LocationService._calculate_weighted_average implementation."""
+    if not prices_with_dates:
+        return 0
+
+    max_date = max(d for _, d in prices_with_dates)
+    weighted_sum = 0
+    total_weight = 0
+    for price, d in prices_with_dates:
+        weight = 0.85 ** (max_date - d).days
+        weighted_sum += price * weight
+        total_weight += weight
+    return weighted_sum / total_weight if total_weight > 0 else 0
+
+
+def random_reports(rng, max_reports=40, max_days=30):
+    start = date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))
+    return [
+        (rng.uniform(40.0, 90.0), start + timedelta(days=rng.randint(0, max_days)))
+        for _ in range(rng.randint(1, max_reports))
+    ]
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_streaming_matches_reference(seed):
+    rng = random.Random(seed)
+    reports = random_reports(rng)
+
+    accumulator = DecayedPriceAccumulator.from_pairs(reports)
+
+    assert accumulator.average == pytest.approx(reference_weighted_average(reports), rel=1e-12)
+    assert accumulator.count == len(reports)
+    assert accumulator.min_price == min(p for p, _ in reports)
+    assert accumulator.max_price == max(p for p, _ in reports)
+    assert accumulator.last_updated == max(d for _, d in reports)
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_order_does_not_matter(seed):
+    rng = random.Random(seed)
+    reports = random_reports(rng)
+    shuffled = reports[:]
+    rng.shuffle(shuffled)
+
+    assert DecayedPriceAccumulator.from_pairs(shuffled).average == pytest.approx(
+        DecayedPriceAccumulator.from_pairs(reports).average, rel=1e-12
+    )
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_numpy_path_matches_reference(seed):
+    rng = random.Random(seed)
+    reports = random_reports(rng)
+    prices = [p for p, _ in reports]
+    days = [d for _, d in reports]
+
+    accumulator = DecayedPriceAccumulator.from_arrays(prices, days)
+
+    assert accumulator.average == pytest.approx(reference_weighted_average(reports), rel=1e-12)
+    assert accumulator.count == len(reports)
+    assert accumulator.last_updated == max(days)
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_merge_across_fuel_types_matches_reference(seed):
+    rng = random.Random(seed)
+    accumulators = StationPriceAccumulators()
+    all_reports = []
+    for fuel_type in ("Gasoline (Unleaded)", "Gasoline (Premium)", "Diesel")[:rng.randint(1, 3)]:
+        reports = random_reports(rng)
+        all_reports.extend(reports)
+        for price, d in reports:
+            accumulators.add("cluster", fuel_type, price, d)
+
+    combined = accumulators.combined("cluster")
+
+    assert combined.average == pytest.approx(reference_weighted_average(all_reports), rel=1e-12)
+    assert combined.count == len(all_reports)
+    assert combined.min_price == min(p for p, _ in all_reports)
+    assert combined.max_price == max(p for p, _ in all_reports)
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_rebase_preserves_average(seed):
+    rng = random.Random(seed)
+    reports = random_reports(rng)
+    accumulator = DecayedPriceAccumulator.from_pairs(reports)
+    expected = accumulator.average
+
+    accumulator.rebase(accumulator.reference_day + rng.randint(-5, 30))
+
+    assert accumulator.average == pytest.approx(expected, rel=1e-12)
+    assert accumulator.last_updated == max(d for _, d in reports)
+
+
+def test_empty_accumulator():
+    assert DecayedPriceAccumulator().average == 0
+    assert DecayedPriceAccumulator.from_pairs([]).average == reference_weighted_average([])
+    assert DecayedPriceAccumulator.from_arrays([], []).count == 0
+    assert StationPriceAccumulators().combined("missing").count == 0
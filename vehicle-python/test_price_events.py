@@ -0,0 +1,248 @@
+"""
+Live price feed: tile-indexed fan-out to matching subscribers only, bounded
+queues for slow clients, unsubscribing, the brokers, the SSE stream
+delivering an event once a new fuel log is clustered, and the updates
+published when a report is corrected or moved.
+"""
+import asyncio
+import json
+from datetime import date
+from urllib.parse import urlencode
+
+import pytest
+
+from app.main import app
+from app.services.clustering_queue import clustering_queue
+from app.services import price_events
+from app.services.price_events import LocalBroker, PriceEventHub, format_sse, price_event_hub
+from app.services.price_snapshot import tile_for, tile_name
+
+MANILA = (14.5995, 120.9842)
+# Away from the seeded Metro Manila stations, so other tests' clusters are untouched
+CAGAYAN_DE_ORO = (8.4542, 124.6319)
+
+
+def _event(latitude, longitude, **extra):
+    return {"type": "price_report", "latitude": latitude, "longitude": longitude, **extra}
+
+
+async def _settle():
+    """Let call_soon_threadsafe deliveries run."""
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+def _drain(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def test_dispatch_reaches_matching_subscribers_only():
+    async def scenario():
+        hub = PriceEventHub(queue_size=10)
+        near = hub.subscribe(*MANILA, radius_km=2)
+        # Same tile as the event, but the event is ~2.2 km away
+        same_tile = hub.subscribe(MANILA[0] + 0.02, MANILA[1], radius_km=1)
+        far = hub.subscribe(*CAGAYAN_DE_ORO, radius_km=5)
+
+        assert far not in hub._by_tile[tile_for(*MANILA)]
+        hub.dispatch(_event(*MANILA, name="Shell, EDSA"))
+        await _settle()
+        return _drain(near), _drain(same_tile), _drain(far)
+
+    near, same_tile, far = asyncio.run(scenario())
+    assert [event["name"] for event in near] == ["Shell, EDSA"]
+    assert near[0]["sequence"] == 1
+    assert same_tile == [] and far == []
+
+
+def test_slow_subscriber_drops_oldest_events():
+    async def scenario():
+        hub = PriceEventHub(queue_size=3)
+        slow = hub.subscribe(*MANILA, radius_km=5)
+        for price in range(5):
+            hub.dispatch(_event(*MANILA, price_per_liter=60 + price))
+        await _settle()
+        return slow
+
+    slow = asyncio.run(scenario())
+    assert slow.dropped == 2
+    assert [event["price_per_liter"] for event in _drain(slow)] == [62, 63, 64]
+
+
+def test_unsubscribe_stops_delivery():
+    async def scenario():
+        hub = PriceEventHub(queue_size=10)
+        subscription = hub.subscribe(*MANILA, radius_km=20)
+        other = hub.subscribe(*MANILA, radius_km=1)
+        assert hub.subscriber_count == 2
+
+        hub.unsubscribe(subscription)
+        hub.dispatch(_event(*MANILA))
+        await _settle()
+        return hub, subscription, other
+
+    hub, subscription, other = asyncio.run(scenario())
+    assert hub.subscriber_count == 1
+    assert subscription.queue.empty() and other.queue.qsize() == 1
+    hub.unsubscribe(other)
+    assert hub.subscriber_count == 0 and not hub._by_tile
+
+
+def test_local_broker_dispatches_to_the_hub():
+    async def scenario():
+        hub = PriceEventHub(queue_size=10)
+        subscription = hub.subscribe(*MANILA, radius_km=5)
+        LocalBroker(hub).publish(_event(*MANILA))
+        await _settle()
+        return _drain(subscription)
+
+    assert len(asyncio.run(scenario())) == 1
+
+
+def test_redis_broker_relays_messages_and_ignores_malformed_ones():
+    pytest.importorskip("redis")
+    from app.services.price_events import RedisBroker
+
+    async def scenario():
+        hub = PriceEventHub(queue_size=10)
+        subscription = hub.subscribe(*MANILA, radius_km=5)
+        broker = RedisBroker(hub, "redis://127.0.0.1:1/0")
+        broker.publish(_event(*MANILA))  # Unreachable Redis: logged, not raised
+        broker._on_message({"data": json.dumps(_event(*MANILA, name="Petron"))})
+        broker._on_message({"data": "not json"})
+        broker._on_message({"data": json.dumps({"type": "price_report"})})
+        await _settle()
+        return _drain(subscription)
+
+    assert [event["name"] for event in asyncio.run(scenario())] == ["Petron"]
+
+
+def test_listeners_see_every_event_and_failures_are_contained():
+    hub = PriceEventHub(queue_size=4)
+    seen = []
+    hub.add_listener(lambda event: 1 / 0)
+    hub.add_listener(seen.append)
+    hub.dispatch(_event(*MANILA, stale_tiles=["1209_145"]))
+    assert [event["stale_tiles"] for event in seen] == [["1209_145"]]
+
+
+def test_format_sse():
+    assert format_sse({"sequence": 7, "name": "Shell"}) == 'id: 7\nevent: price\ndata: {"sequence":7,"name":"Shell"}\n\n'
+
+
+async def _read_until(messages: asyncio.Queue, marker: str, timeout: float = 10) -> str:
+    body = ""
+    while marker not in body:
+        message = await asyncio.wait_for(messages.get(), timeout)
+        if message["type"] == "http.response.body":
+            body += message.get("body", b"").decode()
+    return body
+
+
+def test_stream_sends_clustered_reports_and_unsubscribes_on_disconnect(client, seeded):
+    query = urlencode({"latitude": CAGAYAN_DE_ORO[0], "longitude": CAGAYAN_DE_ORO[1], "radius_km": 5})
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/fuel-prices/stream", "raw_path": b"/fuel-prices/stream",
+        "query_string": query.encode(), "root_path": "", "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+
+    def report_fuel():
+        response = client.post("/fuel/", headers=seeded["headers"], json={
+            "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 20, "cost": 1300,
+            "location": "Petron, Corrales Avenue, Cagayan de Oro",
+            "latitude": CAGAYAN_DE_ORO[0], "longitude": CAGAYAN_DE_ORO[1]
+        })
+        assert response.status_code == 200, response.text
+        clustering_queue.flush()
+        return response.json()["fuel_id"]
+
+    async def scenario():
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await messages.put(message)
+
+        subscribers = price_event_hub.subscriber_count
+        stream = asyncio.create_task(app(scope, receive, send))
+        start = await asyncio.wait_for(messages.get(), 10)
+        assert start["status"] == 200
+        assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+        await _read_until(messages, "retry: 5000")
+        assert price_event_hub.subscriber_count == subscribers + 1
+
+        fuel_id = await asyncio.to_thread(report_fuel)
+        body = await _read_until(messages, "\n\n", timeout=10)
+
+        disconnected.set()
+        await asyncio.wait_for(stream, 10)
+        return fuel_id, body, price_event_hub.subscriber_count - subscribers
+
+    fuel_id, body, subscribers_left = asyncio.run(scenario())
+    client.delete(f"/fuel/{fuel_id}", headers=seeded["headers"])
+
+    lines = body.strip().split("\n")
+    assert lines[1] == "event: price"
+    event = json.loads(lines[2][len("data: "):])
+    assert event["name"].startswith("Petron") and event["price_per_liter"] == 65.0
+    assert subscribers_left == 0
+
+
+class _RecordingBroker:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event: dict):
+        self.events.append(event)
+
+
+def test_corrected_and_moved_reports_publish_updates(client, seeded, monkeypatch):
+    broker = _RecordingBroker()
+    monkeypatch.setattr(price_events, "price_event_broker", broker)
+    headers = seeded["headers"]
+    response = client.post("/fuel/", headers=headers, json={
+        "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 20, "cost": 1300,
+        "location": "Petron, Corrales Avenue, Cagayan de Oro",
+        "latitude": CAGAYAN_DE_ORO[0], "longitude": CAGAYAN_DE_ORO[1]
+    })
+    assert response.status_code == 200, response.text
+    fuel_id = response.json()["fuel_id"]
+    clustering_queue.flush()
+    old_tile = tile_name(tile_for(*CAGAYAN_DE_ORO))
+    try:
+        assert [event["type"] for event in broker.events] == ["price_report"]
+        old_cluster = broker.events[0]["cluster_id"]
+
+        # A price correction re-announces the station and its tile
+        broker.events.clear()
+        assert client.patch(f"/fuel/{fuel_id}", headers=headers, json={"cost": 1400}).status_code == 200
+        assert [(event["type"], event["cluster_id"], event["price_per_liter"], event["stale_tiles"])
+                for event in broker.events] == [("price_update", old_cluster, 70.0, [old_tile])]
+
+        # A move updates the old station at once and the new one once clustered
+        broker.events.clear()
+        moved_to = (CAGAYAN_DE_ORO[0] + 0.15, CAGAYAN_DE_ORO[1])
+        new_tile = tile_name(tile_for(*moved_to))
+        assert client.patch(f"/fuel/{fuel_id}", headers=headers, json={
+            "location": "Shell, Bulua, Cagayan de Oro", "latitude": moved_to[0], "longitude": moved_to[1]
+        }).status_code == 200
+        [old_station] = broker.events
+        assert old_station["type"] == "price_update" and old_station["cluster_id"] == old_cluster
+        assert "price_per_liter" not in old_station
+        assert old_station["stale_tiles"] == sorted({old_tile, new_tile})
+
+        assert clustering_queue.flush() == 1
+        new_station = broker.events[1]
+        assert new_station["type"] == "price_update" and new_station["cluster_id"] != old_cluster
+        assert new_station["price_per_liter"] == 70.0 and new_station["stale_tiles"] == [new_tile]
+    finally:
+        client.delete(f"/fuel/{fuel_id}", headers=headers)
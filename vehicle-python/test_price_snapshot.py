@@ -0,0 +1,163 @@
+"""
+Price snapshots: nearby prices served from a snapshot match live
+aggregation over the same data, versions rotate under keep_versions, the
+manifest and tiles are served precompressed with ETags, and tiles with a
+corrected report are answered live until the next build.
+"""
+import gzip
+import json
+import os
+
+from datetime import date
+
+import pytest
+
+from app.database.database import SessionLocal
+from app.routes import prices
+from app.services.clustering_queue import clustering_queue
+from app.services.location_service import LocationService
+from app.services.price_snapshot import MANIFEST_NAME, PriceSnapshotStore, build_snapshot, tile_for, tile_name
+
+# Away from the seeded Metro Manila stations
+GENERAL_SANTOS = (6.1164, 125.1716)
+
+
+@pytest.fixture
+def snapshot_dir(seeded, tmp_path, monkeypatch):
+    """A snapshot of the seeded data, served by the /fuel-prices routes."""
+    db = SessionLocal()
+    try:
+        build_snapshot(db, str(tmp_path))
+    finally:
+        db.close()
+    monkeypatch.setattr(prices, "price_snapshots", PriceSnapshotStore(str(tmp_path), 600))
+    return tmp_path
+
+
+@pytest.mark.parametrize("params", [
+    {"radius_km": 5},
+    {"radius_km": 20, "time_window": "7d"},
+    {"radius_km": 10, "fuel_type": "Diesel", "time_window": "24h"},
+    {"radius_km": 50, "fuel_type": "gasoline", "time_window": "today"},
+])
+def test_snapshot_matches_live_aggregation(client, seeded, snapshot_dir, monkeypatch, params):
+    query = {"latitude": seeded["latitude"], "longitude": seeded["longitude"], **params}
+    from_snapshot = client.get("/fuel-prices/nearby", params=query).json()
+
+    monkeypatch.setattr(prices, "price_snapshots", PriceSnapshotStore(None, 600))
+    live = client.get("/fuel-prices/nearby", params=query).json()
+
+    assert from_snapshot["snapshot_version"] is not None and live["snapshot_version"] is None
+    assert from_snapshot["count"] > 0
+    assert from_snapshot["stations"] == live["stations"]
+
+
+def test_versions_rotate(seeded, tmp_path):
+    db = SessionLocal()
+    try:
+        manifests = [build_snapshot(db, str(tmp_path), keep_versions=2) for _ in range(3)]
+    finally:
+        db.close()
+
+    versions = sorted(entry for entry in os.listdir(tmp_path) if not entry.startswith("."))
+    assert versions == sorted([MANIFEST_NAME, manifests[1]["version"], manifests[2]["version"]])
+    with open(tmp_path / MANIFEST_NAME) as f:
+        assert json.load(f)["version"] == manifests[2]["version"]
+    assert PriceSnapshotStore(str(tmp_path), 600).current().version == manifests[2]["version"]
+    # Every tile the manifest lists is on disk
+    for info in manifests[2]["tiles"].values():
+        assert (tmp_path / info["file"]).is_file()
+
+
+def test_stale_snapshot_is_not_served(client, seeded, snapshot_dir, monkeypatch):
+    monkeypatch.setattr(prices, "price_snapshots", PriceSnapshotStore(str(snapshot_dir), -1))
+    response = client.get("/fuel-prices/nearby", params={"latitude": seeded["latitude"],
+                                                         "longitude": seeded["longitude"]})
+    assert response.json()["snapshot_version"] is None
+    assert client.get("/fuel-prices/snapshot/manifest").status_code == 404
+
+
+def test_manifest_is_served_with_etag(client, snapshot_dir):
+    response = client.get("/fuel-prices/snapshot/manifest", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    with open(snapshot_dir / MANIFEST_NAME) as f:
+        assert response.json() == json.load(f)
+
+    cached = client.get("/fuel-prices/snapshot/manifest",
+                        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+@pytest.mark.parametrize("accept_encoding,encoding", [("gzip", "gzip"), ("br, gzip", "br"), ("identity", None)])
+def test_tiles_are_served_precompressed(client, seeded, snapshot_dir, accept_encoding, encoding):
+    if encoding == "br":
+        pytest.importorskip("brotli")
+    tile = tile_name(tile_for(seeded["latitude"], seeded["longitude"]))
+    with open(snapshot_dir / MANIFEST_NAME) as f:
+        info = json.load(f)["tiles"][tile]
+    with open(snapshot_dir / info["file"], "rb") as f:
+        expected = json.loads(gzip.decompress(f.read()))
+
+    response = client.get(f"/fuel-prices/snapshot/tiles/{tile}", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["etag"] == (info["br_etag"] if encoding == "br" else info["etag"])
+    # httpx decodes gzip and br bodies
+    assert response.json() == expected
+
+    cached = client.get(f"/fuel-prices/snapshot/tiles/{tile}",
+                        headers={"Accept-Encoding": accept_encoding, "If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get("/fuel-prices/snapshot/tiles/0_0").status_code == 404
+
+
+def test_snapshot_distances_match_calculate_distance(seeded, snapshot_dir):
+    snapshot = PriceSnapshotStore(str(snapshot_dir), 600).current()
+    for station in snapshot.get_fuel_price_data(seeded["latitude"], seeded["longitude"], radius_km=20, days_back=7):
+        distance = LocationService.calculate_distance(
+            seeded["latitude"], seeded["longitude"], station["latitude"], station["longitude"]
+        )
+        assert station["distance_km"] == round(distance, 2)
+
+
+def test_corrected_report_makes_its_tile_stale_until_the_next_build(client, seeded, snapshot_dir):
+    headers = seeded["headers"]
+    response = client.post("/fuel/", headers=headers, json={
+        "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 20, "cost": 1300,
+        "location": "Caltex, National Highway, General Santos", "latitude": GENERAL_SANTOS[0], "longitude": GENERAL_SANTOS[1]
+    })
+    assert response.status_code == 200, response.text
+    fuel_id = response.json()["fuel_id"]
+    clustering_queue.flush()
+    tile = tile_name(tile_for(*GENERAL_SANTOS))
+    query = {"latitude": GENERAL_SANTOS[0], "longitude": GENERAL_SANTOS[1], "radius_km": 2}
+
+    def rebuild():
+        db = SessionLocal()
+        try:
+            build_snapshot(db, str(snapshot_dir))
+        finally:
+            db.close()
+
+    try:
+        rebuild()
+        assert client.get("/fuel-prices/nearby", params=query).json()["snapshot_version"] is not None
+        assert client.get(f"/fuel-prices/snapshot/tiles/{tile}").status_code == 200
+
+        assert client.patch(f"/fuel/{fuel_id}", headers=headers, json={"cost": 1400}).status_code == 200
+        nearby = client.get("/fuel-prices/nearby", params=query).json()
+        assert nearby["snapshot_version"] is None
+        assert nearby["stations"][0]["avg_price_per_liter"] == 70.0
+        assert client.get(f"/fuel-prices/snapshot/tiles/{tile}").status_code == 404
+        # Tiles elsewhere are still served from the snapshot
+        assert client.get("/fuel-prices/nearby", params={
+            "latitude": seeded["latitude"], "longitude": seeded["longitude"]
+        }).json()["snapshot_version"] is not None
+
+        rebuild()
+        nearby = client.get("/fuel-prices/nearby", params=query).json()
+        assert nearby["snapshot_version"] is not None
+        assert nearby["stations"][0]["avg_price_per_liter"] == 70.0
+    finally:
+        client.delete(f"/fuel/{fuel_id}", headers=headers)
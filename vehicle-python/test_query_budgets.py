@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint SQL query budgets.
+
+Every request below runs against the seeded database and must stay within
+its declared number of SQL statements. A failure here usually means an
+N+1 query (e.g. one query per log/vehicle) slipped into a route; fix the
+route rather than raising the budget.
+"""
+
+import pytest
+
+# (method, path, max SQL statements). Authenticated routes spend one
+# statement loading the current user.
+QUERY_BUDGETS = [
+    ("GET", "/users/me", 1),
+    ("GET", "/dashboard/", 6),
+    ("GET", "/vehicles/", 2),
+    ("GET", "/vehicles/{vehicle_id}", 2),
+    ("GET", "/vehicles/{vehicle_id}/mileage", 3),
+    ("GET", "/fuel/vehicle/{vehicle_id}", 3),
+    ("GET", "/fuel/{fuel_id}", 2),
+    ("GET", "/maintenance/vehicle/{vehicle_id}", 3),
+    ("GET", "/reminders/", 2),
+    ("GET", "/reminders/upcoming", 2),
+    ("GET", "/reminders/overdue", 2),
+    ("GET", "/fuel-prices/nearby?latitude={latitude}&longitude={longitude}&radius_km=50&time_window=7d", 3),
+    ("GET", "/fuel-prices/nearby?latitude={latitude}&longitude={longitude}&fuel_type=Diesel", 3),
+]
+
+
+@pytest.mark.parametrize("method,path,budget", QUERY_BUDGETS, ids=[f"{m} {p.split('?')[0]}" for m, p, _ in QUERY_BUDGETS])
+def test_read_query_budget(client, seeded, count_queries, method, path, budget):
+    url = path.format(**seeded)
+
+    with count_queries() as queries:
+        response = client.request(method, url, headers=seeded["headers"])
+
+    assert response.status_code == 200, response.text
+    assert queries.count <= budget, (
+        f"{method} {path} ran {queries.count} SQL statements (budget {budget}):\n"
+        + "\n".join(queries.statements)
+    )
+
+
+def test_nearby_prices_cover_seeded_stations(client, seeded):
+    response = client.get(
+        "/fuel-prices/nearby",
+        params={"latitude": seeded["latitude"], "longitude": seeded["longitude"], "radius_km": 50, "time_window": "7d"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] >= 30
+    assert all(station["report_count"] > 0 for station in body["stations"])
+
+
+def test_create_fuel_log_query_budget(client, seeded, count_queries):
+    payload = {
+        "vehicle_id": seeded["vehicle_id"],
+        "date": "2025-01-15",
+        "liters": 30,
+        "cost": 1950,
+        "location": "Petron, Street 1, Manila",
+        "latitude": seeded["latitude"],
+        "longitude": seeded["longitude"],
+    }
+
+    with count_queries() as queries:
+        response = client.post("/fuel/", json=payload, headers=seeded["headers"])
+
+    assert response.status_code == 200, response.text
+    # Includes the data_version bumps (and read-back) for ETags and /sync
+    assert queries.count <= 12, "\n".join(queries.statements)
+
+
+def test_dashboard_summarizes_every_vehicle(client, seeded):
+    response = client.get("/dashboard/", headers=seeded["headers"])
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert len(body["vehicles"]) == 10
+    assert all(vehicle["last_fuel"] and vehicle["last_maintenance"] for vehicle in body["vehicles"])
+    assert body["upcoming_reminders"]
+
+    first = next(v for v in body["vehicles"] if v["vehicle_id"] == seeded["vehicle_id"])
+    newest = client.get(f"/fuel/vehicle/{seeded['vehicle_id']}", headers=seeded["headers"]).json()[0]
+    assert first["last_fuel"]["date"] == newest["date"]
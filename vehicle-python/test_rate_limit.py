@@ -0,0 +1,195 @@
+"""
+Token-bucket limiter: per-caller keys, route costs, the auth bucket and
+load shedding for expensive routes. Runs against a small app so limits can
+be tiny.
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.datastructures import QueryParams
+
+from app.utils.auth import create_access_token
+from app.utils.rate_limit import RateLimiter, RateLimitMiddleware, RateLimitPolicy, nearby_cost
+
+
+def _limited_app(limiter: RateLimiter) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/vehicles/")
+    async def vehicles():
+        return []
+
+    @app.get("/fuel-prices/nearby")
+    async def nearby(radius_km: float = 5.0):
+        return {"stations": []}
+
+    @app.post("/auth/forgot-password")
+    async def forgot_password():
+        return {"message": "sent"}
+
+    @app.post("/auth/refresh")
+    async def refresh():
+        return {"access_token": "new"}
+
+    @app.get("/metrics")
+    async def metrics():
+        return "ok"
+
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    return app
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter({
+        "api": RateLimitPolicy("api", capacity=5, refill_per_second=0.001),
+        "auth": RateLimitPolicy("auth", capacity=5, refill_per_second=0.001, per_ip=True),
+    })
+
+
+@pytest.fixture
+def limited_client(limiter):
+    return TestClient(_limited_app(limiter))
+
+
+def _bearer(email):
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+def test_bucket_empties_then_429(limited_client, limiter):
+    statuses = [limited_client.get("/vehicles/").status_code for _ in range(6)]
+
+    assert statuses == [200] * 5 + [429]
+    rejected = limited_client.get("/vehicles/")
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert rejected.headers["x-ratelimit-remaining"] == "0"
+    assert limiter.rejected.value(policy="api", reason="rate") == 2
+    assert limiter.allowed.value(policy="api") == 5
+
+
+def test_users_have_separate_buckets(limited_client):
+    alice, bob = _bearer("alice@example.com"), _bearer("bob@example.com")
+    assert all(limited_client.get("/vehicles/", headers=alice).status_code == 200 for _ in range(5))
+
+    assert limited_client.get("/vehicles/", headers=alice).status_code == 429
+    assert limited_client.get("/vehicles/", headers=bob).status_code == 200
+    # A forged token falls back to the client IP's bucket
+    assert limited_client.get("/vehicles/", headers={"Authorization": "Bearer forged"}).status_code == 200
+
+
+def test_wide_nearby_searches_cost_more(limited_client):
+    assert limited_client.get("/fuel-prices/nearby", params={"radius_km": 50}).status_code == 200
+    assert limited_client.get("/fuel-prices/nearby", params={"radius_km": 50}).status_code == 429
+    # 5 - 5 = 0 tokens left, but a narrow search from another user is unaffected
+    assert limited_client.get(
+        "/fuel-prices/nearby", params={"radius_km": 2}, headers=_bearer("carol@example.com")
+    ).status_code == 200
+
+
+@pytest.mark.parametrize("radius,cost", [("2", 1), ("10", 1), ("25", 3), ("50", 5), ("500", 5), ("bad", 1),
+                                         ("nan", 1), ("-inf", 1), ("inf", 1)])
+def test_nearby_cost(radius, cost):
+    assert nearby_cost(QueryParams({"radius_km": radius})) == cost
+
+
+@pytest.mark.parametrize("radius", ["nan", "-inf"])
+def test_non_finite_radius_is_not_a_server_error(limited_client, radius):
+    assert limited_client.get("/fuel-prices/nearby", params={"radius_km": radius}).status_code < 500
+
+
+def test_auth_routes_are_limited_per_ip(limited_client):
+    statuses = [
+        limited_client.post("/auth/forgot-password", headers=_bearer(f"user{i}@example.com")).status_code
+        for i in range(2)
+    ]
+    # Each reset email costs 5 tokens, and rotating tokens does not get
+    # around the per-IP auth bucket
+    assert statuses == [200, 429]
+
+
+def test_refresh_uses_the_auth_bucket(limited_client, limiter):
+    statuses = [limited_client.post("/auth/refresh").status_code for _ in range(6)]
+
+    assert statuses == [200] * 5 + [429]
+    assert limiter.allowed.value(policy="auth") == 5
+    assert limiter.rejected.value(policy="auth", reason="rate") == 1
+    # The api bucket is untouched
+    assert limited_client.get("/vehicles/").status_code == 200
+
+
+def test_exempt_paths_are_not_limited(limited_client):
+    assert all(limited_client.get("/metrics").status_code == 200 for _ in range(10))
+
+
+def test_expensive_routes_shed_load_without_charging():
+    limiter = RateLimiter(
+        {"api": RateLimitPolicy("api", capacity=100, refill_per_second=1),
+         "auth": RateLimitPolicy("auth", capacity=5, refill_per_second=1, per_ip=True)},
+        expensive_concurrency=1
+    )
+    release = asyncio.Event()
+    responses = []
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = RateLimitMiddleware(slow_app, limiter)
+
+    async def call():
+        sent = []
+        scope = {"type": "http", "method": "GET", "path": "/fuel-prices/nearby",
+                 "query_string": b"radius_km=5", "headers": [], "client": ("10.0.0.1", 1234)}
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        responses.append(sent[0]["status"])
+
+    async def scenario():
+        first = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        await call()  # Rejected immediately while the first holds the only slot
+        release.set()
+        await first
+        await call()  # Slot released
+
+    asyncio.run(scenario())
+
+    assert responses == [429, 200, 200]
+    assert limiter.rejected.value(policy="api", reason="overload") == 1
+    assert limiter.allowed.value(policy="api") == 2
+
+
+def test_unreachable_redis_falls_back_without_blocking():
+    pytest.importorskip("redis")
+    from app.utils.rate_limit import RedisBackend
+
+    backend = RedisBackend("redis://127.0.0.1:1/0", timeout_seconds=0.05)
+    policy = RateLimitPolicy("api", capacity=2, refill_per_second=0.001)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticking = asyncio.create_task(ticker())
+        results = [await backend.take("user:1", 1, policy) for _ in range(3)]
+        ticking.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    # Local buckets take over, and the event loop kept running meanwhile
+    assert [allowed for allowed, _, _ in results] == [True, True, False]
+    assert ticks > 0
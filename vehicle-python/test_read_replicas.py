@@ -0,0 +1,128 @@
+"""
+Read-replica routing: replica choice, lag tolerance, read-your-writes and
+fallback to the primary. The "replica" is a copy of the test database, so
+anything written after the copy is only visible on the primary.
+"""
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.database import database, replicas
+from app.database.replicas import ReplicaRouter, RoutingSession
+from app.models import models
+from app.utils.conditional import bump_versions
+
+
+@pytest.fixture
+def replica_copy(seeded, tmp_path):
+    """A replica engine on a snapshot of the seeded primary (SQLite only)."""
+    if database.engine.dialect.name != "sqlite":
+        pytest.skip("Copies the SQLite test database")
+    path = tmp_path / "replica.db"
+    shutil.copyfile(database.engine.url.database, path)
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def router(replica_copy):
+    router = ReplicaRouter(database.engine, [replica_copy], max_lag_seconds=5, check_interval_seconds=5)
+    router.check()
+    return router
+
+
+def test_reads_go_to_replica_and_writes_to_primary(seeded, router, replica_copy):
+    db = RoutingSession(router)
+    try:
+        owner = db.query(models.User).first()
+        assert db.get_bind(models.Vehicle.__mapper__) is replica_copy
+        # The caller's write watermark is always read from the primary
+        assert db.get_bind(models.User.__mapper__) is database.engine
+
+        db.add(models.Reminder(user_id=owner.user_id, vehicle_id=seeded["vehicle_id"],
+                               title="Registration", due_date=datetime.utcnow().date()))
+        db.flush()
+        # Once the session has written, everything stays on the primary
+        assert db.get_bind(models.Vehicle.__mapper__) is database.engine
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_recent_write_reads_from_primary(router, replica_copy):
+    db = RoutingSession(router)
+    replicas.require_fresh(db, datetime.utcnow() + timedelta(seconds=1))
+    assert db.get_bind(models.Vehicle.__mapper__) is database.engine
+    db.close()
+
+    db = RoutingSession(router)
+    replicas.require_fresh(db, datetime.utcnow() - timedelta(minutes=5))
+    assert db.get_bind(models.Vehicle.__mapper__) is replica_copy
+    db.close()
+    assert router.reads.value(target="primary", reason="recent_write") == 1
+
+
+def test_lagging_replica_is_skipped(router, monkeypatch):
+    monkeypatch.setattr(replicas, "replication_lag", lambda conn: 30.0)
+    router.check()
+
+    assert router.pick() is database.engine
+    assert router.reads.value(target="primary", reason="no_replica") == 1
+
+
+def test_unreachable_replica_falls_back_to_primary(tmp_path):
+    missing = create_engine(f"sqlite:///{tmp_path}/missing/replica.db")
+    router = ReplicaRouter(database.engine, [missing])
+    router.check()
+
+    assert not router.replicas[0].healthy
+    assert router.pick() is database.engine
+
+
+def test_get_requests_use_replica_until_caller_writes(client, seeded, router, monkeypatch):
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(database, "ReadSessionLocal", database.sessionmaker(
+        class_=RoutingSession, autoflush=False, router=router
+    ))
+    headers = {**seeded["headers"], "Accept-Encoding": "identity"}
+    before = len(client.get("/vehicles/", headers=headers).json())
+
+    created = client.post("/vehicles/", headers=headers, json={
+        "make": "Isuzu", "model": "Traviz", "year": 2024, "fuel_type": "Diesel"
+    })
+    assert created.status_code == 200, created.text
+
+    # The replica copy predates the write; the caller must still see it
+    assert len(client.get("/vehicles/", headers=headers).json()) == before + 1
+    assert router.reads.value(target="primary", reason="recent_write") >= 1
+
+    delete = client.delete(f"/vehicles/{created.json()['vehicle_id']}", headers=headers)
+    assert delete.status_code == 204
+
+
+def test_freshness_is_stamped_after_commit(seeded, router, monkeypatch):
+    monkeypatch.setattr(database, "replica_router", router)
+    db = database.SessionLocal()
+    try:
+        user_id = db.query(models.User.user_id).first()[0]
+        watermark = db.query(models.User.data_updated_at).filter(models.User.user_id == user_id)
+
+        bump_versions(db, user_id)
+        bumped_at = watermark.scalar()
+        time.sleep(0.05)  # A slow commit
+        committing_at = datetime.utcnow()
+        db.commit()
+        assert watermark.scalar() >= committing_at > bumped_at
+
+        # Rolled back writes leave the watermark alone
+        stamped_at = watermark.scalar()
+        bump_versions(db, user_id)
+        db.rollback()
+        db.commit()
+        assert watermark.scalar() == stamped_at
+    finally:
+        db.close()
@@ -0,0 +1,140 @@
+"""
+Recent_Fuel_Prices: kept in step with fuel log writes, pruned by date, and
+the only table nearby-price aggregation reads.
+"""
+from datetime import date, timedelta
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.services import recent_prices
+from app.services.clustering_queue import clustering_queue
+
+
+def _recent_row(fuel_id):
+    db = SessionLocal()
+    try:
+        return db.get(models.RecentFuelPrice, fuel_id)
+    finally:
+        db.close()
+
+
+def _station_id(fuel_id):
+    db = SessionLocal()
+    try:
+        return db.query(models.Fuel.station_id).filter(models.Fuel.fuel_id == fuel_id).scalar()
+    finally:
+        db.close()
+
+
+def _fuel_payload(seeded, log_date, cost=1950):
+    return {
+        "vehicle_id": seeded["vehicle_id"],
+        "date": log_date.isoformat(),
+        "liters": 30,
+        "cost": cost,
+        "location": "Petron, Street 1, Manila",
+        "latitude": seeded["latitude"],
+        "longitude": seeded["longitude"],
+    }
+
+
+def _create_fuel(client, seeded, log_date):
+    response = client.post("/fuel/", headers=seeded["headers"], json=_fuel_payload(seeded, log_date))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _update_fuel(client, seeded, fuel_id, log_date, cost=1950):
+    response = client.put(f"/fuel/{fuel_id}", headers=seeded["headers"], json=_fuel_payload(seeded, log_date, cost))
+    assert response.status_code == 200, response.text
+
+
+def test_fuel_writes_keep_recent_prices_in_step(client, seeded, count_queries):
+    with count_queries() as queries:
+        created = _create_fuel(client, seeded, date.today())
+    # Not station-tagged until the clustering queue has run
+    assert not [statement for statement in queries.statements if "Recent_Fuel_Prices" in statement]
+    assert _recent_row(created["fuel_id"]) is None
+
+    with count_queries() as queries:
+        clustering_queue.flush()
+    # One extra statement when the cluster is assigned
+    assert sum(statement.startswith("INSERT") and "Recent_Fuel_Prices" in statement
+               for statement in queries.statements) == 1
+    row = _recent_row(created["fuel_id"])
+    station_id = _station_id(created["fuel_id"])
+    assert station_id is not None and row.station_id == station_id
+    # Fixed-point copies, and the price generated from them
+    assert (row.cost_centavos, row.liters_ml, row.kwh_wh) == (195000, 30000, None)
+    assert row.unit_price == 65.0
+
+    _update_fuel(client, seeded, created["fuel_id"], date.today(), cost=2100)
+    assert _recent_row(created["fuel_id"]).unit_price == 70.0
+
+    # Backdating past the retention window takes it out of the hot table
+    old_date = date.today() - timedelta(days=recent_prices.RETENTION_DAYS + 1)
+    _update_fuel(client, seeded, created["fuel_id"], old_date)
+    assert _recent_row(created["fuel_id"]) is None
+
+    _update_fuel(client, seeded, created["fuel_id"], date.today())
+    assert _recent_row(created["fuel_id"]) is not None
+    assert client.delete(f"/fuel/{created['fuel_id']}", headers=seeded["headers"]).status_code == 204
+    assert _recent_row(created["fuel_id"]) is None
+
+
+def test_old_logs_are_not_copied(client, seeded):
+    created = _create_fuel(client, seeded, date.today() - timedelta(days=30))
+    clustering_queue.flush()
+    assert _recent_row(created["fuel_id"]) is None
+    client.delete(f"/fuel/{created['fuel_id']}", headers=seeded["headers"])
+
+
+def _fixed_point_rows(db):
+    return {row.fuel_id: (row.cost_centavos, row.liters_ml, row.kwh_wh, row.unit_price)
+            for row in db.query(models.RecentFuelPrice).all()}
+
+
+def test_prune_and_rebuild(seeded):
+    db = SessionLocal()
+    try:
+        before = db.query(models.RecentFuelPrice).count()
+        assert before > 0
+        cutoff = recent_prices.retention_cutoff()
+        expected = db.query(models.Fuel).filter(
+            models.Fuel.station_id.isnot(None), models.Fuel.date >= cutoff
+        ).count()
+        assert before == expected
+        copied = _fixed_point_rows(db)
+
+        # Nothing has expired yet; a week from now the oldest days have
+        assert recent_prices.prune(db) == 0
+        removed = recent_prices.prune(db, today=date.today() + timedelta(days=7))
+        assert 0 < removed < before
+
+        assert recent_prices.rebuild(db) == before
+        assert db.query(models.RecentFuelPrice).count() == before
+        # Converted in SQL exactly as the write path converts in Python
+        assert _fixed_point_rows(db) == copied
+    finally:
+        db.close()
+
+
+def test_nearby_prices_ignore_history_outside_the_hot_table(client, seeded):
+    params = {"latitude": seeded["latitude"], "longitude": seeded["longitude"], "radius_km": 50, "time_window": "7d"}
+    before = client.get("/fuel-prices/nearby", params=params).json()
+
+    db = SessionLocal()
+    try:
+        # Rows only in Fuel_Info (bulk-loaded history) are never aggregated
+        db.execute(models.Fuel.__table__.insert(), [{
+            "vehicle_id": seeded["vehicle_id"], "date": date.today(), "liters": 10, "cost": 99999,
+            "station_id": db.query(models.GasStationCluster.station_id).filter(
+                models.GasStationCluster.cluster_id == "petron_station_0").scalar(),
+            "sync_version": 0,
+        }])
+        db.commit()
+        assert client.get("/fuel-prices/nearby", params=params).json() == before
+    finally:
+        db.execute(models.Fuel.__table__.delete().where(models.Fuel.cost == 99999))
+        db.commit()
+        db.close()
@@ -0,0 +1,140 @@
+"""
+Refresh tokens: rotation without bcrypt, replay detection, logout and
+revocation on password change.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import REFRESH_TOKEN_RETRY_SECONDS
+from app.database.database import SessionLocal
+from app.models import models
+from app.utils import auth
+
+PASSWORD = "first-password-123"
+
+
+@pytest.fixture
+def account(client):
+    email = f"refresh.{uuid.uuid4().hex[:8]}@example.com"
+    response = client.post("/auth/register", json={"full_name": "Refresher", "email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return email
+
+
+def _login(client, email, password=PASSWORD):
+    response = client.post("/auth/token", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _refresh(client, refresh_token):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_without_bcrypt(client, account, monkeypatch, count_queries):
+    tokens = _login(client, account)
+    assert tokens["refresh_token"]
+
+    def no_bcrypt(*args, **kwargs):
+        raise AssertionError("refresh must not verify a password")
+    monkeypatch.setattr(auth.pwd_context, "verify", no_bcrypt)
+
+    with count_queries() as queries:
+        response = _refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200, response.text
+    refreshed = response.json()
+    # One indexed lookup and one UPDATE
+    assert queries.count <= 3, "\n".join(queries.statements)
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+
+    me = client.get("/users/me", headers={"Authorization": f"Bearer {refreshed['access_token']}"})
+    assert me.status_code == 200 and me.json()["email"] == account
+
+    # Rotated again with the new token
+    assert _refresh(client, refreshed["refresh_token"]).status_code == 200
+
+    # Only hashes are stored
+    db = SessionLocal()
+    try:
+        token_hash = hashlib.sha256(refreshed["refresh_token"].encode()).hexdigest()
+        assert db.query(models.RefreshToken).filter(models.RefreshToken.previous_hash == token_hash).count() == 1
+    finally:
+        db.close()
+
+
+def _rotated_seconds_ago(refresh_token, seconds):
+    """Move the rotation that issued `refresh_token` into the past."""
+    db = SessionLocal()
+    try:
+        db.query(models.RefreshToken).filter(
+            models.RefreshToken.token_hash == hashlib.sha256(refresh_token.encode()).hexdigest()
+        ).update({models.RefreshToken.last_used_at: datetime.utcnow() - timedelta(seconds=seconds)})
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_replayed_token_revokes_the_session(client, account):
+    first = _login(client, account)["refresh_token"]
+    second = _refresh(client, first).json()["refresh_token"]
+    _rotated_seconds_ago(second, REFRESH_TOKEN_RETRY_SECONDS + 1)
+
+    # The old token again, after the retry window: someone else holds a copy
+    assert _refresh(client, first).status_code == 401
+    assert _refresh(client, second).status_code == 401
+
+
+def test_retry_after_a_lost_response_keeps_the_session(client, account):
+    first = _login(client, account)["refresh_token"]
+    lost = _refresh(client, first).json()["refresh_token"]
+
+    # The response carrying `lost` never arrived, so the client retries
+    retried = _refresh(client, first)
+    assert retried.status_code == 200, retried.text
+    current = retried.json()["refresh_token"]
+    assert current not in (first, lost)
+
+    assert _refresh(client, lost).status_code == 401
+    assert _refresh(client, current).status_code == 200
+
+
+def test_unknown_token_is_rejected(client):
+    assert _refresh(client, "not-a-token").status_code == 401
+
+
+def test_logout_revokes_only_that_device(client, account):
+    phone = _login(client, account)["refresh_token"]
+    tablet = _login(client, account)["refresh_token"]
+
+    assert client.post("/auth/logout", json={"refresh_token": phone}).status_code == 204
+    assert _refresh(client, phone).status_code == 401
+    assert _refresh(client, tablet).status_code == 200
+
+
+def test_password_change_revokes_every_session(client, account):
+    phone = _login(client, account)
+    tablet = _login(client, account)["refresh_token"]
+
+    response = client.post("/auth/change-password", headers={"Authorization": f"Bearer {phone['access_token']}"},
+                           json={"current_password": PASSWORD, "new_password": "second-password-456"})
+    assert response.status_code == 200, response.text
+
+    assert _refresh(client, phone["refresh_token"]).status_code == 401
+    assert _refresh(client, tablet).status_code == 401
+    assert _login(client, account, "second-password-456")["refresh_token"]
+
+
+def test_login_drops_dead_sessions(client, account):
+    first = _login(client, account)["refresh_token"]
+    client.post("/auth/logout", json={"refresh_token": first})
+    _login(client, account)
+
+    db = SessionLocal()
+    try:
+        user_id = db.query(models.User.user_id).filter(models.User.email == account).scalar()
+        assert db.query(models.RefreshToken).filter(models.RefreshToken.user_id == user_id).count() == 1
+    finally:
+        db.close()
@@ -0,0 +1,49 @@
+"""
+The trusted-row JSON path must produce exactly what response_model would.
+"""
+import json
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.schemas import schemas
+
+
+@pytest.mark.parametrize("path,model,schema,id_field", [
+    ("/fuel/vehicle/{vehicle_id}", models.Fuel, schemas.Fuel, "fuel_id"),
+    ("/maintenance/vehicle/{vehicle_id}", models.Maintenance, schemas.Maintenance, "maintenance_id"),
+])
+def test_rows_response_matches_response_model(client, seeded, path, model, schema, id_field):
+    response = client.get(path.format(**seeded), headers=seeded["headers"])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "etag" in response.headers
+
+    db = SessionLocal()
+    try:
+        rows = db.query(model).filter(
+            model.vehicle_id == seeded["vehicle_id"]
+        ).order_by(model.date.desc()).limit(100).all()
+        adapter = TypeAdapter(List[schema])
+        expected = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    finally:
+        db.close()
+
+    # Rows with the same date may come back in either order
+    actual, expected = json.loads(response.content), json.loads(expected)
+    assert sorted(actual, key=lambda row: row[id_field]) == sorted(expected, key=lambda row: row[id_field])
+    assert list(actual[0]) == list(schema.model_fields)
+
+
+def test_fuel_list_joins_the_station_table(client, seeded, count_queries):
+    with count_queries() as queries:
+        response = client.get("/fuel/vehicle/{vehicle_id}".format(**seeded), headers=seeded["headers"])
+    assert response.status_code == 200
+    assert any(row["station_cluster_id"] for row in response.json())
+
+    # One outer join, not a correlated subquery per row
+    [statement] = [s for s in queries.statements if "Fuel_Info" in s]
+    assert "LEFT OUTER JOIN" in statement and "(SELECT" not in statement
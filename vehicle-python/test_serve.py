@@ -0,0 +1,49 @@
+"""
+Worker sizing for the production launcher (app.serve), and database work
+kept off the workers' event loops.
+"""
+import inspect
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app.database.database import get_db
+from app.routes import auth, dashboard, fuel, locations, maintenance, prices, reminders, sync, users, vehicles
+from app.serve import recommended_workers
+
+ROUTERS = [module.router for module in (
+    auth, users, vehicles, maintenance, fuel, reminders, prices, locations, dashboard, sync
+)]
+
+
+@pytest.mark.parametrize("cpus,pool_size,max_overflow,max_connections,expected", [
+    (1, 5, 10, 151, 3),     # CPU bound: 2 * 1 + 1
+    (6, 5, 10, 151, 9),     # (151 - 10) // 15 = 9 < 2 * 6 + 1
+    (8, 5, 10, 151, 9),
+    (8, 20, 20, 151, 3),    # Bigger pools leave room for fewer workers
+    (8, 50, 50, 100, 1),    # Never fewer than one
+])
+def test_recommended_workers(cpus, pool_size, max_overflow, max_connections, expected):
+    assert recommended_workers(cpus, pool_size, max_overflow, max_connections, reserved_connections=10) == expected
+
+
+def _uses_db(dependant) -> bool:
+    return any(dependency.call is get_db or _uses_db(dependency) for dependency in dependant.dependencies)
+
+
+def _async_db_users(dependant):
+    """Coroutine handlers/dependencies that (directly or through their own dependencies) take a Session."""
+    found = [dependant.call] if inspect.iscoroutinefunction(dependant.call) and _uses_db(dependant) else []
+    for dependency in dependant.dependencies:
+        found += _async_db_users(dependency)
+    return found
+
+
+def test_database_work_runs_in_the_threadpool():
+    assert sum(len(router.routes) for router in ROUTERS) > 40
+    offenders = {
+        f"{route.path}: {call.__name__}"
+        for router in ROUTERS for route in router.routes if isinstance(route, APIRoute)
+        for call in _async_db_users(route.dependant)
+    }
+    assert not offenders
@@ -0,0 +1,136 @@
+"""
+In-memory station index: lookups agree with a scan of every cluster,
+writers update their own index without reloading, other workers fetch only
+the clusters announced since their version, and ORM writes make them reload.
+"""
+from datetime import date
+
+from app.database.database import SessionLocal
+from app.models import models
+from app.services import location_service
+from app.services.clustering_queue import clustering_queue
+from app.services.location_service import LocationService
+from app.services.station_index import StationIndex, read_version, station_index
+
+# Away from the seeded Metro Manila stations, so other tests' clusters are untouched
+BACOLOD = (10.6765, 122.9509)
+
+
+def _scan(db, latitude, longitude):
+    """(distance, station_id) of every cluster, the way lookups used to compute them."""
+    return sorted(
+        (LocationService.calculate_distance(latitude, longitude, float(cluster.latitude), float(cluster.longitude)),
+         cluster.station_id)
+        for cluster in db.query(models.GasStationCluster).all()
+    )
+
+
+def test_within_matches_a_scan_of_every_cluster(seeded):
+    db = SessionLocal()
+    try:
+        index = StationIndex()
+        index.load(db)
+        scan = _scan(db, seeded["latitude"], seeded["longitude"])
+        for radius_km in (0.1, 2, 10, 50, 20000):
+            found = index.within(seeded["latitude"], seeded["longitude"], radius_km)
+            assert [station.station_id for station, _ in found] == [
+                station_id for distance, station_id in scan if distance <= radius_km
+            ]
+            assert all(abs(distance - expected) < 1e-9 for (_, distance), (expected, _) in zip(found, scan))
+    finally:
+        db.close()
+
+
+def test_nearest(seeded):
+    db = SessionLocal()
+    try:
+        index = StationIndex()
+        index.load(db)
+        scan = _scan(db, seeded["latitude"], seeded["longitude"])
+        nearest = index.nearest(seeded["latitude"], seeded["longitude"], count=3)
+        assert [station.station_id for station, _ in nearest] == [station_id for _, station_id in scan[:3]]
+        assert index.nearest(0.0, 0.0, max_km=100) == []
+    finally:
+        db.close()
+
+
+def test_clustering_writes_through_without_a_reload(client, seeded):
+    db = SessionLocal()
+    try:
+        station_index.ensure_current(db)
+        reloads = station_index.reloads.value()
+        response = client.post("/fuel/", headers=seeded["headers"], json={
+            "vehicle_id": seeded["vehicle_id"], "date": date.today().isoformat(), "liters": 20, "cost": 1300,
+            "location": "Petron, Lacson Street, Bacolod", "latitude": BACOLOD[0], "longitude": BACOLOD[1]
+        })
+        assert response.status_code == 200, response.text
+        clustering_queue.flush()
+
+        assert station_index.version == read_version(db)
+        station_index.ensure_current(db)
+        assert station_index.reloads.value() == reloads
+        [(station, distance)] = station_index.within(*BACOLOD, radius_km=0.1)
+        assert station.normalized_name.startswith("Petron") and distance < 0.001
+        client.delete(f"/fuel/{response.json()['fuel_id']}", headers=seeded["headers"])
+    finally:
+        db.close()
+
+
+def test_other_workers_update_after_a_write_without_a_reload(seeded):
+    db = SessionLocal()
+    try:
+        other_worker = StationIndex()
+        other_worker.load(db)
+        station_id = LocationService.find_or_create_station_cluster(
+            db, BACOLOD[0] + 0.01, BACOLOD[1], "Shell, Araneta Street", "Shell", "Araneta Street"
+        )
+        assert station_id not in {station.station_id for station, _ in other_worker.within(*BACOLOD, 5)}
+
+        other_worker.ensure_current(db)
+        assert other_worker.reloads.value() == 1 and other_worker.refreshes.value() == 1
+        assert other_worker.version == read_version(db)
+        assert station_id in {station.station_id for station, _ in other_worker.within(*BACOLOD, 5)}
+        # The writer's own index has it without reading anything
+        assert station_id in {station.station_id for station, _ in station_index.within(*BACOLOD, 5)}
+    finally:
+        db.close()
+
+
+def test_unannounced_writes_are_picked_up_with_the_next_announcement(seeded, monkeypatch):
+    db = SessionLocal()
+    try:
+        other_worker = StationIndex()
+        other_worker.load(db)
+        # The writer commits, then dies before announcing
+        monkeypatch.setattr(location_service, "announce_version", lambda db, station_ids: 0)
+        lost = LocationService.find_or_create_station_cluster(
+            db, BACOLOD[0] - 0.01, BACOLOD[1], "Phoenix, Burgos Street", "Phoenix", "Burgos Street"
+        )
+        monkeypatch.undo()
+        other_worker.ensure_current(db)
+        assert lost not in {station.station_id for station, _ in other_worker.within(*BACOLOD, 5)}
+
+        announced = LocationService.find_or_create_station_cluster(
+            db, BACOLOD[0] - 0.02, BACOLOD[1], "Seaoil, Burgos Street", "Seaoil", "Burgos Street"
+        )
+        other_worker.ensure_current(db)
+        found = {station.station_id for station, _ in other_worker.within(*BACOLOD, 5)}
+        assert {lost, announced} <= found and other_worker.reloads.value() == 1
+    finally:
+        db.close()
+
+
+def test_orm_writes_make_workers_reload(seeded):
+    db = SessionLocal()
+    try:
+        other_worker = StationIndex()
+        other_worker.load(db)
+        cluster = db.query(models.GasStationCluster).first()
+        street, cluster.street = cluster.street, "Rizal Avenue"
+        db.commit()
+        other_worker.ensure_current(db)
+        assert other_worker.reloads.value() == 2
+        cluster.street = street
+        db.commit()
+    finally:
+        db.close()
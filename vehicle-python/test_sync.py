@@ -0,0 +1,123 @@
+"""
+Delta sync: /sync?since=<token> returns exactly the rows written or deleted
+after the token, including while other requests are writing.
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def sync_user(client):
+    email = f"sync-{uuid.uuid4().hex[:8]}@example.com"
+    response = client.post("/auth/register", json={
+        "full_name": "Sync Tester", "email": email, "password": "sync-password-1"
+    })
+    assert response.status_code == 200, response.text
+    token = client.post("/auth/token", data={"username": email, "password": "sync-password-1"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    vehicle = client.post("/vehicles/", headers=headers, json={
+        "make": "Toyota", "model": "Vios", "year": 2020, "fuel_type": "Gasoline"
+    })
+    assert vehicle.status_code == 200, vehicle.text
+    return headers, vehicle.json()["vehicle_id"]
+
+
+def _fuel_log(client, headers, vehicle_id, liters=20):
+    response = client.post("/fuel/", headers=headers, json={
+        "vehicle_id": vehicle_id,
+        "date": date.today().isoformat(),
+        "liters": liters,
+        "cost": liters * 60,
+        "location": "Petron, EDSA, Quezon City",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["fuel_id"]
+
+
+def test_full_then_delta_sync(client, sync_user):
+    headers, vehicle_id = sync_user
+    first_fuel = _fuel_log(client, headers, vehicle_id)
+
+    full = client.get("/sync/", headers=headers).json()
+    assert full["full"] is True
+    assert [v["vehicle_id"] for v in full["vehicles"]] == [vehicle_id]
+    assert [f["fuel_id"] for f in full["fuel"]] == [first_fuel]
+
+    unchanged = client.get("/sync/", params={"since": full["token"]}, headers=headers).json()
+    assert unchanged["full"] is False
+    assert unchanged["fuel"] == [] and unchanged["vehicles"] == []
+    assert unchanged["token"] == full["token"]
+
+    second_fuel = _fuel_log(client, headers, vehicle_id)
+    reminder = client.post("/reminders/", headers=headers, json={
+        "vehicle_id": vehicle_id, "title": "Oil change", "due_date": date.today().isoformat()
+    }).json()
+    assert client.delete(f"/fuel/{first_fuel}", headers=headers).status_code == 204
+
+    delta = client.get("/sync/", params={"since": full["token"]}, headers=headers).json()
+    assert [f["fuel_id"] for f in delta["fuel"]] == [second_fuel]
+    assert [r["reminder_id"] for r in delta["reminders"]] == [reminder["reminder_id"]]
+    assert delta["deleted"]["fuel"] == [first_fuel]
+    # Log writes leave the vehicle row (and its image) out of the delta
+    assert delta["vehicles"] == []
+
+
+def test_mileage_change_resends_the_vehicle(client, sync_user):
+    headers, vehicle_id = sync_user
+    token = client.get("/sync/", headers=headers).json()["token"]
+
+    response = client.post("/maintenance/", headers=headers, json={
+        "vehicle_id": vehicle_id, "date": date.today().isoformat(), "maintenance_type": "Oil change",
+        "cost": 2500, "mileage": 12345
+    })
+    assert response.status_code == 200, response.text
+
+    delta = client.get("/sync/", params={"since": token}, headers=headers).json()
+    assert [m["maintenance_id"] for m in delta["maintenance"]] == [response.json()["maintenance_id"]]
+    assert [(v["vehicle_id"], v["current_mileage"]) for v in delta["vehicles"]] == [(vehicle_id, 12345)]
+
+
+def test_vehicle_deletion_is_tombstoned(client, sync_user):
+    headers, vehicle_id = sync_user
+    token = client.get("/sync/", headers=headers).json()["token"]
+
+    assert client.delete(f"/vehicles/{vehicle_id}", headers=headers).status_code == 204
+
+    delta = client.get("/sync/", params={"since": token}, headers=headers).json()
+    assert delta["deleted"]["vehicles"] == [vehicle_id]
+    assert delta["vehicles"] == []
+
+
+@pytest.mark.parametrize("token", ["abc", "-1"])
+def test_invalid_token_rejected(client, sync_user, token):
+    headers, _ = sync_user
+    assert client.get("/sync/", params={"since": token}, headers=headers).status_code == 400
+
+
+def test_unknown_token_forces_full_sync(client, sync_user):
+    headers, _ = sync_user
+    body = client.get("/sync/", params={"since": "999999"}, headers=headers).json()
+    assert body["full"] is True
+    assert len(body["vehicles"]) == 1
+
+
+def test_sync_during_concurrent_writes_misses_nothing(client, sync_user):
+    headers, vehicle_id = sync_user
+    token = client.get("/sync/", headers=headers).json()["token"]
+    seen = set()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        writes = [pool.submit(_fuel_log, client, headers, vehicle_id, 10 + i) for i in range(20)]
+        while not all(write.done() for write in writes):
+            delta = client.get("/sync/", params={"since": token}, headers=headers).json()
+            seen.update(f["fuel_id"] for f in delta["fuel"])
+            token = delta["token"]
+        created = {write.result() for write in writes}
+
+    delta = client.get("/sync/", params={"since": token}, headers=headers).json()
+    seen.update(f["fuel_id"] for f in delta["fuel"])
+    assert created <= seen